@@ -0,0 +1,352 @@
+"""
+Batch scoring of a decision node's rules over many inputs (back-testing).
+
+`BatchScorer(node)` compiles the node's `rules` once, like a decision node in
+a graph would (`DecisionTable`). It then scores a batch of inputs, given as
+rows (one `input` dict per row) or as columns (`{"amount": [...], ...}`),
+without creating executions or writing node records.
+
+When NumPy is installed, each rule condition built only from field lookups,
+constants, comparisons, `and`/`or`/`not` and `+ - *` is evaluated for a whole
+chunk of rows at once as a boolean mask over column arrays. The remaining
+rules are evaluated row by row, and so are the rows where a referenced field
+is missing or the column types don't allow a vectorized comparison. Every row
+therefore gets exactly the result the decision node would produce. Without
+NumPy, or when one rule's action can change what a later rule reads under
+the `collect` hit policy, every row goes through the decision table.
+
+Results are yielded per row, in input order:
+
+    {"row": 0, "fired": [2, 7], "output": {"approved": true, "tier": "B"}}
+
+`fired` holds indexes into `rules`. `output` merges the actions of the fired
+rules, in firing order.
+"""
+
+import ast
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+from decision_table import MISSING, DecisionTable, constant_value, extract_field, field_path
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+DEFAULT_CHUNK_SIZE = 4096
+
+_VECTOR_COMPARE = (ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+_VECTOR_BINOP = (ast.Add, ast.Sub, ast.Mult)
+# int64 columns only hold ints that compare exactly against floats
+_EXACT_INT = 2 ** 53
+
+
+class _NotVectorizable(Exception):
+    pass
+
+
+class BatchScorer:
+    def __init__(self, node: Dict[str, Any], chunk_size: int = DEFAULT_CHUNK_SIZE):
+        data = node.get("data", node)
+        self.table = DecisionTable(data.get("rules", []), data.get("hit_policy"))
+        self.chunk_size = chunk_size
+        rules = self.table.rules
+        self.sequential = self.table.hit_policy == "collect" and _actions_feed_conditions(rules)
+        self.vectorizable = [np is not None and not self.sequential and _is_vectorizable(r.condition.tree.value)
+                             for r in rules]
+        if self.table.hit_policy == "priority":
+            self._order = sorted(range(len(rules)), key=lambda p: (-rules[p].priority, p))
+        else:
+            self._order = list(range(len(rules)))
+        self._indexes = [r.index for r in rules]
+        self._actions = [r.action if isinstance(r.action, dict) else None for r in rules]
+        self.stats = {"rows": 0, "vectorized_rules": sum(self.vectorizable),
+                      "row_rules": len(rules) - sum(self.vectorizable),
+                      "fallback_evaluations": 0, "condition_errors": 0, "duration_ms": 0.0,
+                      "numpy": np is not None}
+
+    def score_rows(self, rows: Iterable[Dict[str, Any]], offset: int = 0) -> Iterator[Dict[str, Any]]:
+        """Score `rows`, numbering results from `offset` (for batches scored in parts)."""
+        chunk: List[Dict[str, Any]] = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                yield from self._score_chunk(_RowChunk(chunk), offset)
+                offset += len(chunk)
+                chunk = []
+        if chunk:
+            yield from self._score_chunk(_RowChunk(chunk), offset)
+
+    def score_columns(self, columns: Dict[str, List[Any]]) -> Iterator[Dict[str, Any]]:
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError("All columns must have the same length")
+        total = lengths.pop() if lengths else 0
+        for start in range(0, total, self.chunk_size):
+            end = min(start + self.chunk_size, total)
+            yield from self._score_chunk(_ColumnChunk(columns, start, end), start)
+
+    # ------------------------------------------------------------------
+
+    def _score_chunk(self, chunk, offset: int) -> Iterator[Dict[str, Any]]:
+        started = time.perf_counter()
+        n = len(chunk)
+        self.stats["rows"] += n
+        if not any(self.vectorizable):
+            for i in range(n):
+                _, fired, errors = self.table.match({"input": chunk.row(i)})
+                self.stats["condition_errors"] += len(errors)
+                yield self._result(offset + i, fired)
+            self.stats["duration_ms"] += (time.perf_counter() - started) * 1000
+            return
+
+        columns: Dict[Any, Any] = {}
+        masks = np.zeros((len(self.table.rules), n), dtype=bool)
+        for position, rule in enumerate(self.table.rules):
+            if self.vectorizable[position]:
+                try:
+                    missing = np.zeros(n, dtype=bool)
+                    masks[position] = _as_mask(_evaluate(rule.condition.tree.value, chunk, columns, missing), n)
+                    fallback_rows = np.flatnonzero(missing)
+                except (_NotVectorizable, TypeError, ValueError, OverflowError):
+                    fallback_rows = range(n)
+            else:
+                fallback_rows = range(n)
+            for i in fallback_rows:
+                masks[position, i] = self._evaluate_row(rule, chunk.row(int(i)))
+
+        # Row-major nonzero: the hits of each row are contiguous and in evaluation order
+        row_hits, rule_hits = np.nonzero(masks[self._order].T)
+        bounds = np.searchsorted(row_hits, np.arange(n + 1)).tolist()
+        rule_hits = rule_hits.tolist()
+        single = self.table.hit_policy != "collect"
+        for i in range(n):
+            hits = rule_hits[bounds[i]:bounds[i + 1]]
+            if single:
+                hits = hits[:1]
+            yield self._result(offset + i, [self._order[h] for h in hits])
+        self.stats["duration_ms"] += (time.perf_counter() - started) * 1000
+
+    def _evaluate_row(self, rule, row: Dict[str, Any]) -> bool:
+        self.stats["fallback_evaluations"] += 1
+        try:
+            return bool(rule.condition.evaluate({"input": row}))
+        except Exception:
+            self.stats["condition_errors"] += 1
+            return False
+
+    def _result(self, row: int, fired: List[int]) -> Dict[str, Any]:
+        output: Dict[str, Any] = {}
+        for position in fired:
+            action = self._actions[position]
+            if action:
+                output.update(action)
+        return {"row": row, "fired": [self._indexes[p] for p in fired], "output": output}
+
+
+# ----------------------------------------------------------------------
+# Batches
+# ----------------------------------------------------------------------
+
+class _RowChunk:
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def row(self, i: int) -> Dict[str, Any]:
+        return self.rows[i]
+
+    def values(self, keys) -> List[Any]:
+        names = {"input": None}
+        out = []
+        for row in self.rows:
+            names["input"] = row
+            out.append(extract_field(names, ("input", keys)))
+        return out
+
+
+class _ColumnChunk:
+    def __init__(self, columns: Dict[str, List[Any]], start: int, end: int):
+        self.columns = columns
+        self.start = start
+        self.end = end
+
+    def __len__(self):
+        return self.end - self.start
+
+    def row(self, i: int) -> Dict[str, Any]:
+        return {name: values[self.start + i] for name, values in self.columns.items()}
+
+    def values(self, keys) -> List[Any]:
+        column = self.columns.get(keys[0])
+        if column is None:
+            return [MISSING] * len(self)
+        head = column[self.start:self.end]
+        if len(keys) == 1:
+            return head
+        return [extract_field({"input": value}, ("input", keys[1:])) for value in head]
+
+
+# ----------------------------------------------------------------------
+# Vectorized evaluation
+# ----------------------------------------------------------------------
+
+def _actions_feed_conditions(rules) -> bool:
+    """True if some action writes a state key that some condition reads."""
+    written: Set[str] = set()
+    for rule in rules:
+        if isinstance(rule.action, dict):
+            written.update(rule.action)
+    if not written:
+        return False
+    for rule in rules:
+        handled = set()
+        for node in ast.walk(rule.condition.tree):
+            if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and node.value.id == "state":
+                key = constant_value(node.slice)
+                handled.add(id(node.value))
+                if key is MISSING or key in written:
+                    return True
+        for node in ast.walk(rule.condition.tree):
+            if isinstance(node, ast.Name) and id(node) not in handled:
+                if node.id == "state" or (node.id == "input" and "input" in written):
+                    return True
+    return False
+
+
+def _is_vectorizable(node: ast.AST) -> bool:
+    if field_path(node) is not None:
+        return _input_keys(field_path(node)) is not None
+    if constant_value(node) is not MISSING:
+        return True
+    if isinstance(node, ast.Compare):
+        return all(isinstance(op, _VECTOR_COMPARE) for op in node.ops) \
+            and all(_is_vectorizable(n) for n in [node.left] + node.comparators)
+    if isinstance(node, ast.BoolOp):
+        return all(_is_vectorizable(v) and _is_boolean(v) for v in node.values)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        return _is_boolean(node.operand) and _is_vectorizable(node.operand)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        return _is_vectorizable(node.operand)
+    if isinstance(node, ast.BinOp) and isinstance(node.op, _VECTOR_BINOP):
+        return _is_vectorizable(node.left) and _is_vectorizable(node.right)
+    return False
+
+
+def _is_boolean(node: ast.AST) -> bool:
+    """Operands of and/or/not must be masks: Python's truthiness of other values is not vectorized."""
+    if isinstance(node, (ast.Compare, ast.BoolOp)):
+        return True
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        return True
+    return isinstance(constant_value(node), bool)
+
+
+def _input_keys(field) -> Optional[tuple]:
+    root, keys = field
+    if root == "input":
+        return keys
+    if keys[0] == "input" and len(keys) > 1:
+        return keys[1:]
+    return None
+
+
+def _evaluate(node: ast.AST, chunk, columns: Dict[Any, Any], missing):
+    field = field_path(node)
+    if field is not None:
+        array, absent = _column(chunk, _input_keys(field), columns)
+        missing |= absent
+        return array
+    value = constant_value(node)
+    if value is not MISSING:
+        return value
+    if isinstance(node, ast.Compare):
+        operands = [_evaluate(n, chunk, columns, missing) for n in [node.left] + node.comparators]
+        result = True
+        for op, left, right in zip(node.ops, operands, operands[1:]):
+            result = np.logical_and(result, _as_mask(_compare(op, left, right), len(chunk)))
+        return result
+    if isinstance(node, ast.BoolOp):
+        masks = [_as_mask(_evaluate(v, chunk, columns, missing), len(chunk)) for v in node.values]
+        return (np.logical_and if isinstance(node.op, ast.And) else np.logical_or).reduce(masks)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        return ~_as_mask(_evaluate(node.operand, chunk, columns, missing), len(chunk))
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        return -_evaluate(node.operand, chunk, columns, missing)
+    if isinstance(node, ast.BinOp):
+        left = _evaluate(node.left, chunk, columns, missing)
+        right = _evaluate(node.right, chunk, columns, missing)
+        return _arithmetic(node.op, left, right)
+    raise _NotVectorizable(type(node).__name__)
+
+
+def _arithmetic(op: ast.operator, left, right):
+    if any(isinstance(x, np.ndarray) and x.dtype == bool for x in (left, right)):
+        raise _NotVectorizable("arithmetic on booleans")  # NumPy's bool + bool is a logical or
+    apply = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply}[type(op)]
+    result = apply(left, right)
+    if isinstance(result, np.ndarray) and result.dtype.kind == "i":
+        # Python ints don't overflow; leave anything near the exact-float range to the row path
+        check = apply(np.asarray(left, dtype=np.float64), np.asarray(right, dtype=np.float64))
+        if np.any(np.abs(check) >= _EXACT_INT):
+            raise _NotVectorizable("integer result out of range")
+    return result
+
+
+def _compare(op: ast.cmpop, left, right):
+    if isinstance(op, ast.Eq):
+        return left == right
+    if isinstance(op, ast.NotEq):
+        return left != right
+    if isinstance(op, ast.Lt):
+        return left < right
+    if isinstance(op, ast.LtE):
+        return left <= right
+    if isinstance(op, ast.Gt):
+        return left > right
+    return left >= right
+
+
+def _as_mask(value, n: int):
+    if isinstance(value, (bool, np.bool_)):
+        return np.full(n, bool(value))
+    if isinstance(value, np.ndarray) and value.shape == (n,):
+        if value.dtype == bool:
+            return value
+        if value.dtype == object and all(type(v) is bool for v in value):
+            return value.astype(bool)
+    raise _NotVectorizable("condition does not produce a boolean")
+
+
+def _column(chunk, keys: tuple, columns: Dict[Any, Any]):
+    """(array, missing mask) for an input field; typed so comparisons follow Python semantics."""
+    cached = columns.get(keys)
+    if cached is not None:
+        return cached
+    values = chunk.values(keys)
+    absent = np.fromiter((v is MISSING for v in values), dtype=bool, count=len(values))
+    present = [v for v in values if v is not MISSING]
+    # Missing rows are re-evaluated per row; fill them with a value of the column's type
+    filler = present[0] if present else 0
+    values = [filler if v is MISSING else v for v in values]
+
+    if present and all(type(v) is bool for v in present):
+        array = np.array(values, dtype=bool)
+    elif all(type(v) is int and -_EXACT_INT < v < _EXACT_INT for v in present):
+        array = np.array(values, dtype=np.int64)
+    elif all(type(v) is float or (type(v) is int and -_EXACT_INT < v < _EXACT_INT) for v in present):
+        array = np.array(values, dtype=np.float64)
+    else:
+        array = _object_array(values)
+    columns[keys] = (array, absent)
+    return array, absent
+
+
+def _object_array(values: List[Any]):
+    array = np.empty(len(values), dtype=object)
+    for i, value in enumerate(values):
+        array[i] = value
+    return array
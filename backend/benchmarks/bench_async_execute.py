@@ -0,0 +1,104 @@
+"""
+Benchmark: many concurrent workflows calling a slow downstream service,
+blocking requests on a 40-thread pool vs the async engine (latest_gen.py).
+
+A local stub service answers every call after `--latency-ms`. "threaded"
+reproduces the old runtime: each workflow holds one of 40 threads (FastAPI's
+default threadpool size) for a blocking `requests` call. "async" runs the same
+number of one-service-node workflows through `graph.ainvoke` on one event
+loop, with checkpoints and node records included.
+
+Threads cap the threaded runtime at 40 / latency workflows per second. The
+async engine is bounded by CPU instead: the stub, the HTTP client and the
+graph share the machine. The gap therefore widens with downstream latency and
+with cores.
+
+    python benchmarks/bench_async_execute.py --workflows 200 1000 --latency-ms 500
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import uvicorn
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+THREADPOOL_SIZE = 40
+
+
+def start_stub(latency_s: float) -> str:
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        while (await receive()).get("more_body"):
+            pass
+        await asyncio.sleep(latency_s)
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": b'{"score": 90}'})
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error",
+                                           backlog=4096, timeout_keep_alive=30))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/score"
+
+
+def run_threaded(url: str, workflows: int) -> float:
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=THREADPOOL_SIZE)
+    session.mount("http://", adapter)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(THREADPOOL_SIZE) as pool:
+        list(pool.map(lambda i: session.post(url, json={"n": i}, timeout=15).json(), range(workflows)))
+    return time.perf_counter() - started
+
+
+async def run_async(engine, url: str, workflows: int) -> float:
+    graph_json = {"nodes": [{"id": "s1", "type": "service", "data": {"url": url, "request": {"n": "{input.n}"}}}],
+                  "edges": []}
+    graph = engine.graph_cache.get(graph_json)
+    await graph.ainvoke({"input": {"n": -1}}, config=engine.execution_config("warmup"))
+    started = time.perf_counter()
+    results = await asyncio.gather(*(
+        graph.ainvoke({"input": {"n": i}}, config=engine.execution_config(f"bench-{i}")) for i in range(workflows)
+    ))
+    elapsed = time.perf_counter() - started
+    failures = sum(1 for r in results if not r["s1"]["_metrics"]["success"])
+    if failures:
+        print(f"  {failures} async calls failed")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workflows", type=int, nargs="+", default=[200, 1000])
+    parser.add_argument("--latency-ms", type=float, default=500.0)
+    args = parser.parse_args()
+
+    url = start_stub(args.latency_ms / 1000)
+    os.chdir(tempfile.mkdtemp())  # the engine creates workflow.db in the working directory
+    import latest_gen as engine
+
+    print(f"{'workflows':>10}{'threaded s':>12}{'async s':>10}{'threaded/s':>12}{'async/s':>10}")
+    for count in args.workflows:
+        threaded = run_threaded(url, count)
+        asynchronous = asyncio.run(run_async(engine, url, count))
+        print(f"{count:>10}{threaded:>12.2f}{asynchronous:>10.2f}{count / threaded:>12.0f}{count / asynchronous:>10.0f}")
+    engine.journal.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Micro-benchmark: scoring a batch of inputs against a decision node's rules,
+one `DecisionTable.match` per row vs `BatchScorer` (batch_scoring.py).
+
+Uses the synthetic risk rules from bench_decision_table.py. Without NumPy
+both columns measure the per-row path.
+
+    python benchmarks/bench_batch_scoring.py --rows 10000 --rules 50 200
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from batch_scoring import BatchScorer, np  # noqa: E402
+from bench_decision_table import make_inputs, make_rules  # noqa: E402
+from decision_table import DecisionTable  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rules", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--rows", type=int, default=10000)
+    args = parser.parse_args()
+    rng = random.Random(7)
+    rows = [state["input"] for state in make_inputs(args.rows, rng)]
+    columns = {name: [row[name] for row in rows] for name in rows[0]}
+
+    print(f"numpy: {'yes' if np is not None else 'no'}")
+    print(f"{'rules':>6}{'per-row ms':>12}{'batch ms':>10}{'speedup':>9}  vectorized")
+    for count in args.rules:
+        rules = make_rules(count, rng)
+        table = DecisionTable(rules)
+
+        started = time.perf_counter()
+        expected = [[table.rules[p].index for p in table.match({"input": row})[1]] for row in rows]
+        row_ms = (time.perf_counter() - started) * 1000
+
+        scorer = BatchScorer({"data": {"rules": rules}})
+        started = time.perf_counter()
+        fired = [result["fired"] for result in scorer.score_columns(columns)]
+        batch_ms = (time.perf_counter() - started) * 1000
+        assert fired == expected
+
+        print(f"{count:>6}{row_ms:>12.1f}{batch_ms:>10.1f}{row_ms / batch_ms:>8.1f}x"
+              f"  {scorer.stats['vectorized_rules']}/{len(table.rules)}")
+
+
+if __name__ == "__main__":
+    main()
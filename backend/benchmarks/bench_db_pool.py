@@ -0,0 +1,157 @@
+"""
+Benchmark: executions/sec for the executor persistence pattern, before and
+after the pooled WAL connection layer (db_pool.py).
+
+One simulated execution is what /execute does for a 10-node workflow:
+save_workflow_execution (running) -> 10 x save_node_execution ->
+save_workflow_execution (completed).
+
+    python benchmarks/bench_db_pool.py --executions 300 --threads 8
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from db_pool import ConnectionPool  # noqa: E402
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS workflow_executions (
+        id TEXT PRIMARY KEY,
+        workflow_name TEXT NOT NULL,
+        status TEXT NOT NULL,
+        current_node_id TEXT,
+        state_data TEXT NOT NULL,
+        graph_json TEXT NOT NULL,
+        parent_execution_id TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS node_executions (
+        id TEXT PRIMARY KEY,
+        workflow_execution_id TEXT NOT NULL,
+        node_id TEXT NOT NULL,
+        node_type TEXT NOT NULL,
+        node_label TEXT,
+        status TEXT NOT NULL,
+        request_data TEXT,
+        response_data TEXT,
+        error_message TEXT,
+        execution_time_ms INTEGER,
+        started_at TIMESTAMP,
+        completed_at TIMESTAMP
+    )
+    """,
+]
+
+GRAPH = {"nodes": [{"id": f"n{i}", "type": "service", "data": {"url": "http://svc/x"}} for i in range(10)], "edges": []}
+PAYLOAD = {"customer": {"id": 42, "name": "ACME", "items": list(range(20))}}
+
+INSERT_EXECUTION = """
+    INSERT OR REPLACE INTO workflow_executions
+    (id, workflow_name, status, current_node_id, state_data, graph_json, parent_execution_id, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+INSERT_NODE = """
+    INSERT INTO node_executions
+    (id, workflow_execution_id, node_id, node_type, node_label, status,
+     request_data, response_data, error_message, execution_time_ms, started_at, completed_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def execution_rows(execution_id):
+    now = datetime.now().isoformat()
+    yield INSERT_EXECUTION, (execution_id, "bench", "running", "n0", json.dumps({"input": PAYLOAD}), json.dumps(GRAPH), None, now)
+    for i in range(10):
+        yield INSERT_NODE, (str(uuid.uuid4()), execution_id, f"n{i}", "service", f"n{i}", "completed",
+                            json.dumps(PAYLOAD), json.dumps(PAYLOAD), None, 5, now, now)
+    yield INSERT_EXECUTION, (execution_id, "bench", "completed", "n9", json.dumps({"input": PAYLOAD}), json.dumps(GRAPH), None, now)
+
+
+def run_legacy(db_path, execution_id):
+    """Connect, write, commit and close once per helper call (the old pattern)."""
+    for sql, params in execution_rows(execution_id):
+        conn = sqlite3.connect(db_path)
+        conn.execute(sql, params)
+        conn.commit()
+        conn.close()
+
+
+def make_pooled(pool):
+    def run_pooled(db_path, execution_id):
+        for sql, params in execution_rows(execution_id):
+            with pool.transaction() as conn:
+                conn.execute(sql, params)
+    return run_pooled
+
+
+def measure(name, db_path, runner, executions, threads):
+    errors = []
+    counter = iter(range(executions))
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    return
+            try:
+                runner(db_path, str(uuid.uuid4()))
+            except sqlite3.OperationalError as e:
+                errors.append(str(e))
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+    done = executions - len(errors)
+    print(f"{name:<8} {done / elapsed:10.1f} executions/sec   {elapsed:7.2f}s   errors={len(errors)}")
+    return done / elapsed
+
+
+def init_schema(db_path):
+    conn = sqlite3.connect(db_path)
+    for ddl in SCHEMA:
+        conn.execute(ddl)
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--executions", type=int, default=300)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_db = os.path.join(tmp, "legacy.db")
+        pooled_db = os.path.join(tmp, "pooled.db")
+        init_schema(legacy_db)
+        init_schema(pooled_db)
+
+        print(f"{args.executions} executions x 12 writes, {args.threads} threads")
+        before = measure("before", legacy_db, run_legacy, args.executions, args.threads)
+        pool = ConnectionPool(pooled_db)
+        after = measure("after", pooled_db, make_pooled(pool), args.executions, args.threads)
+        pool.close_all()
+        print(f"speedup  {after / before:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
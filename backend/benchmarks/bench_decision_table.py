@@ -0,0 +1,98 @@
+"""
+Micro-benchmark: decision-node rule evaluation, linear scan vs the indexed
+decision table (decision_table.py), as the rule count grows.
+
+The synthetic rule set looks like a risk flow: most rules test equality on a
+country or segment code, or a range on the amount or score, and a few use
+conditions the table cannot index (a fixed handful, as in real rule sets).
+
+    python benchmarks/bench_decision_table.py --rules 50 200 800 2000
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from conditions import compile_condition  # noqa: E402
+from decision_table import DecisionTable  # noqa: E402
+
+COUNTRIES = [f"C{i:03d}" for i in range(200)]
+
+
+def make_rules(count: int, rng: random.Random):
+    rules = []
+    for i in range(count):
+        kind = i % 10
+        if i < 5:
+            cond = f"input['amount'] * 2 > {rng.randint(150000, 250000)} or input['country'] != 'C000'"
+        elif kind < 5:
+            cond = f"input['country'] == '{rng.choice(COUNTRIES)}' and input['amount'] > {rng.randint(0, 5000)}"
+        elif kind < 6:
+            cond = f"input['segment'] == {rng.randint(0, 400)}"
+        elif kind < 8:
+            lo = rng.randint(0, 100000)
+            cond = f"{lo} <= input['amount'] < {lo + rng.randint(10, 500)}"
+        else:
+            lo = rng.randint(300, 850)
+            cond = f"input['score'] >= {lo} and input['score'] < {lo + 5}"
+        rules.append({"condition": cond, "action": {f"flag_{i}": True}})
+    return rules
+
+
+def make_inputs(count: int, rng: random.Random):
+    return [{"input": {"country": rng.choice(COUNTRIES), "segment": rng.randint(0, 400),
+                       "amount": rng.randint(0, 100000), "score": rng.randint(300, 850)}}
+            for _ in range(count)]
+
+
+def linear(compiled, state):
+    new_state = state.copy()
+    for rule, condition in compiled:
+        try:
+            if condition.evaluate(new_state):
+                new_state.update(rule["action"])
+        except Exception:
+            pass
+    return new_state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rules", type=int, nargs="+", default=[50, 200, 800, 2000])
+    parser.add_argument("--inputs", type=int, default=500)
+    args = parser.parse_args()
+    rng = random.Random(7)
+    inputs = make_inputs(args.inputs, rng)
+
+    print(f"{'rules':>6}{'linear us':>12}{'table us':>11}{'speedup':>9}{'candidates':>12}  indexed")
+    for count in args.rules:
+        rules = make_rules(count, rng)
+        compiled = [(rule, compile_condition(rule["condition"])) for rule in rules]
+        table = DecisionTable(rules)
+
+        for state in inputs[:50]:
+            assert table.evaluate(state)[0] == linear(compiled, state)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            for state in inputs:
+                linear(compiled, state)
+            linear_us = (time.perf_counter() - started) / len(inputs) * 1e6
+            started = time.perf_counter()
+            for state in inputs:
+                table.evaluate(state)
+            table_us = (time.perf_counter() - started) / len(inputs) * 1e6
+        avg_candidates = sum(len(table.candidates(s)) for s in inputs) / len(inputs)
+        info = table.describe()
+        print(f"{count:>6}{linear_us:>12.1f}{table_us:>11.1f}{linear_us / table_us:>8.1f}x{avg_candidates:>12.1f}"
+              f"  eq={info['equality_indexed']} range={info['range_indexed']} none={info['unindexed']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark: N separate /execute requests vs one /execute/batch request (latest_gen.py).
+
+Both run in-process through httpx's ASGI transport against a local stub service,
+with the same concurrency. Separate requests ship and hash the graph every
+time and upsert their execution row twice per input (running, then final), in
+their own transactions; the batch compiles once and upserts final rows in
+groups of EXECUTE_BATCH_FLUSH_ROWS.
+
+    python benchmarks/bench_execute_batch.py --inputs 2000 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_async_execute import start_stub  # noqa: E402
+
+
+def flow(url: str):
+    return {"nodes": [{"id": "s1", "type": "service", "data": {"url": url, "request": {"n": "{input.n}"}}},
+                      {"id": "d1", "type": "decision",
+                       "data": {"rules": [{"condition": "input['n'] % 2 == 0", "action": {"even": True}}]}}],
+            "edges": [{"source": "s1", "target": "d1"}]}
+
+
+async def run_separate(client: httpx.AsyncClient, graph, inputs: int, concurrency: int) -> float:
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with gate:
+            r = await client.post("/execute", json={"graph": graph, "inputs": {"n": i}, "workflow_name": "bench"})
+            assert r.json()["status"] == "success", r.text
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(inputs)))
+    return time.perf_counter() - started
+
+
+async def run_batch(client: httpx.AsyncClient, graph, inputs: int, concurrency: int) -> float:
+    body = "\n".join([json.dumps({"graph": graph, "workflow_name": "bench", "concurrency": concurrency})]
+                     + [json.dumps({"n": i}) for i in range(inputs)])
+    started = time.perf_counter()
+    r = await client.post("/execute/batch", content=body, headers={"content-type": "application/x-ndjson"})
+    elapsed = time.perf_counter() - started
+    summary = json.loads(r.text.splitlines()[-1])["summary"]
+    assert summary["success"] == inputs, summary
+    return elapsed
+
+
+async def main_async(args):
+    url = start_stub(0.0)
+    os.chdir(tempfile.mkdtemp())  # the engine creates workflow.db in the working directory
+    import latest_gen as engine
+
+    graph = flow(url)
+    transport = httpx.ASGITransport(app=engine.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await run_separate(client, graph, 20, args.concurrency)  # warm-up: compile, pools
+        separate = await run_separate(client, graph, args.inputs, args.concurrency)
+        batch = await run_batch(client, graph, args.inputs, args.concurrency)
+    print(f"{'inputs':>8}{'separate s':>12}{'batch s':>10}{'separate/s':>12}{'batch/s':>10}")
+    print(f"{args.inputs:>8}{separate:>12.2f}{batch:>10.2f}{args.inputs / separate:>12.0f}{args.inputs / batch:>10.0f}")
+    engine.journal.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--inputs", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
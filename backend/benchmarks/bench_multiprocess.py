@@ -0,0 +1,163 @@
+"""
+Benchmark: /execute throughput of latest_gen.py served by 1..N processes
+sharing one workflow.db, and a check that paused executions are resumed once.
+
+For each worker count, `uvicorn latest_gen:app --workers N` is started in a
+fresh directory (so every run gets its own database) and `--requests`
+one-service-node /execute calls are sent with `--concurrency` in flight. The
+stub service and the client run in this process, so they take CPU from the
+server too; throughput grows with workers only while there are spare cores.
+
+Then `--paused` executions are paused at a form and every one of them gets
+`--racers` concurrent /resume calls, spread over the processes. Exactly one
+call per execution may succeed; the others must get 409 (being resumed) or
+400 (no longer paused), and the form must be recorded once.
+
+    python benchmarks/bench_multiprocess.py --workers 1 2 4 --requests 2000 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Tuple
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_async_execute import start_stub  # noqa: E402
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers: int, workdir: str) -> Tuple[subprocess.Popen, str]:
+    port = free_port()
+    env = dict(os.environ, PYTHONPATH=os.path.abspath(BACKEND_DIR))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "latest_gen:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "error", "--backlog", "4096"],
+        cwd=workdir, env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(base_url + "/").status_code == 200:
+                return server, base_url
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("server did not start")
+
+
+def service_flow(url: str):
+    return {"nodes": [{"id": "s1", "type": "service", "data": {"url": url, "request": {"n": "{input.n}"}}}],
+            "edges": []}
+
+
+def form_flow(url: str):
+    return {"nodes": [{"id": "f1", "type": "form", "data": {"schema": {"ok": True}}},
+                      {"id": "s1", "type": "service", "data": {"url": url, "request": {"ok": "{input.ok}"}}}],
+            "edges": [{"source": "f1", "target": "s1"}]}
+
+
+async def run_executes(client: httpx.AsyncClient, graph, requests: int, concurrency: int) -> float:
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with gate:
+            r = await client.post("/execute", json={"graph": graph, "inputs": {"n": i}, "workflow_name": "bench"})
+            assert r.json()["status"] == "success", r.text
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return time.perf_counter() - started
+
+
+async def race_resumes(client: httpx.AsyncClient, graph, paused: int, racers: int) -> Counter:
+    ids = []
+    for _ in range(paused):
+        r = await client.post("/execute", json={"graph": graph, "inputs": {}, "workflow_name": "race"})
+        assert r.json()["status"] == "paused", r.text
+        ids.append(r.json()["execution_id"])
+
+    async def resume(execution_id):
+        r = await client.post("/resume", json={"execution_id": execution_id, "form_data": {"ok": True}})
+        return execution_id, r.status_code, r.json().get("status") if r.status_code == 200 else None
+
+    outcomes = await asyncio.gather(*(resume(i) for i in ids for _ in range(racers)))
+    wins = Counter(execution_id for execution_id, code, status in outcomes if status == "success")
+    assert all(wins[i] == 1 for i in ids), f"executions resumed other than once: {wins}"
+    return Counter(code for _, code, _ in outcomes)
+
+
+def forms_recorded(workdir: str) -> Counter:
+    conn = sqlite3.connect(os.path.join(workdir, "workflow.db"))
+    try:
+        rows = conn.execute("""
+            SELECT e.id, COUNT(f.id) FROM workflow_executions e
+            LEFT JOIN form_responses f ON f.workflow_execution_id = e.id
+            WHERE e.workflow_name = 'race' GROUP BY e.id
+        """).fetchall()
+    finally:
+        conn.close()
+    return Counter(count for _, count in rows)
+
+
+async def bench(workers: int, url: str, args) -> dict:
+    workdir = tempfile.mkdtemp()
+    server, base_url = start_server(workers, workdir)
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+            graph = service_flow(url)
+            await run_executes(client, graph, args.concurrency * 4, args.concurrency)  # warm every process
+            elapsed = await run_executes(client, graph, args.requests, args.concurrency)
+            codes = await race_resumes(client, form_flow(url), args.paused, args.racers)
+    finally:
+        server.terminate()
+        server.wait()
+    return {"workers": workers, "seconds": elapsed, "per_s": args.requests / elapsed,
+            "codes": codes, "forms": forms_recorded(workdir)}
+
+
+async def main_async(args):
+    url = start_stub(args.latency_ms / 1000)
+    results = [await bench(workers, url, args) for workers in args.workers]
+    base = results[0]["per_s"]
+    print(f"cpus: {os.cpu_count()}  requests: {args.requests}  concurrency: {args.concurrency}  "
+          f"stub latency: {args.latency_ms} ms")
+    print(f"{'workers':>8}{'seconds':>10}{'req/s':>10}{'speedup':>9}   resume races (HTTP status: calls)")
+    for r in results:
+        codes = ", ".join(f"{code}: {n}" for code, n in sorted(r["codes"].items()))
+        print(f"{r['workers']:>8}{r['seconds']:>10.2f}{r['per_s']:>10.0f}{r['per_s'] / base:>9.2f}   {codes}"
+              f"  (forms recorded per execution: {dict(r['forms'])})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--paused", type=int, default=50)
+    parser.add_argument("--racers", type=int, default=8)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
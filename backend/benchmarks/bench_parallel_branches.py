@@ -0,0 +1,64 @@
+"""
+Benchmark: a chain of independent service nodes run one after another vs with
+`"parallelize": true` (latest_gen.py).
+
+Each node calls a local stub that answers after `--latency-ms` and reads only
+`input`, so dependency analysis puts the whole chain in one parallel group.
+Sequential runs take about nodes x latency; parallel ones about one latency.
+
+    python benchmarks/bench_parallel_branches.py --nodes 5 --runs 20 --latency-ms 200
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_async_execute import start_stub  # noqa: E402
+
+
+def chain_graph(url: str, nodes: int, parallelize: bool):
+    ids = [f"s{i}" for i in range(nodes)]
+    return {
+        "parallelize": parallelize,
+        "nodes": [{"id": i, "type": "service", "data": {"url": url, "request": {"n": "{input.n}"}}} for i in ids],
+        "edges": [{"source": a, "target": b} for a, b in zip(ids, ids[1:])],
+    }
+
+
+async def run(engine, graph_json, runs: int) -> float:
+    graph = engine.graph_cache.get(graph_json)
+    await graph.ainvoke({"input": {"n": -1}}, config=engine.execution_config("warmup"))
+    started = time.perf_counter()
+    for i in range(runs):
+        await graph.ainvoke({"input": {"n": i}}, config=engine.execution_config(f"bench-{i}"))
+    return (time.perf_counter() - started) / runs
+
+
+async def main_async(args):
+    url = start_stub(args.latency_ms / 1000)
+    os.chdir(tempfile.mkdtemp())  # the engine creates workflow.db in the working directory
+    import latest_gen as engine
+
+    sequential = await run(engine, chain_graph(url, args.nodes, False), args.runs)
+    parallel = await run(engine, chain_graph(url, args.nodes, True), args.runs)
+    print(f"{'nodes':>6}{'sequential ms':>15}{'parallel ms':>13}{'speedup':>9}")
+    print(f"{args.nodes:>6}{sequential * 1000:>15.0f}{parallel * 1000:>13.0f}{sequential / parallel:>8.1f}x")
+    engine.journal.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=5)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
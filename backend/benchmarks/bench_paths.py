@@ -0,0 +1,119 @@
+"""
+Micro-benchmark: deep_get / deep_set, before and after compiled path
+accessors (path_access.py).
+
+"legacy" re-parses the path with two regex passes on every call (the original
+deep_get from latest_gen.py, and the hand-rolled nested-target assignment from
+its service-node mappings). "cached" is deep_get / deep_set with the parse
+served from the LRU; "precompiled" holds the parsed steps and calls
+get_path / set_path.
+
+    python benchmarks/bench_paths.py --iterations 200000
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+from typing import Any, Dict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from path_access import compile_path, deep_get, deep_set, get_path, path_cache_info, set_path  # noqa: E402
+
+STATE = {
+    "input": {
+        "company": {
+            "name": "ACME",
+            "items": [{"name": f"item-{i}", "sku": f"SKU-{i}"} for i in range(10)],
+        },
+    },
+}
+GET_PATHS = ["input.company.name", "input.company.items[3].name", "input.missing.value"]
+SET_PATH = "customer.address.city"
+
+
+def legacy_deep_get(data: Dict[str, Any], path: str) -> Any:
+    if not path:
+        return data
+    parts = re.split(r'\.(?![^\[]*\])', path)
+    for part in parts:
+        match = re.findall(r'([^\[\]]+)|\[(\d+)\]', part)
+        for key, index in match:
+            if key:
+                if isinstance(data, dict):
+                    data = data.get(key)
+                else:
+                    return None
+            elif index is not None:
+                if isinstance(data, list):
+                    try:
+                        data = data[int(index)]
+                    except (IndexError, ValueError):
+                        return None
+                else:
+                    return None
+            if data is None:
+                return None
+    return data
+
+
+def legacy_set(payload: Dict[str, Any], target: str, val: Any):
+    parts = target.split('.')
+    sub = payload
+    for p in parts[:-1]:
+        if p not in sub or not isinstance(sub[p], dict):
+            sub[p] = {}
+        sub = sub[p]
+    sub[parts[-1]] = val
+
+
+def _per_call_ns(fn, iterations: int, repeats: int = 5) -> float:
+    """Best of `repeats` runs, to keep scheduler noise out of the comparison."""
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        best = min(best, time.perf_counter() - started)
+    return best / iterations * 1e9
+
+
+def _report(title: str, rows):
+    baseline = rows[0][1]
+    print(title)
+    for name, ns in rows:
+        print(f"  {name:<14}{ns:>10.0f} ns/op{baseline / ns:>8.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200000)
+    args = parser.parse_args()
+    n = args.iterations
+
+    for path in GET_PATHS:
+        assert deep_get(STATE, path) == legacy_deep_get(STATE, path), path
+        steps = compile_path(path)
+        _report(f"get {path}", [
+            ("legacy", _per_call_ns(lambda: legacy_deep_get(STATE, path), n)),
+            ("cached", _per_call_ns(lambda: deep_get(STATE, path), n)),
+            ("precompiled", _per_call_ns(lambda: get_path(STATE, steps), n)),
+        ])
+
+    a, b = {}, {}
+    legacy_set(a, SET_PATH, "Oslo")
+    deep_set(b, SET_PATH, "Oslo")
+    assert a == b
+    steps = compile_path(SET_PATH)
+    _report(f"set {SET_PATH}", [
+        ("legacy", _per_call_ns(lambda: legacy_set({}, SET_PATH, "Oslo"), n)),
+        ("cached", _per_call_ns(lambda: deep_set({}, SET_PATH, "Oslo"), n)),
+        ("precompiled", _per_call_ns(lambda: set_path({}, steps, "Oslo"), n)),
+    ])
+    print("path cache:", path_cache_info())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Micro-benchmark: service-node request rendering, before and after the
+precompiled template engine (template_engine.py).
+
+"legacy" is the original per-call path: copy.deepcopy(template) followed by
+render_template, which regex-scans every string and re-parses every path.
+"compiled" is compile_template(template) once, then render(state) per call.
+
+With string values both must render byte-for-byte the same payload; that is
+checked first. With other values the compiled engine keeps the type of a
+whole-field placeholder where the legacy path stringified it; the fields
+that change are listed.
+
+    python benchmarks/bench_templates.py --iterations 20000
+"""
+
+import argparse
+import copy
+import os
+import re
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from template_engine import compile_template  # noqa: E402
+
+TEMPLATE = {
+    "customer": {
+        "id": "{input.customer.id}",
+        "name": "{input.customer.name}",
+        "greeting": "Dear {input.customer.name}, your order {input.order.id} is {s1.response.status}",
+    },
+    "order": {
+        "id": "{input.order.id}",
+        "first_item": "{input.order.items[0].sku}",
+        "third_item": "{input.order.items[2].sku}",
+        "total": "{input.order.total}",
+        "currency": "EUR",
+    },
+    "flags": ["{input.flags.vip}", "static", "{input.missing.path}"],
+    "audit": {"source": "workflow", "version": 3, "note": "rendered for {input.customer.id}"},
+}
+
+STATE = {
+    "input": {
+        "customer": {"id": 42, "name": "ACME Corp"},
+        "order": {"id": "ORD-1001", "total": 199.5, "items": [{"sku": f"SKU-{i}"} for i in range(10)]},
+        "flags": {"vip": True},
+    },
+    "s1": {"response": {"status": "confirmed"}},
+}
+
+# Same shape with every placeholder value a string: the two renderers must agree exactly
+STRING_STATE = {
+    "input": {
+        "customer": {"id": "42", "name": "ACME Corp"},
+        "order": {"id": "ORD-1001", "total": "199.5", "items": [{"sku": f"SKU-{i}"} for i in range(10)]},
+        "flags": {"vip": "yes"},
+    },
+    "s1": {"response": {"status": "confirmed"}},
+}
+
+
+# ----------------------------------------------------------------------
+# Original implementation (copied from latest_gen.py before the change)
+# ----------------------------------------------------------------------
+
+def legacy_deep_get(data: Dict[str, Any], path: str) -> Any:
+    if not path:
+        return data
+    parts = re.split(r'\.(?![^\[]*\])', path)
+    for part in parts:
+        match = re.findall(r'([^\[\]]+)|\[(\d+)\]', part)
+        for key, index in match:
+            if key:
+                if isinstance(data, dict):
+                    data = data.get(key)
+                else:
+                    return None
+            elif index is not None:
+                if isinstance(data, list):
+                    try:
+                        data = data[int(index)]
+                    except (IndexError, ValueError):
+                        return None
+                else:
+                    return None
+            if data is None:
+                return None
+    return data
+
+
+def legacy_render_template(obj: Any, context: Dict[str, Any]):
+    if isinstance(obj, str):
+        matches = re.findall(r"\{([^{}]+)\}", obj)
+        for m in matches:
+            val = legacy_deep_get(context, m.strip())
+            if val is not None:
+                obj = obj.replace("{" + m + "}", str(val))
+        return obj
+    elif isinstance(obj, dict):
+        return {k: legacy_render_template(v, context) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [legacy_render_template(v, context) for v in obj]
+    return obj
+
+
+def _type_changes(compiled: Any, legacy: Any, path: str = "") -> List[str]:
+    """Paths where the compiled output differs from the legacy one; only type changes are expected."""
+    if isinstance(legacy, dict):
+        return [p for k in legacy for p in _type_changes(compiled[k], legacy[k], f"{path}.{k}" if path else k)]
+    if isinstance(legacy, list):
+        return [p for i, v in enumerate(legacy) for p in _type_changes(compiled[i], v, f"{path}[{i}]")]
+    if compiled == legacy:
+        return []
+    assert str(compiled) == legacy, f"{path}: {compiled!r} != {legacy!r}"
+    return [f"{path}: {legacy!r} -> {compiled!r}"]
+
+
+def _time(fn, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    compiled = compile_template(TEMPLATE)
+    assert compiled.render(STRING_STATE) == legacy_render_template(copy.deepcopy(TEMPLATE), STRING_STATE), \
+        "outputs differ for string values"
+    changes = _type_changes(compiled.render(STATE), legacy_render_template(copy.deepcopy(TEMPLATE), STATE))
+    print("whole-field placeholders that now keep their type:")
+    for change in changes:
+        print(f"  {change}")
+
+    legacy = _time(lambda: legacy_render_template(copy.deepcopy(TEMPLATE), STATE), args.iterations)
+    fresh = _time(lambda: compile_template(TEMPLATE).render(STATE), args.iterations)
+    cached = _time(lambda: compiled.render(STATE), args.iterations)
+
+    print(f"{'variant':<28}{'us/render':>12}{'speedup':>10}")
+    for name, elapsed in (("legacy deepcopy+render", legacy),
+                          ("compile+render every call", fresh),
+                          ("precompiled render", cached)):
+        print(f"{name:<28}{elapsed / args.iterations * 1e6:>12.2f}{legacy / elapsed:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Storage codec for large JSON blobs (request/response payloads, state checkpoints).
+
+Values at or above `threshold` bytes are compressed before they are written
+and stored as BLOBs; the codec used is recorded next to the value (`NULL`
+means plain text, as in rows written before compression existed). Values are
+only decompressed when a row is actually read back.
+
+zstd is used when the optional `zstandard` package is installed, zlib
+otherwise. Rows written with either codec can always be read.
+"""
+
+import threading
+import zlib
+from typing import Optional, Tuple, Union
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+DEFAULT_THRESHOLD_BYTES = 4096
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+Stored = Union[str, bytes, None]
+
+
+class BlobCodec:
+    def __init__(self, threshold: int = DEFAULT_THRESHOLD_BYTES, prefer: Optional[str] = None):
+        self.threshold = threshold
+        if prefer is None:
+            prefer = "zstd" if zstandard is not None else "zlib"
+        if prefer == "zstd" and zstandard is None:
+            raise ValueError("zstd codec requested but the zstandard package is not installed")
+        if prefer not in ("zstd", "zlib"):
+            raise ValueError(f"Unknown codec: {prefer}")
+        self.codec = prefer
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._raw_bytes = 0
+        self._stored_bytes = 0
+        self._compressed_values = 0
+        self._plain_values = 0
+
+    def encode(self, text: Optional[str]) -> Tuple[Stored, Optional[str]]:
+        """Return `(value_to_store, codec)`; codec is None when stored as plain text."""
+        if text is None:
+            return None, None
+        raw = text.encode("utf-8")
+        if len(raw) < self.threshold:
+            self._count(len(raw), len(raw), compressed=False)
+            return text, None
+        if self.codec == "zstd":
+            packed = self._zstd_compressor().compress(raw)
+        else:
+            packed = zlib.compress(raw, ZLIB_LEVEL)
+        self._count(len(raw), len(packed), compressed=True)
+        return packed, self.codec
+
+    def decode(self, value: Stored, codec: Optional[str]) -> Optional[str]:
+        if value is None or codec is None:
+            return value
+        if codec == "zlib":
+            return zlib.decompress(value).decode("utf-8")
+        if codec == "zstd":
+            if zstandard is None:
+                raise RuntimeError("Row is zstd-compressed but the zstandard package is not installed")
+            return self._zstd_decompressor().decompress(value).decode("utf-8")
+        raise ValueError(f"Unknown codec: {codec}")
+
+    def stats(self):
+        with self._lock:
+            raw, stored = self._raw_bytes, self._stored_bytes
+            return {
+                "codec": self.codec,
+                "threshold_bytes": self.threshold,
+                "compressed_values": self._compressed_values,
+                "plain_values": self._plain_values,
+                "raw_bytes": raw,
+                "stored_bytes": stored,
+                "compression_ratio": (raw / stored) if stored else None,
+            }
+
+    def _count(self, raw: int, stored: int, compressed: bool):
+        with self._lock:
+            self._raw_bytes += raw
+            self._stored_bytes += stored
+            if compressed:
+                self._compressed_values += 1
+            else:
+                self._plain_values += 1
+
+    # zstandard (de)compressor objects are not thread-safe; keep one per thread
+    def _zstd_compressor(self):
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            compressor = self._local.compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        return compressor
+
+    def _zstd_decompressor(self):
+        decompressor = getattr(self._local, "decompressor", None)
+        if decompressor is None:
+            decompressor = self._local.decompressor = zstandard.ZstdDecompressor()
+        return decompressor
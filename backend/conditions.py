@@ -0,0 +1,88 @@
+"""
+Precompiled condition expressions for edges and decision rules.
+
+`simple_eval(cond, names=...)` builds a new evaluator and re-parses the
+expression on every call. Conditions are instead parsed and validated once,
+when the graph is compiled, and each run only walks the cached AST:
+
+    cond = compile_condition("input['amount'] > 1000")   # ConditionError if invalid
+    if cond.evaluate(state): ...
+
+Validation rejects syntax errors, statements and constructs the evaluator does
+not support, and names other than `state`, `input` and the built-in
+functions. These would otherwise only fail (and be logged and skipped) on
+every run. Errors that depend on the data, such as a missing key, still
+happen at evaluation time.
+"""
+
+import ast
+import threading
+from functools import lru_cache
+from typing import Any, Dict
+
+from simpleeval import DEFAULT_FUNCTIONS, SimpleEval
+
+CONDITION_CACHE_SIZE = 4096
+CONDITION_NAMES = frozenset({"state", "input"}) | frozenset(DEFAULT_FUNCTIONS)
+
+# Node types SimpleEval can evaluate (class-level table; identical for every instance)
+_SUPPORTED_NODES = frozenset(SimpleEval().nodes)
+_local = threading.local()
+
+
+class ConditionError(ValueError):
+    """An edge or rule condition that can never be evaluated."""
+
+    def __init__(self, expression: str, reason: str):
+        super().__init__(f"Invalid condition {expression!r}: {reason}")
+        self.expression = expression
+        self.reason = reason
+
+
+class CompiledCondition:
+    __slots__ = ("expression", "tree")
+
+    def __init__(self, expression: str, tree: ast.AST):
+        self.expression = expression
+        self.tree = tree
+
+    def evaluate(self, state: Dict[str, Any]) -> Any:
+        """Evaluate against workflow state, with the same names simple_eval was given."""
+        evaluator = _evaluator()
+        evaluator.names = {"state": state, "input": state.get("input", {})}
+        return evaluator.eval(self.expression, previously_parsed=self.tree)
+
+
+def compile_condition(expression: str) -> CompiledCondition:
+    """Parse and validate once; identical expressions share one compiled condition."""
+    if not isinstance(expression, str):
+        raise ConditionError(repr(expression), "must be a string")
+    return _compile(expression)
+
+
+@lru_cache(maxsize=CONDITION_CACHE_SIZE)
+def _compile(expression: str) -> CompiledCondition:
+    if not expression.strip():
+        raise ConditionError(expression, "empty expression")
+    try:
+        module = ast.parse(expression.strip())
+    except SyntaxError as e:
+        raise ConditionError(expression, f"{e.msg} at column {e.offset}") from None
+    if len(module.body) != 1 or not isinstance(module.body[0], ast.Expr):
+        raise ConditionError(expression, "must be a single expression")
+
+    statement = module.body[0]
+    for node in ast.walk(statement):
+        if isinstance(node, (ast.expr, ast.stmt)) and type(node) not in _SUPPORTED_NODES:
+            raise ConditionError(expression, f"{type(node).__name__} is not supported")
+        if isinstance(node, ast.Name) and node.id not in CONDITION_NAMES:
+            raise ConditionError(expression, f"unknown name {node.id!r} (use state or input)")
+    return CompiledCondition(expression, statement)
+
+
+def _evaluator() -> SimpleEval:
+    # SimpleEval keeps the current names and expression on the instance: one per thread
+    evaluator = getattr(_local, "evaluator", None)
+    if evaluator is None:
+        evaluator = _local.evaluator = SimpleEval()
+    return evaluator
@@ -0,0 +1,138 @@
+"""
+Shared SQLite connection layer for the workflow executors.
+
+Every thread gets one long-lived connection to a given database file, opened
+with WAL journaling so readers never block the single writer, and with
+`synchronous=NORMAL` so a commit costs an append to the WAL instead of a full
+fsync of the main database. `busy_timeout` makes concurrent writers from
+FastAPI's threadpool wait for the lock instead of failing with
+"database is locked".
+
+Usage:
+
+    pool = get_pool("workflow.db")
+
+    with pool.transaction() as conn:      # BEGIN IMMEDIATE ... COMMIT
+        conn.execute("INSERT ...", (...))
+
+    rows = pool.connection().execute("SELECT ...").fetchall()
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+DEFAULT_BUSY_TIMEOUT_MS = 5000
+DEFAULT_SYNCHRONOUS = "NORMAL"
+DEFAULT_CACHE_SIZE_KIB = 16384
+
+
+class ConnectionPool:
+    """Per-thread pool of tuned sqlite3 connections to a single database file."""
+
+    def __init__(self, db_path: str, busy_timeout_ms: int = DEFAULT_BUSY_TIMEOUT_MS,
+                 synchronous: str = DEFAULT_SYNCHRONOUS, cache_size_kib: int = DEFAULT_CACHE_SIZE_KIB):
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.synchronous = synchronous
+        self.cache_size_kib = cache_size_kib
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: Dict[int, sqlite3.Connection] = {}
+
+    def _open(self) -> sqlite3.Connection:
+        # isolation_level=None puts the driver in autocommit mode; writes are
+        # grouped explicitly by transaction() so the lock is taken up front.
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000.0,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        conn.row_factory = sqlite3.Row
+        # Only takes effect for a new database file (or after VACUUM); lets the
+        # retention job hand freed pages back with incremental_vacuum
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kib)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Return the calling thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            with self._lock:
+                self._prune_dead_threads()
+                self._connections[threading.get_ident()] = conn
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Run a block of writes in one IMMEDIATE transaction on this thread's
+        connection. Nested use joins the outer transaction.
+        """
+        conn = self.connection()
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+    def close(self):
+        """Close the calling thread's connection, if any."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._lock:
+            self._connections.pop(threading.get_ident(), None)
+        conn.close()
+
+    def close_all(self):
+        """Close every connection handed out by this pool (used at shutdown)."""
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        self._local = threading.local()
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def _prune_dead_threads(self):
+        alive = {t.ident for t in threading.enumerate()}
+        for ident in [i for i in self._connections if i not in alive]:
+            try:
+                self._connections.pop(ident).close()
+            except sqlite3.Error:
+                pass
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str, **options) -> ConnectionPool:
+    """Return the process-wide pool for `db_path`, creating it on first use."""
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(db_path, **options)
+            _pools[key] = pool
+        return pool
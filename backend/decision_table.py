@@ -0,0 +1,283 @@
+"""
+Indexed decision tables for decision-node rules.
+
+A decision node's `rules` used to be evaluated one by one on every run. The
+rules are now compiled into a table. Each rule's condition is analysed
+once, and if its top-level conjunction contains an equality or a numeric
+range test on a plain field path:
+
+    input['country'] == 'NO' and input['amount'] >= 1000
+    500 <= state['score'] < 700
+
+the rule is filed under that field in a hash index (equality) or in a sorted
+interval index (ranges). At run time only the rules whose indexed predicate
+can hold for the current field values, plus the rules that could not be
+indexed, are evaluated. Every candidate is still checked against its full
+condition, so the index only ever skips rules that cannot match.
+
+Hit policies (`data.hit_policy`, DMN style):
+
+- `collect` (default, the original behaviour): every matching rule fires in
+  table order, and later rules see the actions of earlier ones;
+- `first`: only the first matching rule in table order fires;
+- `priority`: only the matching rule with the highest `priority` fires
+  (ties go to the earlier rule).
+
+Fields that a rule's action can overwrite are never indexed, since under
+`collect` the value seen by a later rule may differ from the value at the
+start of the node.
+"""
+
+import ast
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from conditions import CompiledCondition, compile_condition
+
+HIT_POLICIES = ("collect", "first", "priority")
+
+MISSING = object()
+_FLIP = {ast.Lt: ast.Gt, ast.LtE: ast.GtE, ast.Gt: ast.Lt, ast.GtE: ast.LtE, ast.Eq: ast.Eq}
+
+# A field is (root name, key path): ("input", ("customer", "tier"))
+Field = Tuple[str, Tuple[Any, ...]]
+
+
+class _Rule:
+    __slots__ = ("index", "rule", "condition", "action", "priority")
+
+    def __init__(self, index: int, rule: Dict[str, Any], condition: CompiledCondition):
+        self.index = index
+        self.rule = rule
+        self.condition = condition
+        self.action = rule.get("action", {})
+        self.priority = rule.get("priority", 0)
+        if not _is_number(self.priority):
+            raise ValueError(f"Rule priority must be a number, got {self.priority!r}")
+
+
+class _IntervalIndex:
+    """Rules keyed by numeric intervals; a lookup is one bisect plus the matching rules."""
+
+    def __init__(self, intervals: List[Tuple[int, float, bool, float, bool]]):
+        bounds = sorted({b for _, lo, _, hi, _ in intervals for b in (lo, hi)
+                         if b not in (float("-inf"), float("inf"))})
+        self.bounds = bounds
+        # Slot 2i+1 is the point bounds[i]; slot 2i is the open gap below it
+        slots: List[List[int]] = [[] for _ in range(2 * len(bounds) + 1)]
+        for rule_index, lo, lo_incl, hi, hi_incl in intervals:
+            if lo == float("-inf"):
+                start = 0
+            else:
+                i = bisect_left(bounds, lo)
+                start = 2 * i + 1 if lo_incl else 2 * i + 2
+            if hi == float("inf"):
+                end = 2 * len(bounds)
+            else:
+                i = bisect_left(bounds, hi)
+                end = 2 * i + 1 if hi_incl else 2 * i
+            for slot in range(start, end + 1):
+                slots[slot].append(rule_index)
+        self.slots = [tuple(s) for s in slots]
+
+    def lookup(self, value: Any) -> Tuple[int, ...]:
+        if not isinstance(value, (int, float)):
+            return ()
+        i = bisect_left(self.bounds, value)
+        if i < len(self.bounds) and self.bounds[i] == value:
+            return self.slots[2 * i + 1]
+        return self.slots[2 * i]
+
+
+class DecisionTable:
+    def __init__(self, rules: List[Dict[str, Any]], hit_policy: Optional[str] = None):
+        hit_policy = hit_policy or "collect"
+        if hit_policy not in HIT_POLICIES:
+            raise ValueError(f"Unknown hit_policy {hit_policy!r} (expected one of {', '.join(HIT_POLICIES)})")
+        self.hit_policy = hit_policy
+        # Rules without a condition never fire (same as before compilation)
+        self.rules = [_Rule(i, rule, compile_condition(rule["condition"]))
+                      for i, rule in enumerate(rules) if rule.get("condition")]
+
+        unsafe = self._fields_written_by_actions()
+        equality: Dict[Field, Dict[Any, List[int]]] = {}
+        ranges: Dict[Field, List[Tuple[int, float, bool, float, bool]]] = {}
+        residual: List[int] = []
+        for position, rule in enumerate(self.rules):
+            anchor = _choose_anchor(rule.condition.tree.value, unsafe)
+            if anchor is None:
+                residual.append(position)
+            elif anchor[0] == "eq":
+                _, field, value = anchor
+                equality.setdefault(field, {}).setdefault(value, []).append(position)
+            else:
+                _, field, lo, lo_incl, hi, hi_incl = anchor
+                ranges.setdefault(field, []).append((position, lo, lo_incl, hi, hi_incl))
+
+        self._counts = {
+            "equality_indexed": sum(len(p) for values in equality.values() for p in values.values()),
+            "range_indexed": sum(len(intervals) for intervals in ranges.values()),
+            "unindexed": len(residual),
+        }
+        self._equality = [(field, {v: tuple(p) for v, p in values.items()}) for field, values in equality.items()]
+        self._ranges = [(field, _IntervalIndex(intervals)) for field, intervals in ranges.items()]
+        self._residual = tuple(residual)
+
+    def candidates(self, state: Dict[str, Any]) -> List[int]:
+        """Positions (in table order) of the rules that might match `state`."""
+        found: Set[int] = set(self._residual)
+        names = {"state": state, "input": state.get("input", {})}
+        for field, values in self._equality:
+            value = extract_field(names, field)
+            if value is MISSING:
+                continue
+            try:
+                found.update(values.get(value, ()))
+            except TypeError:  # unhashable value can never equal a constant
+                pass
+        for field, index in self._ranges:
+            value = extract_field(names, field)
+            if value is not MISSING:
+                found.update(index.lookup(value))
+        return sorted(found)
+
+    def evaluate(self, state: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """Apply the table to a copy of `state`; returns (new_state, actions_taken)."""
+        new_state, fired, errors = self.match(state)
+        for error in errors:
+            print(f"[DecisionNode-Rules] Condition error: {error}")
+        actions_taken = [{"condition": self.rules[p].condition.expression, "action": self.rules[p].action}
+                         for p in fired if isinstance(self.rules[p].action, dict)]
+        return new_state, actions_taken
+
+    def match(self, state: Dict[str, Any]) -> Tuple[Dict[str, Any], List[int], List[Exception]]:
+        """(new_state, positions of the rules that fired, condition errors), without logging."""
+        new_state = state.copy()
+        fired: List[int] = []
+        errors: List[Exception] = []
+        positions = self.candidates(state)
+        if self.hit_policy == "priority":
+            positions.sort(key=lambda p: -self.rules[p].priority)
+
+        for position in positions:
+            rule = self.rules[position]
+            try:
+                matched = rule.condition.evaluate(new_state)
+            except Exception as e:
+                errors.append(e)
+                continue
+            if not matched:
+                continue
+            fired.append(position)
+            if isinstance(rule.action, dict):
+                new_state.update(rule.action)
+            if self.hit_policy != "collect":
+                break
+        return new_state, fired, errors
+
+    def describe(self) -> Dict[str, Any]:
+        return dict(self._counts, hit_policy=self.hit_policy, rules=len(self.rules))
+
+    def _fields_written_by_actions(self) -> Set[str]:
+        """Top-level state keys that some rule's action overwrites."""
+        keys: Set[str] = set()
+        for rule in self.rules:
+            if isinstance(rule.action, dict):
+                keys.update(rule.action)
+        return keys
+
+
+# ----------------------------------------------------------------------
+# Condition analysis
+# ----------------------------------------------------------------------
+
+def _conjuncts(node: ast.AST) -> List[ast.AST]:
+    if isinstance(node, ast.BoolOp) and isinstance(node.op, ast.And):
+        return [c for value in node.values for c in _conjuncts(value)]
+    if isinstance(node, ast.Compare) and len(node.ops) > 1:
+        # a < b <= c is (a < b) and (b <= c)
+        operands = [node.left] + node.comparators
+        return [ast.Compare(left=operands[i], ops=[op], comparators=[operands[i + 1]])
+                for i, op in enumerate(node.ops)]
+    return [node]
+
+
+def field_path(node: ast.AST) -> Optional[Field]:
+    """input['a']['b'] -> ("input", ("a", "b"))."""
+    keys = []
+    while isinstance(node, ast.Subscript):
+        key = constant_value(node.slice)
+        if key is MISSING or not isinstance(key, (str, int)) or isinstance(key, bool):
+            return None
+        keys.append(key)
+        node = node.value
+    if isinstance(node, ast.Name) and node.id in ("input", "state") and keys:
+        return node.id, tuple(reversed(keys))
+    return None
+
+
+def constant_value(node: ast.AST) -> Any:
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)) \
+            and isinstance(node.operand, ast.Constant) and _is_number(node.operand.value):
+        return -node.operand.value if isinstance(node.op, ast.USub) else node.operand.value
+    return MISSING
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _predicates(condition: ast.AST, unsafe: Set[str]):
+    """(field, op type, constant) for every indexable comparison in the top-level conjunction."""
+    for node in _conjuncts(condition):
+        if not isinstance(node, ast.Compare) or len(node.ops) != 1:
+            continue
+        op = type(node.ops[0])
+        if op not in _FLIP:
+            continue
+        left, right = node.left, node.comparators[0]
+        field, value = field_path(left), constant_value(right)
+        if field is None:
+            field, value, op = field_path(right), constant_value(left), _FLIP[op]
+        if field is None or value is MISSING:
+            continue
+        root_key = "input" if field[0] == "input" else field[1][0]
+        if root_key in unsafe:
+            continue
+        yield field, op, value
+
+
+def _choose_anchor(condition: ast.AST, unsafe: Set[str]):
+    intervals: Dict[Field, List[Any]] = {}
+    for field, op, value in _predicates(condition, unsafe):
+        if op is ast.Eq:
+            try:
+                hash(value)
+            except TypeError:
+                continue
+            return "eq", field, value
+        if not _is_number(value):
+            continue
+        lo, lo_incl, hi, hi_incl = intervals.get(field, (float("-inf"), False, float("inf"), False))
+        if op in (ast.Gt, ast.GtE):
+            if value > lo or (value == lo and op is ast.Gt):
+                lo, lo_incl = value, op is ast.GtE
+        else:
+            if value < hi or (value == hi and op is ast.Lt):
+                hi, hi_incl = value, op is ast.LtE
+        intervals[field] = (lo, lo_incl, hi, hi_incl)
+    for field, (lo, lo_incl, hi, hi_incl) in intervals.items():
+        return ("range", field, lo, lo_incl, hi, hi_incl)
+    return None
+
+
+def extract_field(names: Dict[str, Any], field: Field) -> Any:
+    value = names[field[0]]
+    for key in field[1]:
+        try:
+            value = value[key]
+        except (KeyError, IndexError, TypeError):
+            return MISSING
+    return value
@@ -0,0 +1,86 @@
+"""
+Execution progress as Server-Sent Events.
+
+Nodes report progress through langgraph's custom stream: `checkpoint_after`
+writes a `node-started` event before a node runs and a `node-completed` (or
+`node-failed`) event after it, carrying the keys the node changed. Writes are
+no-ops under `ainvoke`, so plain executions pay nothing. A streamed run
+
+    result = await stream_run(graph, state, config, events.emit)
+
+passes each event to `emit` as the graph progresses and returns the final
+state, like `ainvoke`.
+
+`ExecutionEventStream` carries the events of one run to one HTTP response.
+The run is a separate task that keeps going (and persists its result) when the
+client disconnects; the response only drains the queue. Payloads in events are
+trimmed to `max_payload_bytes` of JSON; the full data stays available from
+`/executions/{id}/nodes`.
+"""
+
+import asyncio
+import json
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+DEFAULT_MAX_PAYLOAD_BYTES = 4096
+KEEPALIVE_S = 15.0
+
+# Response headers for an SSE stream; X-Accel-Buffering stops nginx from buffering it
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+# Event fields holding workflow data, trimmed before sending
+_PAYLOAD_FIELDS = ("update", "result")
+
+
+def trim_payload(value: Any, max_bytes: int) -> Any:
+    """`value`, or a marker with its size and a text preview when its JSON exceeds `max_bytes`."""
+    text = json.dumps(value, default=str)
+    if len(text) <= max_bytes:
+        return value
+    return {"_truncated": True, "bytes": len(text), "preview": text[:max_bytes]}
+
+
+def sse_message(event: str, data: Dict[str, Any], event_id: int) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def stream_run(graph, state: Dict[str, Any], config: Dict[str, Any],
+                     emit: Callable[[str, Dict[str, Any]], None]) -> Dict[str, Any]:
+    """Run `graph` like `ainvoke`, passing its node events to `emit`; returns the final state."""
+    final = state
+    async for mode, chunk in graph.astream(state, config=config, stream_mode=["custom", "values"]):
+        if mode == "custom":
+            emit(chunk["event"], chunk)
+        else:
+            final = chunk
+    return final
+
+
+class ExecutionEventStream:
+    def __init__(self, max_payload_bytes: int = DEFAULT_MAX_PAYLOAD_BYTES):
+        self.max_payload_bytes = max_payload_bytes
+        self._queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+        self._next_id = 0
+
+    def emit(self, event: str, data: Dict[str, Any]):
+        data = {k: v for k, v in data.items() if k != "event"}
+        for field in _PAYLOAD_FIELDS:
+            if field in data:
+                data[field] = trim_payload(data[field], self.max_payload_bytes)
+        self._next_id += 1
+        self._queue.put_nowait(sse_message(event, data, self._next_id))
+
+    def close(self):
+        self._queue.put_nowait(None)
+
+    async def messages(self) -> AsyncIterator[str]:
+        """SSE text until the run closes the stream, with keep-alive comments while idle."""
+        while True:
+            try:
+                message = await asyncio.wait_for(self._queue.get(), KEEPALIVE_S)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if message is None:
+                return
+            yield message
@@ -0,0 +1,118 @@
+"""
+LRU cache of compiled workflow graphs.
+
+Compiling a graph (building the StateGraph, one closure per node, one routing
+function per conditional source, then `compile()`) depends only on the graph
+JSON, so compiled graphs are cached by the graph's content hash and shared by
+every execution of the same flow. Per-execution context is not baked into the
+closures; it is passed at invoke time:
+
+    compiled = graph_cache.get(graph_json)
+    await compiled.ainvoke(state, config=execution_config(execution_id))
+
+and read inside a node with `config_execution_id(config)`. The config also
+carries a per-run `node_timings` dict (node id -> start/end of its last run)
+that join nodes summarise, and, for nodes inside a parallel branch, the
+branch id (`config_branch_id`).
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from graph_store import canonical_json, graph_hash
+
+DEFAULT_MAX_SIZE = 128
+
+
+def execution_config(execution_id: str, resume_at: Optional[List[str]] = None) -> Dict[str, Any]:
+    """RunnableConfig carrying the execution id (and the nodes a resumed run starts at) to a run."""
+    configurable = {"execution_id": execution_id, "node_timings": {}}
+    if resume_at:
+        configurable["resume_at"] = list(resume_at)
+    return {"configurable": configurable}
+
+
+def config_execution_id(config: Optional[Dict[str, Any]]) -> Optional[str]:
+    return ((config or {}).get("configurable") or {}).get("execution_id")
+
+
+def config_resume_at(config: Optional[Dict[str, Any]]) -> Optional[List[str]]:
+    return ((config or {}).get("configurable") or {}).get("resume_at")
+
+
+def config_node_timings(config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """The run's node timing table; a throwaway dict when the config has none."""
+    configurable = (config or {}).get("configurable") or {}
+    timings = configurable.get("node_timings")
+    return timings if timings is not None else {}
+
+
+def config_branch_id(config: Optional[Dict[str, Any]]) -> Optional[str]:
+    return ((config or {}).get("configurable") or {}).get("branch_id")
+
+
+def branch_config(config: Dict[str, Any], branch_id: Optional[str]) -> Dict[str, Any]:
+    """`config` for a node of parallel branch `branch_id` (unchanged outside branches)."""
+    if branch_id is None:
+        return config
+    return dict(config, configurable=dict(config.get("configurable") or {}, branch_id=branch_id))
+
+
+class CompiledGraphCache:
+    def __init__(self, build: Callable[[Dict[str, Any]], Any], max_size: int = DEFAULT_MAX_SIZE):
+        self.build = build
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._graphs: "OrderedDict[str, Any]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._compile_ms_total = 0.0
+        self._compile_ms_max = 0.0
+
+    def get(self, graph: Dict[str, Any]):
+        """Return the compiled graph for `graph`, compiling it on first use."""
+        digest = graph_hash(graph)
+        with self._lock:
+            compiled = self._graphs.get(digest)
+            if compiled is not None:
+                self._graphs.move_to_end(digest)
+                self._hits += 1
+                return compiled
+            self._misses += 1
+
+        # Build from a private copy: node closures keep references into the graph,
+        # and the caller's dict may be mutated after this execution.
+        started = time.perf_counter()
+        compiled = self.build(json.loads(canonical_json(graph)))
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        with self._lock:
+            self._compile_ms_total += elapsed_ms
+            self._compile_ms_max = max(self._compile_ms_max, elapsed_ms)
+            # Another thread may have compiled the same graph meanwhile; keep the first one
+            compiled = self._graphs.setdefault(digest, compiled)
+            self._graphs.move_to_end(digest)
+            while len(self._graphs) > self.max_size:
+                self._graphs.popitem(last=False)
+        return compiled
+
+    def clear(self):
+        with self._lock:
+            self._graphs.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._graphs),
+                "max_size": self.max_size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": (self._hits / lookups) if lookups else None,
+                "compile_ms_total": round(self._compile_ms_total, 3),
+                "compile_ms_avg": round(self._compile_ms_total / self._misses, 3) if self._misses else None,
+                "compile_ms_max": round(self._compile_ms_max, 3),
+            }
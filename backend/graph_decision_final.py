@@ -1,18 +1,42 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Any, Dict, List, Optional
-from langgraph.graph import StateGraph, END
-from simpleeval import simple_eval
-import requests
-import uvicorn
-import re
+from langgraph.graph import StateGraph
+from langgraph.types import StreamWriter
+import asyncio
 import copy
+import uvicorn
 import sqlite3
 import json
 import uuid
+import base64
+import os
+import time
 from datetime import datetime
 
+from blob_codec import BlobCodec
+from db_pool import get_pool
+from execution_events import DEFAULT_MAX_PAYLOAD_BYTES, SSE_HEADERS, ExecutionEventStream, stream_run
+from decision_table import DecisionTable
+from graph_cache import (CompiledGraphCache, branch_config, config_branch_id, config_execution_id,
+                         config_node_timings, execution_config)
+from graph_routing import RoutingIndex, add_routes
+from graph_state import WorkflowState, state_delta
+from graph_store import GraphStore
+from http_client import AsyncHttpClient
+from job_queue import JobQueue, JobWorkerPool
+from leases import LeaseTable
+from migrations import apply_migrations
+from path_access import deep_get
+from response_cache import STALE, ResponseCacheRegistry
+from script_runner import ScriptEngine, ScriptError, ScriptLimitExceeded
+from single_flight import IDEMPOTENT_METHODS, SingleFlight, request_key
+from state_checkpoints import StateCheckpointer
+from template_engine import compile_template
+from write_behind import get_journal
+
 # -------------------------------------------------------------------
 # FastAPI setup
 # -------------------------------------------------------------------
@@ -25,6 +49,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # -------------------------------------------------------------------
@@ -33,8 +58,51 @@ app.add_middleware(
 
 DB_PATH = "workflow.db"
 
+db_pool = get_pool(DB_PATH)
+# Node records and form responses are written behind the graph
+journal = get_journal(db_pool)
+# Graph definitions are stored once per distinct graph and referenced by hash
+graph_store = GraphStore(db_pool)
+# Payloads above the codec threshold are stored compressed
+blob_codec = BlobCodec()
+# State is persisted as JSON Patch deltas with periodic full snapshots
+checkpointer = StateCheckpointer(db_pool, journal, blob_codec)
+# Decision scripts run in worker processes with a timeout, CPU and memory limits
+SCRIPT_WORKERS = 2
+SCRIPT_TIMEOUT_S = 2.0
+SCRIPT_MEMORY_MB = 256
+script_engine = ScriptEngine(SCRIPT_WORKERS, SCRIPT_TIMEOUT_S, memory_mb=SCRIPT_MEMORY_MB)
+# Service nodes share keep-alive connection pools, one per host; idle host pools are closed
+SERVICE_TIMEOUT_S = 10.0
+SERVICE_MAX_CONNECTIONS_PER_HOST = 1000
+SERVICE_MAX_KEEPALIVE_PER_HOST = 200
+SERVICE_MAX_HOSTS = 64
+SERVICE_HOST_IDLE_S = 300.0
+http_client = AsyncHttpClient(SERVICE_TIMEOUT_S, SERVICE_MAX_CONNECTIONS_PER_HOST, SERVICE_MAX_KEEPALIVE_PER_HOST,
+                              max_hosts=SERVICE_MAX_HOSTS, host_idle_s=SERVICE_HOST_IDLE_S)
+# /execute/async runs are queued in the database and run by a pool of workers holding renewable
+# leases; a job whose worker died is claimed again, up to JOB_MAX_ATTEMPTS claims
+JOB_WORKERS = 4
+JOB_LEASE_S = 30.0
+JOB_MAX_ATTEMPTS = 3
+JOB_POLL_S = 1.0
+job_queue = JobQueue(db_pool)
+# Several server processes may share workflow.db; resuming an execution is claimed through a lease row
+leases = LeaseTable(db_pool)
+RESUME_LEASE_S = 30.0
+# Longest a pause waits for its checkpoints to commit before the row says paused
+PAUSE_FLUSH_TIMEOUT_S = 5.0
+# Per-node response caches for service nodes with a `cache` block
+response_caches = ResponseCacheRegistry()
+# Identical in-flight service calls are shared (single flight)
+service_calls = SingleFlight()
+
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
+    with db_pool.transaction() as conn:
+        _create_tables(conn)
+
+
+def _create_tables(conn: sqlite3.Connection):
     cur = conn.cursor()
 
     cur.execute("""
@@ -45,11 +113,17 @@ def init_db():
             current_node_id TEXT,
             state_data TEXT NOT NULL,
             graph_json TEXT NOT NULL,
+            graph_hash TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     """)
 
+    GraphStore.create_table(conn)
+    StateCheckpointer.create_table(conn)
+    JobQueue.create_table(conn)
+    LeaseTable.create_table(conn)
+
     cur.execute("""
         CREATE TABLE IF NOT EXISTS node_executions (
             id TEXT PRIMARY KEY,
@@ -60,10 +134,13 @@ def init_db():
             status TEXT NOT NULL,
             request_data TEXT,
             response_data TEXT,
+            request_codec TEXT,
+            response_codec TEXT,
             error_message TEXT,
             execution_time_ms INTEGER,
             started_at TIMESTAMP,
             completed_at TIMESTAMP,
+            branch_id TEXT,
             FOREIGN KEY (workflow_execution_id) REFERENCES workflow_executions(id)
         )
     """)
@@ -79,136 +156,156 @@ def init_db():
         )
     """)
 
-    conn.commit()
-    conn.close()
+    # Columns and indexes added after the tables were first released
+    apply_migrations(conn)
 
 init_db()
 
 def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-# -------------------------------------------------------------------
-# Utility: Recursive lookup and template substitution
-# -------------------------------------------------------------------
-
-def deep_get(data: Dict[str, Any], path: str) -> Any:
-    """Get deeply nested dict/list value using dot + bracket notation."""
-    if not path:
-        return data
-    parts = re.split(r'\.(?![^\[]*\])', path)
-    for part in parts:
-        match = re.findall(r'([^\[\]]+)|\[(\d+)\]', part)
-        for key, index in match:
-            if key:
-                if isinstance(data, dict):
-                    data = data.get(key)
-                else:
-                    return None
-            elif index is not None:
-                if isinstance(data, list):
-                    try:
-                        data = data[int(index)]
-                    except (IndexError, ValueError):
-                        return None
-                else:
-                    return None
-            if data is None:
-                return None
-    return data
-
-
-def render_template(obj: Any, context: Dict[str, Any]):
-    """Replace placeholders like {input.company.name} recursively."""
-    if isinstance(obj, str):
-        matches = re.findall(r"\{([^{}]+)\}", obj)
-        for m in matches:
-            val = deep_get(context, m.strip())
-            if val is not None:
-                obj = obj.replace("{" + m + "}", str(val))
-        return obj
-    elif isinstance(obj, dict):
-        return {k: render_template(v, context) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [render_template(v, context) for v in obj]
-    return obj
-
+    """Return this thread's pooled connection (do not close it)."""
+    return db_pool.connection()
 
 # -------------------------------------------------------------------
 # Database Helper Functions
 # -------------------------------------------------------------------
 
-def save_workflow_execution(execution_id: str, workflow_name: str, status: str, current_node: str, state: Dict, graph: Dict):
-    conn = get_db()
-    cur = conn.cursor()
-    # Use INSERT OR REPLACE so we update existing execution row if present
-    cur.execute("""
-        INSERT OR REPLACE INTO workflow_executions 
-        (id, workflow_name, status, current_node_id, state_data, graph_json, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (execution_id, workflow_name, status, current_node, json.dumps(state), json.dumps(graph), datetime.now().isoformat()))
-    conn.commit()
-    conn.close()
+def save_workflow_execution(execution_id: str, workflow_name: str, status: str, current_node: str, state: Dict, graph: Dict, new: bool = False):
+    # State lives in state_checkpoints; the row keeps an empty state_data (`new`: first save of a fresh execution).
+    # Blocking (BEGIN IMMEDIATE may wait out another process's write): async callers run it in a thread
+    checkpointer.checkpoint(execution_id, state, current_node, new=new)
+    graph_hash = graph_store.put(graph)
+    if status == "paused" and not journal.flush(PAUSE_FLUSH_TIMEOUT_S):
+        # Any process may resume it once the row says paused, so its checkpoints should be committed first
+        print(f"[Checkpoints] Checkpoints of {execution_id} not committed after {PAUSE_FLUSH_TIMEOUT_S:g}s; marking it paused anyway")
+    with db_pool.transaction() as conn:
+        # Upsert so we update the existing execution row if present and keep its created_at
+        conn.execute("""
+            INSERT INTO workflow_executions 
+            (id, workflow_name, status, current_node_id, state_data, graph_json, graph_hash, updated_at)
+            VALUES (?, ?, ?, ?, '', '', ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                workflow_name = excluded.workflow_name,
+                state_data = excluded.state_data,
+                graph_json = excluded.graph_json,
+                status = excluded.status,
+                current_node_id = excluded.current_node_id,
+                graph_hash = excluded.graph_hash,
+                updated_at = excluded.updated_at
+        """, (execution_id, workflow_name, status, current_node, graph_hash, datetime.now().isoformat()))
+    if status != "running":
+        checkpointer.discard(execution_id)
 
 def save_node_execution(workflow_exec_id: str, node_id: str, node_type: str, node_label: str, 
                         status: str, request_data: Any = None, response_data: Any = None, 
-                        error_msg: str = None, exec_time: int = None):
-    conn = get_db()
-    cur = conn.cursor()
+                        error_msg: str = None, exec_time: int = None,
+                        started_at: Optional[datetime] = None, branch_id: Optional[str] = None):
     node_exec_id = str(uuid.uuid4())
-    timestamp = datetime.now().isoformat()
-    
-    cur.execute("""
+    now = datetime.now()
+    request_blob, request_codec = blob_codec.encode(json.dumps(request_data) if request_data else None)
+    response_blob, response_codec = blob_codec.encode(json.dumps(response_data) if response_data else None)
+    row = (node_exec_id, workflow_exec_id, node_id, node_type, node_label, status,
+           request_blob, response_blob, request_codec, response_codec,
+           error_msg, exec_time, (started_at or now).isoformat(),
+           now.isoformat() if status == 'completed' else None, branch_id)
+
+    journal.submit("""
         INSERT INTO node_executions 
         (id, workflow_execution_id, node_id, node_type, node_label, status, 
-         request_data, response_data, error_message, execution_time_ms, started_at, completed_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (node_exec_id, workflow_exec_id, node_id, node_type, node_label, status,
-          json.dumps(request_data) if request_data else None,
-          json.dumps(response_data) if response_data else None,
-          error_msg, exec_time, timestamp, timestamp if status == 'completed' else None))
-    conn.commit()
-    conn.close()
+         request_data, response_data, request_codec, response_codec,
+         error_message, execution_time_ms, started_at, completed_at, branch_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, row)
     return node_exec_id
 
 def save_form_response(workflow_exec_id: str, node_id: str, form_data: Dict):
-    conn = get_db()
-    cur = conn.cursor()
     form_id = str(uuid.uuid4())
-    cur.execute("""
+    journal.submit("""
         INSERT INTO form_responses (id, workflow_execution_id, node_id, form_data)
         VALUES (?, ?, ?, ?)
     """, (form_id, workflow_exec_id, node_id, json.dumps(form_data)))
-    conn.commit()
-    conn.close()
 
 def get_workflow_execution(execution_id: str):
     conn = get_db()
     cur = conn.cursor()
     cur.execute("SELECT * FROM workflow_executions WHERE id = ?", (execution_id,))
     row = cur.fetchone()
-    conn.close()
     if row:
-        return dict(row)
+        workflow_exec = dict(row)
+        if workflow_exec.get("graph_hash"):
+            workflow_exec["graph_json"] = graph_store.get_json(workflow_exec["graph_hash"])
+        return workflow_exec
     return None
 
+
+def load_execution_graph(workflow_exec: Dict) -> Dict:
+    """Parsed graph of an execution row. Shared with the graph store cache, so do not mutate it."""
+    if workflow_exec.get("graph_hash"):
+        graph = graph_store.get(workflow_exec["graph_hash"])
+        if graph is not None:
+            return graph
+    return json.loads(workflow_exec["graph_json"] or "{}")
+
+
+def load_execution_state(workflow_exec: Dict) -> Dict:
+    """Reconstruct the latest state of an execution row from its checkpoints."""
+    if workflow_exec.get("state_data"):
+        # Rows written before incremental checkpoints carry the full state inline
+        return json.loads(workflow_exec["state_data"])
+    state = checkpointer.load(workflow_exec["id"])
+    return state if state is not None else {}
+
+
+def decode_node_execution(row) -> Dict:
+    """node_executions row as a dict, with compressed payloads decoded back to JSON text."""
+    node_exec = dict(row)
+    node_exec["request_data"] = blob_codec.decode(node_exec["request_data"], node_exec.pop("request_codec", None))
+    node_exec["response_data"] = blob_codec.decode(node_exec["response_data"], node_exec.pop("response_codec", None))
+    return node_exec
+
 # -------------------------------------------------------------------
 # Node: Service Node
 # -------------------------------------------------------------------
 
-def make_service_node(node_data: Dict[str, Any], execution_id: str):
+def make_service_node(node_data: Dict[str, Any]):
     url = node_data["data"]["url"]
     method = node_data["data"].get("method", "POST").upper()
-    request_template = node_data["data"].get("request", {})
+    # Compiled once per node; compiled graphs are cached, so once per graph
+    request_template = compile_template(node_data["data"].get("request", {}))
     mappings = node_data["data"].get("mappings", [])
+    # Opt-in response cache, shared across compiles of this node (ValueError on bad settings)
+    cache_config = node_data["data"].get("cache")
+    cache = response_caches.for_node(node_data["id"], cache_config) if cache_config else None
+    # Concurrent identical calls share one request; default on only for idempotent methods
+    coalesce = bool(node_data["data"].get("coalesce", method in IDEMPOTENT_METHODS))
 
-    def run_fn(state: Dict[str, Any]):
+    async def send(payload: Dict[str, Any]):
+        try:
+            resp = await http_client.request(method, url, json=payload)
+            ok = resp.status_code < 400
+            return (resp.json() if ok else {"error": resp.text}), ok, None
+        except Exception as e:
+            return {"error": str(e)}, False, str(e)
+
+    async def call(payload: Dict[str, Any]):
+        """`send`, or a copy of the identical call's result when one is in flight; adds `coalesced`."""
+        if not coalesce:
+            return (*await send(payload), False)
+        (data, ok, error_msg), coalesced = await service_calls.do(request_key(method, url, payload),
+                                                                  lambda: send(payload))
+        return (copy.deepcopy(data) if coalesced else data), ok, error_msg, coalesced
+
+    async def refresh(payload: Dict[str, Any]):
+        """Background call for stale-while-revalidate; the new response, or None on failure."""
+        data, ok, _, _ = await call(payload)
+        return data if ok else None
+
+    async def run_fn(state: Dict[str, Any], config: Dict[str, Any]):
+        execution_id = config_execution_id(config)
         start_time = datetime.now()
         node_id = node_data["id"]
         node_label = node_data.get("data", {}).get("label", node_id)
 
-        payload = render_template(copy.deepcopy(request_template), state)
+        payload = request_template.render(state)
 
         # Apply explicit mappings (multiple supported)
         for m in mappings:
@@ -225,20 +322,28 @@ def make_service_node(node_data: Dict[str, Any], execution_id: str):
                     val = str(val).strip()
                 payload[target] = val
 
-        try:
-            resp = requests.request(method, url, json=payload, timeout=10)
-            data = resp.json() if resp.ok else {"error": resp.text}
-            error_msg = None
-        except Exception as e:
-            data = {"error": str(e)}
-            error_msg = str(e)
+        cache_key, data, freshness = None, None, None
+        if cache is not None:
+            cache_key = cache.key(method, url, payload)
+            data, freshness = cache.lookup(cache_key)
+
+        if freshness is not None:
+            if freshness == STALE:
+                cache.revalidate(cache_key, lambda: refresh(payload))
+            error_msg, status = None, "cached"
+        else:
+            data, ok, error_msg, coalesced = await call(payload)
+            status = "coalesced" if coalesced else "completed"
+            if ok and cache is not None and not coalesced:
+                cache.store(cache_key, data)
 
         exec_time = int((datetime.now() - start_time).total_seconds() * 1000)
 
         # Save node execution to DB
         save_node_execution(
             execution_id, node_id, "service", node_label,
-            "completed", payload, data, error_msg, exec_time
+            status, payload, data, error_msg, exec_time,
+            started_at=start_time, branch_id=config_branch_id(config)
         )
 
         # Store response in state
@@ -255,47 +360,46 @@ def make_service_node(node_data: Dict[str, Any], execution_id: str):
 # Node: Drools / Decision Node
 # -------------------------------------------------------------------
 
-def make_decision_node(node_data: Dict[str, Any], execution_id: str):
+def make_decision_node(node_data: Dict[str, Any]):
     data = node_data.get("data", {})
     rules = data.get("rules", [])
     script = data.get("script")
+    # Syntax errors fail the graph compile; the code itself is cached by hash
+    compiled_script = script_engine.compile(script) if script else None
+    # Rules are indexed once per graph compile; conditions are validated here (ConditionError)
+    table = DecisionTable(rules, data.get("hit_policy"))
 
-    def run_fn(state: Dict[str, Any]):
+    async def run_fn(state: Dict[str, Any], config: Dict[str, Any]):
+        execution_id = config_execution_id(config)
         start_time = datetime.now()
         node_id = node_data["id"]
         node_label = node_data.get("data", {}).get("label", node_id)
 
-        new_state = state.copy()
-        actions_taken = []
-
-        # Rule-based evaluation (multiple conditions)
-        if rules:
-            for rule in rules:
-                cond = rule.get("condition")
-                try:
-                    if simple_eval(cond, names={"state": new_state, "input": new_state.get("input", {})}):
-                        action = rule.get("action", {})
-                        if isinstance(action, dict):
-                            new_state.update(action)
-                            actions_taken.append({"condition": cond, "action": action})
-                except Exception as e:
-                    print(f"[DecisionNode-Rules] Condition error: {e}")
-
-        # Script mode (Python block)
-        if script:
+        # Rule-based evaluation: only rules the table's indexes select are evaluated
+        new_state, actions_taken = table.evaluate(state)
+
+        # Script mode (Python block), run in the script worker pool
+        script_error = None
+        if compiled_script is not None:
             try:
-                local_env = {"state": new_state}
-                exec(script, {}, local_env)
-                new_state = local_env.get("state", new_state)
-            except Exception as e:
+                # Blocks on the worker's pipe; keep it off the event loop
+                new_state = await asyncio.to_thread(script_engine.run, compiled_script, new_state)
+            except ScriptLimitExceeded as e:
+                script_error = str(e)
+                print(f"[DecisionNode-Script] {script_error}")
+            except ScriptError as e:
                 print(f"[DecisionNode-Script] Script error: {e}")
+                if e.state is not None:
+                    new_state = e.state
 
         exec_time = int((datetime.now() - start_time).total_seconds() * 1000)
 
         # Save node execution to DB
         save_node_execution(
             execution_id, node_id, "decision", node_label,
-            "completed", {"rules": rules, "script": script}, {"actions_taken": actions_taken}, None, exec_time
+            "failed" if script_error else "completed", {"rules": rules, "script": script},
+            {"actions_taken": actions_taken}, script_error, exec_time,
+            started_at=start_time, branch_id=config_branch_id(config)
         )
 
         return new_state
@@ -307,12 +411,13 @@ def make_decision_node(node_data: Dict[str, Any], execution_id: str):
 # Node: Form Node (Pauses workflow)
 # -------------------------------------------------------------------
 
-def make_form_node(node_data: Dict[str, Any], execution_id: str):
+def make_form_node(node_data: Dict[str, Any]):
     node_id = node_data["id"]
     node_label = node_data.get("data", {}).get("label", node_id)
     form_schema = node_data.get("data", {}).get("schema", {})
 
-    def run_fn(state: Dict[str, Any]):
+    async def run_fn(state: Dict[str, Any], config: Dict[str, Any]):
+        execution_id = config_execution_id(config)
         # Mark as paused and save to DB (node execution record)
         save_node_execution(
             execution_id, node_id, "form", node_label,
@@ -331,6 +436,18 @@ def make_form_node(node_data: Dict[str, Any], execution_id: str):
     return run_fn
 
 
+# -------------------------------------------------------------------
+# Node: Join Node
+# Waits for every incoming branch (see graph_routing); checkpoint_after
+# records the join with the timing of each branch
+# -------------------------------------------------------------------
+
+def make_join_node(node_data: Dict[str, Any]):
+    async def run_fn(state: Dict[str, Any], config: Dict[str, Any]):
+        return state
+
+    return run_fn
+
 # -------------------------------------------------------------------
 # Node Factory
 # -------------------------------------------------------------------
@@ -339,6 +456,7 @@ NODE_FACTORY = {
     "service": make_service_node,
     "decision": make_decision_node,
     "form": make_form_node,
+    "join": make_join_node,
 }
 
 
@@ -346,82 +464,76 @@ NODE_FACTORY = {
 # Graph Builder
 # -------------------------------------------------------------------
 
-def build_graph_from_json(graph_json: Dict[str, Any], execution_id: str):
-    g = StateGraph(dict)
+def save_join_execution(execution_id: str, join_id: str, routing: RoutingIndex, config: Dict[str, Any]):
+    """Record that the branches into `join_id` finished, with the start/end of each."""
+    summary = routing.branch_timings(join_id, config_node_timings(config))
+    save_node_execution(
+        execution_id, join_id, "join", join_id, "completed",
+        {"waited_for": list(routing.joins[join_id])}, summary, None, summary["wall_ms"],
+        branch_id=config_branch_id(config)
+    )
+
+
+def checkpoint_after(node_id: str, node_type: str, func, routing: RoutingIndex):
+    """
+    Wrap a node function: it gets a private copy of the state, its run is
+    timed for join summaries, and only the keys it changed are checkpointed
+    and returned (merged by WorkflowState, so parallel branches don't clash).
+    Progress events go to the custom stream, which only streamed runs read.
+    """
+    branch_id = routing.branches.get(node_id)
+    event = {"node_id": node_id, "node_type": node_type, "branch_id": branch_id}
+
+    async def run_fn(state: Dict[str, Any], config: Dict[str, Any], writer: StreamWriter):
+        execution_id = config_execution_id(config)
+        if node_id in routing.join_branches:
+            save_join_execution(execution_id, node_id, routing, config)
+        config = branch_config(config, branch_id)
+        started = datetime.now()
+        writer(dict(event, event="node-started", started_at=started.isoformat()))
+        try:
+            result = await func(dict(state), config)
+        except Exception as e:
+            writer(dict(event, event="node-failed", error=str(e)))
+            raise
+        finished = datetime.now()
+        config_node_timings(config)[node_id] = (started, finished)
+        update = state_delta(state, result)
+        checkpointer.checkpoint_update(execution_id, update, node_id)
+        writer(dict(event, event="node-completed", update=update,
+                    duration_ms=int((finished - started).total_seconds() * 1000)))
+        return update
+
+    return run_fn
+
+
+def build_graph_from_json(graph_json: Dict[str, Any]):
+    """Compile a graph. Execution context comes from the invoke config, so the result is reusable."""
+    g = StateGraph(WorkflowState)
+    routing = routing_cache.get(graph_json)
 
     # Register nodes
     for node in graph_json.get("nodes", []):
         ntype = node["type"]
-        func = NODE_FACTORY[ntype](node, execution_id)
-        g.add_node(node["id"], func)
-
-    # Handle edges (with multiple conditional edges per node)
-    edges_by_source = {}
-    for e in graph_json.get("edges", []):
-        edges_by_source.setdefault(e["source"], []).append(e)
-
-    for source, edges in edges_by_source.items():
-        if any("condition" in e for e in edges):
-            def conditional_fn(state, edges=edges):
-                for edge in edges:
-                    cond = edge.get("condition")
-                    if not cond:
-                        continue
-                    try:
-                        if simple_eval(cond, names={"state": state, "input": state.get("input", {})}):
-                            return edge["target"]
-                    except Exception as ex:
-                        print("Condition eval error:", ex)
-                # fallback (no match)
-                for e in edges:
-                    if "condition" not in e:
-                        return e["target"]
-                return None
-            g.add_conditional_edges(source, conditional_fn)
-        else:
-            for e in edges:
-                g.add_edge(e["source"], e["target"])
-
-    # Entry and end
-    entry = graph_json.get("nodes", [None])[0]["id"] if graph_json.get("nodes") else None
-    if entry:
-        g.set_entry_point(entry)
-    if graph_json.get("nodes"):
-        g.add_edge(graph_json["nodes"][-1]["id"], END)
+        func = NODE_FACTORY[ntype](node)
+        g.add_node(node["id"], checkpoint_after(node["id"], ntype, func, routing))
+
+    add_routes(g, routing)
     return g.compile()
 
 
-# -------------------------------------------------------------------
-# Helpers for resume: find next node after a given node (evaluate conditions)
-# -------------------------------------------------------------------
+# Compiled graphs and routing indexes are shared by every execution of the same graph JSON
+routing_cache = CompiledGraphCache(RoutingIndex)
+graph_cache = CompiledGraphCache(build_graph_from_json)
 
-def resolve_next_node(graph_json: Dict[str, Any], source_node_id: str, state: Dict[str, Any]) -> Optional[str]:
-    """
-    Given the graph JSON and current node id, find the target node to continue to.
-    Evaluate conditional edges using simple_eval with names={"state": state, "input": state.get("input", {})}.
-    If multiple edges, the first matching condition is returned. If none match, prefer an unconditional edge.
-    """
-    candidates = [e for e in graph_json.get("edges", []) if e.get("source") == source_node_id]
-    if not candidates:
-        return None
-
-    # Try evaluate conditional edges first
-    for e in candidates:
-        cond = e.get("condition")
-        if cond:
-            try:
-                if simple_eval(cond, names={"state": state, "input": state.get("input", {})}):
-                    return e.get("target")
-            except Exception as ex:
-                print(f"[resolve_next_node] cond eval error for '{cond}': {ex}")
 
-    # fallback to first unconditional edge
-    for e in candidates:
-        if "condition" not in e:
-            return e.get("target")
+def routing_for(graph_json: Dict[str, Any]) -> RoutingIndex:
+    """The graph's routing index; 400 if its edges, roots, conditions or joins are invalid."""
+    try:
+        return routing_cache.get(graph_json)
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid graph: {e}")
 
-    # nothing matched
-    return None
 
 # -------------------------------------------------------------------
 # FastAPI Models
@@ -443,171 +555,411 @@ class ResumeRequest(BaseModel):
     execution_id: str
     form_data: Dict[str, Any]
 
+class AnalyzeGraphRequest(BaseModel):
+    graph: Dict[str, Any]
+
 
 # -------------------------------------------------------------------
 # API Endpoints
 # -------------------------------------------------------------------
 
-@app.post("/execute", response_model=ExecuteResponse)
-def execute_workflow(req: ExecuteRequest):
-    execution_id = str(uuid.uuid4())
+def finish_execution(execution_id: str, workflow_name: str, result: Dict[str, Any], graph_json: Dict[str, Any],
+                     routing: RoutingIndex) -> ExecuteResponse:
+    """Persist a run that paused at a form or completed, and build its response."""
+    # Check if workflow is paused at form
+    if "_paused_at_form" in result:
+        form_info = result["_paused_at_form"]
+        # Save workflow as paused with current_node set to the form node
+        save_workflow_execution(
+            execution_id, workflow_name, "paused",
+            form_info["node_id"], result, graph_json
+        )
+        return ExecuteResponse(
+            status="paused",
+            execution_id=execution_id,
+            result=result,
+            paused_at_form=form_info
+        )
+
+    # Workflow completed successfully
+    save_workflow_execution(
+        execution_id, workflow_name, "completed",
+        routing.exit_node or "unknown",
+        result, graph_json
+    )
+    return ExecuteResponse(
+        status="success",
+        execution_id=execution_id,
+        result=result
+    )
+
+
+def fail_execution(execution_id: str, workflow_name: str, graph_json: Dict[str, Any], error: Exception) -> ExecuteResponse:
+    save_workflow_execution(
+        execution_id, workflow_name, "failed",
+        "unknown", {"error": str(error)}, graph_json
+    )
+    return ExecuteResponse(
+        status="error",
+        execution_id=execution_id,
+        result={"error": str(error)}
+    )
+
+
+def paused_execution(execution_id: str) -> Dict[str, Any]:
+    """The workflow_executions row of a paused execution; 404/400 otherwise."""
+    workflow_exec = get_workflow_execution(execution_id)
+
+    if not workflow_exec:
+        raise HTTPException(status_code=404, detail="Workflow execution not found")
 
+    if workflow_exec["status"] != "paused":
+        raise HTTPException(status_code=400, detail="Workflow is not paused")
+
+    return workflow_exec
+
+
+def claim_resume(execution_id: str) -> Dict[str, Any]:
+    """
+    Take the resume lease of a paused execution and return its row; 409 while
+    another worker (in any process) is resuming it, 404/400 as paused_execution,
+    400 if its stored graph cannot be routed.
+    The caller runs the resume inside `leases.kept(resume_lease(execution_id), ...)`.
+    """
+    if not leases.acquire(resume_lease(execution_id), RESUME_LEASE_S):
+        raise HTTPException(status_code=409, detail="Workflow is already being resumed")
     try:
-        state = {"input": req.inputs}
+        # Read under the lease: a resume that finished just before may have moved it on
+        workflow_exec = paused_execution(execution_id)
+        # 400 while the lease is released here, rather than failing the paused execution later
+        routing_for(load_execution_graph(workflow_exec))
+        return workflow_exec
+    except Exception:
+        leases.release(resume_lease(execution_id))
+        raise
+
+
+def resume_lease(execution_id: str) -> str:
+    return f"resume:{execution_id}"
+
+
+def begin_resume(req: ResumeRequest, workflow_exec: Dict[str, Any]):
+    """
+    Apply submitted form data to a paused execution and mark it running.
+    Returns (state, graph_json, routing, resume_at); resume_at == [] means nothing is left to run.
+    """
+    # Parse stored state and graph
+    state = load_execution_state(workflow_exec)
+    graph_json = load_execution_graph(workflow_exec)
+    routing = routing_cache.get(graph_json)
+
+    # Remove pause marker and add form data to state
+    resume_at = None
+    paused_node_id = None
+    if "_paused_at_form" in state:
+        paused_info = state.pop("_paused_at_form")
+        paused_node_id = paused_info["node_id"]
+
+        # Save form response
+        save_form_response(req.execution_id, paused_node_id, req.form_data)
+
+        # Update node execution as completed (form node)
+        save_node_execution(
+            req.execution_id, paused_node_id, "form", paused_node_id,
+            "completed", None, req.form_data, None, 0
+        )
+
+        # Add form data to state
+        state[paused_node_id] = {"form_data": req.form_data}
+        # merge form into input for easier condition checks
+        if "input" not in state:
+            state["input"] = {}
+        if isinstance(state["input"], dict):
+            state["input"].update(req.form_data)
+
+        # Resolve next nodes after this form (evaluate conditions if any);
+        # a form without outgoing edges completes the run
+        resume_at = routing.next_nodes(paused_node_id, state)
+
+    # Update workflow status to running and set current_node_id to the node we will start from
+    start_at_node = resume_at[0] if resume_at else workflow_exec.get("current_node_id") or paused_node_id
+    save_workflow_execution(
+        req.execution_id, workflow_exec["workflow_name"], "running",
+        start_at_node, state, graph_json
+    )
+    return state, graph_json, routing, resume_at
+
+
+async def run_execution(execution_id: str, workflow_name: str, graph_json: Dict[str, Any],
+                        inputs: Dict[str, Any], new: bool = False) -> ExecuteResponse:
+    """
+    Run a graph from its entry and persist the outcome (for /execute and queued jobs).
+    `new`: the execution was created by this call and has no checkpoint yet.
+    """
+    try:
+        state = {"input": inputs}
+        routing = routing_cache.get(graph_json)
 
         # Save workflow execution as started (entry node as current)
-        entry_node = req.graph["nodes"][0]["id"] if req.graph.get("nodes") else "unknown"
-        save_workflow_execution(
-            execution_id, req.workflow_name, "running",
-            entry_node,
-            state, req.graph
+        await asyncio.to_thread(
+            save_workflow_execution, execution_id, workflow_name, "running",
+            routing.entry or "unknown",
+            state, graph_json, new=new
         )
 
         # Build and execute graph
-        graph = build_graph_from_json(req.graph, execution_id)
+        graph = graph_cache.get(graph_json)
         # start from entry by default
-        result = graph.invoke(state)
-
-        # Check if workflow is paused at form
-        if "_paused_at_form" in result:
-            form_info = result["_paused_at_form"]
-            # Save workflow as paused with current_node set to the form node
-            save_workflow_execution(
-                execution_id, req.workflow_name, "paused",
-                form_info["node_id"], result, req.graph
-            )
-            return ExecuteResponse(
-                status="paused",
-                execution_id=execution_id,
-                result=result,
-                paused_at_form=form_info
-            )
-
-        # Workflow completed successfully
-        save_workflow_execution(
-            execution_id, req.workflow_name, "completed",
-            req.graph["nodes"][-1]["id"] if req.graph.get("nodes") else "unknown",
-            result, req.graph
-        )
-
-        return ExecuteResponse(
-            status="success",
-            execution_id=execution_id,
-            result=result
-        )
+        result = await graph.ainvoke(state, config=execution_config(execution_id))
+        return await asyncio.to_thread(finish_execution, execution_id, workflow_name, result, graph_json, routing)
     except Exception as e:
         # Save workflow as failed
-        save_workflow_execution(
-            execution_id, req.workflow_name, "failed",
-            "unknown", {"error": str(e)}, req.graph
-        )
-        return ExecuteResponse(
-            status="error",
-            execution_id=execution_id,
-            result={"error": str(e)}
-        )
+        return await asyncio.to_thread(fail_execution, execution_id, workflow_name, graph_json, e)
+
+
+@app.post("/execute", response_model=ExecuteResponse)
+async def execute_workflow(req: ExecuteRequest):
+    routing_for(req.graph)  # 400 before an execution is created for a graph that cannot be routed
+    return await run_execution(str(uuid.uuid4()), req.workflow_name, req.graph, req.inputs, new=True)
 
 
 @app.post("/resume", response_model=ExecuteResponse)
-def resume_workflow(req: ResumeRequest):
+async def resume_workflow(req: ResumeRequest):
+    # Get workflow execution from DB; only one worker at a time may resume it
+    workflow_exec = await asyncio.to_thread(claim_resume, req.execution_id)
+    async with leases.kept(resume_lease(req.execution_id), RESUME_LEASE_S):
+        try:
+            state, graph_json, routing, resume_at = await asyncio.to_thread(begin_resume, req, workflow_exec)
+
+            # Continue execution from paused state (the compiled graph's entry router starts at resume_at)
+            if resume_at == []:
+                result = state
+            else:
+                graph = graph_cache.get(graph_json)
+                result = await graph.ainvoke(state, config=execution_config(req.execution_id, resume_at=resume_at))
+
+            # Paused again at another form, or completed
+            return await asyncio.to_thread(finish_execution, req.execution_id, workflow_exec["workflow_name"],
+                                           result, graph_json, routing)
+        except Exception as e:
+            return await asyncio.to_thread(fail_execution, req.execution_id, workflow_exec["workflow_name"], {}, e)
+
+
+# -------------------------------------------------------------------
+# Asynchronous execution (job queue)
+# -------------------------------------------------------------------
+
+# Longest a result request may wait for an execution to finish
+RESULT_MAX_WAIT_S = 60.0
+
+# workflow_executions status -> ExecuteResponse status
+RESULT_STATUSES = {"completed": "success", "failed": "error"}
+
+
+async def run_queued_execution(job: Dict[str, Any]):
+    workflow_exec = get_workflow_execution(job["execution_id"])
+    if workflow_exec is None:
+        print(f"[Jobs] Execution {job['execution_id']} not found; dropping job")
+        return
+    # A first attempt starts from the inputs; a retry continues from what the earlier attempt checkpointed
+    await run_execution(job["execution_id"], workflow_exec["workflow_name"],
+                        load_execution_graph(workflow_exec), job["inputs"], new=job["attempts"] == 1)
+
+
+def give_up_execution(job: Dict[str, Any]):
+    workflow_exec = get_workflow_execution(job["execution_id"]) or {"workflow_name": "unknown", "graph_json": "{}"}
+    error = Exception(f"Abandoned after {job['attempts'] - 1} attempts whose worker stopped renewing its lease")
+    fail_execution(job["execution_id"], workflow_exec["workflow_name"], load_execution_graph(workflow_exec), error)
+
+
+job_workers = JobWorkerPool(job_queue, run_queued_execution, give_up_execution, workers=JOB_WORKERS,
+                            lease_s=JOB_LEASE_S, max_attempts=JOB_MAX_ATTEMPTS, poll_s=JOB_POLL_S)
+
+
+@app.post("/execute/async", response_model=ExecuteResponse, status_code=202)
+async def submit_workflow(req: ExecuteRequest, response: Response):
+    """
+    Queue an execution and return its id at once. A worker runs it; poll
+    /executions/{id}/result (optionally with ?wait=seconds) for the outcome.
+    """
     try:
-        # Get workflow execution from DB
-        workflow_exec = get_workflow_execution(req.execution_id)
+        routing = routing_cache.get(req.graph)
+        graph_cache.get(req.graph)  # reject graphs that do not compile now, not in the worker
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid graph: {e}")
+
+    execution_id = str(uuid.uuid4())
+
+    def enqueue():
+        graph_hash = graph_store.put(req.graph)
+        # The row, its first checkpoint and its job are written together, so a worker in any process finds all three
+        with db_pool.transaction() as conn:
+            checkpointer.write_initial(conn, execution_id, {"input": req.inputs}, routing.entry or "unknown")
+            conn.execute("""
+                INSERT INTO workflow_executions
+                (id, workflow_name, status, current_node_id, state_data, graph_json, graph_hash, updated_at)
+                VALUES (?, ?, 'queued', ?, '', '', ?, ?)
+            """, (execution_id, req.workflow_name, routing.entry or "unknown", graph_hash, datetime.now().isoformat()))
+            job_queue.enqueue(conn, execution_id, req.inputs)
+
+    await asyncio.to_thread(enqueue)
+    job_workers.notify()
+
+    response.headers["Location"] = f"/executions/{execution_id}/result"
+    return ExecuteResponse(status="queued", execution_id=execution_id, result={})
+
 
+@app.get("/executions/{execution_id}/result", response_model=ExecuteResponse)
+async def get_execution_result(execution_id: str, wait: float = 0):
+    """
+    Outcome of an execution in /execute's response format; status is "queued"
+    or "running" while it has not finished. With `wait`, long-polls up to that
+    many seconds (at most RESULT_MAX_WAIT_S) for it to finish or pause.
+    """
+    deadline = time.monotonic() + min(max(wait, 0.0), RESULT_MAX_WAIT_S)
+    while True:
+        workflow_exec = get_workflow_execution(execution_id)
         if not workflow_exec:
-            raise HTTPException(status_code=404, detail="Workflow execution not found")
-
-        if workflow_exec["status"] != "paused":
-            raise HTTPException(status_code=400, detail="Workflow is not paused")
-
-        # Parse stored state and graph
-        state = json.loads(workflow_exec["state_data"])
-        graph_json = json.loads(workflow_exec["graph_json"])
-
-        # Remove pause marker and add form data to state
-        start_at_node = None
-        paused_node_id = None
-        if "_paused_at_form" in state:
-            paused_info = state.pop("_paused_at_form")
-            paused_node_id = paused_info["node_id"]
-
-            # Save form response
-            save_form_response(req.execution_id, paused_node_id, req.form_data)
-
-            # Update node execution as completed (form node)
-            save_node_execution(
-                req.execution_id, paused_node_id, "form", paused_node_id,
-                "completed", None, req.form_data, None, 0
-            )
-
-            # Add form data to state
-            state[paused_node_id] = {"form_data": req.form_data}
-            # merge form into input for easier condition checks
-            if "input" not in state:
-                state["input"] = {}
-            if isinstance(state["input"], dict):
-                state["input"].update(req.form_data)
-
-            # Resolve next node after this form (evaluate conditions if any)
-            start_at_node = resolve_next_node(graph_json, paused_node_id, state)
-
-        # If we couldn't find a next node, fall back to the stored current node or paused node itself
-        if not start_at_node:
-            start_at_node = workflow_exec.get("current_node_id") or paused_node_id
-
-        # Update workflow status to running and set current_node_id to the node we will start from
-        save_workflow_execution(
-            req.execution_id, workflow_exec["workflow_name"], "running",
-            start_at_node, state, graph_json
-        )
+            raise HTTPException(status_code=404, detail="Execution not found")
+        status = workflow_exec["status"]
+        remaining = deadline - time.monotonic()
+        if status not in ("queued", "running") or remaining <= 0:
+            break
+        # Woken as soon as a local worker finishes it; re-checked every poll for other writers
+        await job_workers.wait_finished(execution_id, min(remaining, JOB_POLL_S))
+
+    if status in ("queued", "running"):
+        return ExecuteResponse(status=status, execution_id=execution_id, result={})
+    result = load_execution_state(workflow_exec)
+    return ExecuteResponse(
+        status=RESULT_STATUSES.get(status, status),
+        execution_id=execution_id,
+        result=result,
+        paused_at_form=result.get("_paused_at_form") if status == "paused" else None
+    )
 
-        # Continue execution from paused state (start at resolved node)
-        graph = build_graph_from_json(graph_json, req.execution_id)
-
-        # Use start_at parameter so the compiled graph starts at desired node (old langgraph API)
-        # If your langgraph version uses a different invocation signature, adjust accordingly.
-        result = graph.invoke(state, start_at=start_at_node) if start_at_node else graph.invoke(state)
-
-        # Check if paused again at another form
-        if "_paused_at_form" in result:
-            form_info = result["_paused_at_form"]
-            save_workflow_execution(
-                req.execution_id, workflow_exec["workflow_name"], "paused",
-                form_info["node_id"], result, graph_json
-            )
-            return ExecuteResponse(
-                status="paused",
-                execution_id=req.execution_id,
-                result=result,
-                paused_at_form=form_info
-            )
-
-        # Workflow completed
-        save_workflow_execution(
-            req.execution_id, workflow_exec["workflow_name"], "completed",
-            graph_json["nodes"][-1]["id"] if graph_json.get("nodes") else "unknown",
-            result, graph_json
-        )
 
-        return ExecuteResponse(
-            status="success",
-            execution_id=req.execution_id,
-            result=result
+# -------------------------------------------------------------------
+# Streaming execution (Server-Sent Events)
+# -------------------------------------------------------------------
+
+STREAM_MAX_PAYLOAD_BYTES = DEFAULT_MAX_PAYLOAD_BYTES
+
+# SSE event that ends the stream, per ExecuteResponse status
+STREAM_FINAL_EVENTS = {"success": "completed", "paused": "paused", "error": "error"}
+
+# Streamed runs outlive a disconnected client; keep them referenced until they finish
+streamed_runs: set = set()
+
+
+class ExecuteStreamRequest(ExecuteRequest):
+    max_payload_bytes: Optional[int] = None
+
+class ResumeStreamRequest(ResumeRequest):
+    max_payload_bytes: Optional[int] = None
+
+
+def open_event_stream(max_payload_bytes: Optional[int]) -> ExecutionEventStream:
+    if max_payload_bytes is None:
+        max_payload_bytes = STREAM_MAX_PAYLOAD_BYTES
+    if max_payload_bytes < 0:
+        raise HTTPException(status_code=400, detail="max_payload_bytes must not be negative")
+    return ExecutionEventStream(max_payload_bytes)
+
+
+def event_stream_response(events: ExecutionEventStream, run) -> StreamingResponse:
+    """Start `run` as its own task and stream `events` to the client."""
+    task = asyncio.ensure_future(run)
+    streamed_runs.add(task)
+    task.add_done_callback(streamed_runs.discard)
+    return StreamingResponse(events.messages(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+def end_event_stream(events: ExecutionEventStream, response: ExecuteResponse):
+    events.emit(STREAM_FINAL_EVENTS[response.status], response.model_dump(exclude_none=True))
+    events.close()
+
+
+async def stream_execution(events: ExecutionEventStream, req: ExecuteStreamRequest, execution_id: str):
+    try:
+        state = {"input": req.inputs}
+        routing = routing_cache.get(req.graph)
+        await asyncio.to_thread(
+            save_workflow_execution, execution_id, req.workflow_name, "running",
+            routing.entry or "unknown",
+            state, req.graph, new=True
         )
-    except HTTPException:
-        raise
+        events.emit("started", {"execution_id": execution_id, "workflow_name": req.workflow_name})
+
+        graph = graph_cache.get(req.graph)
+        result = await stream_run(graph, state, execution_config(execution_id), events.emit)
+        response = await asyncio.to_thread(finish_execution, execution_id, req.workflow_name, result, req.graph, routing)
     except Exception as e:
-        # Attempt to get workflow name safely for logging
-        wf_name = workflow_exec["workflow_name"] if 'workflow_exec' in locals() and workflow_exec else "unknown"
-        save_workflow_execution(
-            req.execution_id, wf_name,
-            "failed", "unknown", {"error": str(e)}, {}
-        )
-        return ExecuteResponse(
-            status="error",
-            execution_id=req.execution_id,
-            result={"error": str(e)}
-        )
+        response = await asyncio.to_thread(fail_execution, execution_id, req.workflow_name, req.graph, e)
+    end_event_stream(events, response)
+
+
+async def stream_resume(events: ExecutionEventStream, req: ResumeStreamRequest, workflow_exec: Dict[str, Any]):
+    async with leases.kept(resume_lease(req.execution_id), RESUME_LEASE_S):
+        try:
+            state, graph_json, routing, resume_at = await asyncio.to_thread(begin_resume, req, workflow_exec)
+            events.emit("started", {"execution_id": req.execution_id, "workflow_name": workflow_exec["workflow_name"],
+                                    "resume_at": resume_at})
+
+            if resume_at == []:
+                result = state
+            else:
+                graph = graph_cache.get(graph_json)
+                config = execution_config(req.execution_id, resume_at=resume_at)
+                result = await stream_run(graph, state, config, events.emit)
+            response = await asyncio.to_thread(finish_execution, req.execution_id, workflow_exec["workflow_name"],
+                                               result, graph_json, routing)
+        except Exception as e:
+            response = await asyncio.to_thread(fail_execution, req.execution_id, workflow_exec["workflow_name"], {}, e)
+    end_event_stream(events, response)
+
+
+@app.post("/execute/stream")
+async def execute_workflow_stream(req: ExecuteStreamRequest):
+    """
+    /execute as Server-Sent Events: `started`, then `node-started` /
+    `node-completed` / `node-failed` per node, and finally `completed`,
+    `paused` or `error` carrying the /execute response.
+    """
+    routing_for(req.graph)
+    events = open_event_stream(req.max_payload_bytes)
+    return event_stream_response(events, stream_execution(events, req, str(uuid.uuid4())))
+
+
+@app.post("/resume/stream")
+async def resume_workflow_stream(req: ResumeStreamRequest):
+    """
+    /resume as Server-Sent Events, like /execute/stream. Unknown or not-paused
+    executions get 404/400, executions being resumed elsewhere 409.
+    """
+    events = open_event_stream(req.max_payload_bytes)
+    workflow_exec = await asyncio.to_thread(claim_resume, req.execution_id)
+    return event_stream_response(events, stream_resume(events, req, workflow_exec))
+
+
+@app.on_event("startup")
+def start_background_workers():
+    script_engine.start()
+
+
+@app.on_event("startup")
+async def start_job_workers():
+    # Workers run on the server's event loop, so they are started from an async hook
+    job_workers.start()
+
+
+@app.on_event("shutdown")
+async def close_db_connections():
+    await job_workers.stop()
+    await http_client.aclose()
+    script_engine.close()
+    journal.close()
+    db_pool.close_all()
 
 
 @app.get("/")
@@ -622,8 +974,11 @@ def get_execution_details(execution_id: str):
 
     if not workflow_exec:
         raise HTTPException(status_code=404, detail="Execution not found")
+    if not workflow_exec["state_data"]:
+        workflow_exec["state_data"] = json.dumps(load_execution_state(workflow_exec))
 
-    # Get node executions
+    # Get node executions (flush pending write-behind records first)
+    journal.flush()
     conn = get_db()
     cur = conn.cursor()
     cur.execute("""
@@ -632,9 +987,8 @@ def get_execution_details(execution_id: str):
         ORDER BY started_at ASC
     """, (execution_id,))
     node_rows = cur.fetchall()
-    conn.close()
 
-    node_executions = [dict(row) for row in node_rows]
+    node_executions = [decode_node_execution(row) for row in node_rows]
 
     return {
         "execution": workflow_exec,
@@ -645,6 +999,7 @@ def get_execution_details(execution_id: str):
 @app.get("/executions/{execution_id}/nodes")
 def get_node_executions(execution_id: str):
     """Get all node executions for a workflow"""
+    journal.flush()
     conn = get_db()
     cur = conn.cursor()
     cur.execute("""
@@ -653,31 +1008,128 @@ def get_node_executions(execution_id: str):
         ORDER BY started_at ASC
     """, (execution_id,))
     rows = cur.fetchall()
-    conn.close()
 
-    return [dict(row) for row in rows]
+    return [decode_node_execution(row) for row in rows]
+
+
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(created_at: str, execution_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([created_at, execution_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, execution_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return created_at, execution_id
 
 
 @app.get("/executions")
-def list_executions(limit: int = 50):
-    """List recent workflow executions"""
+def list_executions(response: Response, limit: int = 50, cursor: Optional[str] = None,
+                    workflow_name: Optional[str] = None, status: Optional[str] = None,
+                    parent_execution_id: Optional[str] = None):
+    """
+    List workflow executions, newest first.
+    Keyset paginated: when more rows exist the response carries an X-Next-Cursor
+    header; pass it back as `cursor` to get the next page.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    filters = []
+    params: List[Any] = []
+    if workflow_name:
+        filters.append("workflow_name = ?")
+        params.append(workflow_name)
+    if status:
+        filters.append("status = ?")
+        params.append(status)
+    if parent_execution_id:
+        filters.append("parent_execution_id = ?")
+        params.append(parent_execution_id)
+    if cursor:
+        filters.append("(created_at, id) < (?, ?)")
+        params.extend(decode_cursor(cursor))
+    where = f"WHERE {' AND '.join(filters)}" if filters else ""
+
     conn = get_db()
     cur = conn.cursor()
-    cur.execute("""
-        SELECT id, workflow_name, status, current_node_id, created_at, updated_at
+    cur.execute(f"""
+        SELECT id, workflow_name, status, current_node_id, parent_execution_id, created_at, updated_at
         FROM workflow_executions
-        ORDER BY created_at DESC
+        {where}
+        ORDER BY created_at DESC, id DESC
         LIMIT ?
-    """, (limit,))
+    """, (*params, limit + 1))
     rows = cur.fetchall()
-    conn.close()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
 
     return [dict(row) for row in rows]
 
 
+@app.get("/metrics/storage")
+def get_storage_metrics():
+    """Compression statistics for payloads written by this process"""
+    return blob_codec.stats()
+
+
+@app.get("/metrics/scripts")
+def get_script_metrics():
+    """Decision-script workers: runs, errors, timeouts and worker restarts"""
+    return script_engine.stats()
+
+
+@app.get("/metrics/response-cache")
+def get_response_cache_metrics(node_id: Optional[str] = None):
+    """Response cache hits, stale hits, misses, evictions and hit ratio per service node"""
+    stats = response_caches.stats(node_id)
+    if node_id is not None and not stats:
+        raise HTTPException(status_code=404, detail="No response cache for this node")
+    return stats
+
+
+@app.get("/metrics/jobs")
+def get_job_metrics():
+    """Queue depth and lease state of asynchronous executions, this process's worker counters, and held leases."""
+    return {"queue": job_queue.stats(), "workers": job_workers.stats(), "leases": leases.stats()}
+
+
+@app.get("/metrics/coalescing")
+def get_coalescing_metrics():
+    """Service calls made vs. calls that shared an identical in-flight request"""
+    return service_calls.stats()
+
+
+@app.get("/metrics/http-pool")
+def get_http_pool_metrics():
+    """Per-host connection pool stats for service calls: reuse ratio, TLS handshakes, waits"""
+    return http_client.stats()
+
+
+@app.get("/metrics/graph-cache")
+def get_graph_cache_metrics():
+    """Compiled graph cache size, hit rate and compile times"""
+    return graph_cache.stats()
+
+
+@app.post("/graphs/analyze")
+def analyze_graph(req: AnalyzeGraphRequest):
+    """Entry and terminal nodes, topological order, cycles and reachability of a graph"""
+    return routing_for(req.graph).describe()
+
 # -------------------------------------------------------------------
 # Run server
 # -------------------------------------------------------------------
 
+# Server processes sharing workflow.db (WAL); more than one needs the app as an import string
+SERVER_WORKERS = int(os.environ.get("WORKFLOW_SERVER_WORKERS", "1"))
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    if SERVER_WORKERS > 1:
+        uvicorn.run("graph_decision_final:app", host="0.0.0.0", port=8000, workers=SERVER_WORKERS)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
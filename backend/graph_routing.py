@@ -0,0 +1,377 @@
+"""
+Routing index for workflow graphs.
+
+Built once per graph (and cached by content hash next to the compiled graph),
+so the compiler, resume and graph analysis don't rescan `nodes` and `edges`:
+
+    routing = RoutingIndex(graph_json)
+    routing.entry_nodes                # where a run starts
+    routing.next_nodes("form_1", state)  # where a run continues after a node
+    routing.describe()                 # entry, terminals, topological order, reachability
+
+Edges with a `condition` key make their source a conditional router: the
+first edge whose condition holds is taken, else the first edge without a
+condition, else the run ends. Other sources fan out to every target.
+
+A run starts at one root: the first node (in `nodes` order) that no edge
+points to, or the first node if every node has an incoming edge. A graph can
+opt in to starting several roots in its first step, as parallel branches:
+`"roots": [...]` lists them, and with `"parallelize": true` every node that no
+edge points to is a root. `entry` is the first root. Nodes that no root
+reaches never run; `describe()` lists them as `unreachable`. Every node without
+outgoing edges is terminal and routes to END. A run ends after a form node that
+paused it; `/resume` continues at `next_nodes(form_id, state)` by passing
+`execution_config(execution_id, resume_at=...)`.
+
+Parallel branches
+-----------------
+
+Fan-out targets run concurrently in the same step. A node of type `join`
+waits for all of its predecessors (a LangGraph waiting edge) before it and
+its successors run; a join cannot wait on a router or a form, whose
+branches may never arrive. `branches` maps every node on a straight path
+from a fan-out to the branch it belongs to (named after the branch's first
+node); forms are rejected there, since a pause cannot stop sibling branches.
+
+With `"parallelize": true` on the graph, chains of service nodes are also
+split by data dependency: a service node reads the top-level state keys
+named by its request template placeholders and mapping sources, and writes
+its own id, so consecutive service nodes that read nothing the others
+write run together and are joined before the chain continues
+(`parallel_groups`; listed by `describe()` even when not enabled).
+"""
+
+import heapq
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from langgraph.graph import END
+
+from conditions import CompiledCondition, compile_condition
+from graph_cache import config_resume_at
+from path_access import compile_path
+from template_engine import template_paths
+
+
+def service_reads(node: Dict[str, Any]) -> Optional[FrozenSet[str]]:
+    """Top-level state keys a service node reads, or None if a placeholder may read anything."""
+    data = node.get("data") or {}
+    paths = template_paths(data.get("request", {}))
+    paths.extend(compile_path(m.get("source") or "") for m in data.get("mappings", []))
+    keys = set()
+    for steps in paths:
+        if not steps or not isinstance(steps[0], str):
+            return None
+        keys.add(steps[0])
+    return frozenset(keys)
+
+
+class RoutingIndex:
+    def __init__(self, graph_json: Dict[str, Any]):
+        self.nodes: List[str] = [node["id"] for node in graph_json.get("nodes", [])]
+        self.node_types: Dict[str, str] = {node["id"]: node.get("type") for node in graph_json.get("nodes", [])}
+        known = set(self.nodes)
+
+        self.out_edges: Dict[str, List[Dict[str, Any]]] = {}
+        incoming: Dict[str, int] = {node_id: 0 for node_id in self.nodes}
+        predecessors: Dict[str, List[str]] = {node_id: [] for node_id in self.nodes}
+        for edge in graph_json.get("edges", []):
+            source, target = edge["source"], edge["target"]
+            for node_id in (source, target):
+                if node_id not in known:
+                    raise ValueError(f"Edge {source} -> {target} references unknown node {node_id!r}")
+            self.out_edges.setdefault(source, []).append(edge)
+            incoming[target] += 1
+            predecessors[target].append(source)
+
+        self.conditional: Dict[str, List[Tuple[Dict[str, Any], CompiledCondition]]] = {}
+        self.defaults: Dict[str, List[Dict[str, Any]]] = {}
+        for source, edges in self.out_edges.items():
+            self.defaults[source] = [e for e in edges if "condition" not in e]
+            if len(self.defaults[source]) < len(edges):
+                # An empty condition still makes the source a router, but that edge is never taken
+                self.conditional[source] = [(e, compile_condition(e["condition"])) for e in edges if e.get("condition")]
+
+        self.successors: Dict[str, Tuple[str, ...]] = {
+            node_id: tuple(dict.fromkeys(e["target"] for e in self.out_edges.get(node_id, ())))
+            for node_id in self.nodes
+        }
+        self.parallelize = bool(graph_json.get("parallelize"))
+        self.roots: Tuple[str, ...] = self._roots(graph_json.get("roots"), incoming, known)
+        self.entry: Optional[str] = self.roots[0] if self.roots else None
+        self.terminals: Tuple[str, ...] = tuple(n for n in self.nodes if not self.out_edges.get(n))
+        self.topological_order, self.has_cycles = self._topological_order(incoming)
+        self.reachable: Dict[str, FrozenSet[str]] = {n: self._reachable_from(n) for n in self.nodes}
+
+        # Execution edges: `successors` with parallel groups expanded and auto-joined
+        self.parallel_groups = self._independent_groups(graph_json.get("nodes", []), predecessors)
+        self.expand: Dict[str, Tuple[str, ...]] = {}
+        targets = dict(self.successors)
+        waits: Dict[str, Tuple[str, ...]] = {}
+        if self.parallelize:
+            for group in self.parallel_groups:
+                after = self.successors[group[-1]]
+                if any(target in waits for target in after):
+                    continue  # one auto-join per target; this chain stays sequential
+                self.expand[group[0]] = group
+                for member in group:
+                    targets[member] = after
+                for target in after:
+                    waits[target] = group
+        self.targets: Dict[str, Tuple[str, ...]] = {
+            node_id: tuple(dict.fromkeys(n for t in targets[node_id] for n in self._expand(t)))
+            for node_id in self.nodes
+        }
+        self.entry_nodes: Tuple[str, ...] = tuple(dict.fromkeys(n for root in self.roots for n in self._expand(root)))
+
+        # Joins wait for all of their sources; one of them (`join_points`) records the branch timings
+        self.joins: Dict[str, Tuple[str, ...]] = {}
+        self.join_points: List[str] = []
+        for target, group in waits.items():
+            for node_id in self._expand(target):
+                self.joins[node_id] = group
+            self.join_points.append(self._expand(target)[0])
+        for node_id in self.nodes:
+            if self.node_types[node_id] == "join":
+                sources = [n for n in self.nodes if node_id in self.targets[n]]
+                self.joins[node_id] = tuple(dict.fromkeys(self.joins.get(node_id, ()) + tuple(sources)))
+                if node_id not in self.join_points:
+                    self.join_points.append(node_id)
+        for join_id, sources in self.joins.items():
+            for source in sources:
+                if self.is_router(source) or self.node_types[source] == "form":
+                    raise ValueError(f"Join {join_id!r} cannot wait for {source!r}: "
+                                     f"routers and forms do not always continue to it")
+
+        self.branches: Dict[str, str] = self._branches()
+        self.join_branches: Dict[str, Dict[str, Tuple[str, ...]]] = {
+            join_id: self._branch_members(self.joins[join_id]) for join_id in self.join_points
+        }
+
+    @property
+    def exit_node(self) -> Optional[str]:
+        """Node recorded as current when a run completes: the last terminal node."""
+        if self.terminals:
+            return self.terminals[-1]
+        return self.nodes[-1] if self.nodes else None
+
+    def is_router(self, node_id: str) -> bool:
+        return node_id in self.conditional
+
+    def next_nodes(self, source: str, state: Dict[str, Any]) -> List[str]:
+        """Targets a run continues to after `source`; empty when the run ends there."""
+        conditions = self.conditional.get(source)
+        if conditions is None:
+            return list(self.targets.get(source, ()))
+        for edge, condition in conditions:
+            try:
+                if condition.evaluate(state):
+                    return list(self._expand(edge["target"]))
+            except Exception as e:
+                print(f"[Routing] Condition error on edge {source} -> {edge['target']}: {e}")
+        defaults = self.defaults[source]
+        return list(self._expand(defaults[0]["target"])) if defaults else []
+
+    def branch_timings(self, join_id: str, timings: Dict[str, Tuple[datetime, datetime]]) -> Dict[str, Any]:
+        """Start, end and duration of each branch a join waited for, from a run's node timings."""
+        branches, spans = [], []
+        for branch_id, members in self.join_branches.get(join_id, {}).items():
+            ran = [n for n in members if n in timings]
+            if not ran:
+                continue
+            started = min(timings[n][0] for n in ran)
+            completed = max(timings[n][1] for n in ran)
+            spans.append((started, completed))
+            branches.append({
+                "branch_id": branch_id,
+                "nodes": ran,
+                "started_at": started.isoformat(),
+                "completed_at": completed.isoformat(),
+                "duration_ms": _ms(completed - started),
+            })
+        wall_ms = _ms(max(end for _, end in spans) - min(start for start, _ in spans)) if spans else 0
+        return {"branches": branches, "wall_ms": wall_ms, "sum_ms": sum(b["duration_ms"] for b in branches)}
+
+    def describe(self) -> Dict[str, Any]:
+        started = set(self.roots).union(*(self.reachable[root] for root in self.roots))
+        return {
+            "entry": self.entry,
+            "roots": list(self.roots),
+            "terminals": list(self.terminals),
+            "routers": [n for n in self.nodes if n in self.conditional],
+            "topological_order": self.topological_order,
+            "has_cycles": self.has_cycles,
+            "unreachable": [n for n in self.nodes if n not in started],
+            "successors": {n: list(s) for n, s in self.successors.items()},
+            "reachable": {n: [m for m in self.nodes if m in self.reachable[n]] for n in self.nodes},
+            "parallel": {
+                "enabled": self.parallelize,
+                "groups": [list(g) for g in self.parallel_groups],
+                "entry_nodes": list(self.entry_nodes),
+                "joins": {j: list(s) for j, s in self.joins.items()},
+                "join_points": list(self.join_points),
+                "branches": dict(self.branches),
+            },
+        }
+
+    def _expand(self, node_id: str) -> Tuple[str, ...]:
+        return self.expand.get(node_id, (node_id,))
+
+    def _roots(self, declared: Any, incoming: Dict[str, int], known: set) -> Tuple[str, ...]:
+        """Nodes a run starts at: the declared `roots`, every root with `parallelize`, else the first root."""
+        if declared is not None:
+            if not isinstance(declared, list) or not declared:
+                raise ValueError("'roots' must be a non-empty list of node ids")
+            for node_id in declared:
+                if node_id not in known:
+                    raise ValueError(f"'roots' references unknown node {node_id!r}")
+            return tuple(dict.fromkeys(declared))
+        roots = [node_id for node_id in self.nodes if incoming[node_id] == 0]
+        if not roots:
+            return tuple(self.nodes[:1])
+        return tuple(roots) if self.parallelize else (roots[0],)
+
+    def _independent_groups(self, nodes: List[Dict[str, Any]],
+                            predecessors: Dict[str, List[str]]) -> List[Tuple[str, ...]]:
+        """Runs of two or more consecutive chained service nodes with no data dependency between them."""
+        reads = {node["id"]: service_reads(node) for node in nodes if node.get("type") == "service"}
+        link: Dict[str, str] = {}
+        for node_id, keys in reads.items():
+            edges = self.out_edges.get(node_id, [])
+            if keys is None or len(edges) != 1 or self.is_router(node_id):
+                continue
+            target = edges[0]["target"]
+            if target != node_id and reads.get(target) is not None and predecessors[target] == [node_id]:
+                link[node_id] = target
+
+        groups: List[Tuple[str, ...]] = []
+        chained = set(link.values())
+        for head in (n for n in self.nodes if n in link and n not in chained):
+            chain = [head]
+            while chain[-1] in link:
+                chain.append(link[chain[-1]])
+            group, written = [chain[0]], {chain[0]}
+            for node_id in chain[1:]:
+                if reads[node_id] & written:
+                    if len(group) > 1:
+                        groups.append(tuple(group))
+                    group, written = [], set()
+                group.append(node_id)
+                written.add(node_id)
+            if len(group) > 1:
+                groups.append(tuple(group))
+        return groups
+
+    def _branches(self) -> Dict[str, str]:
+        """Branch of every node on a straight path from a fan-out (forks, parallel groups, roots)."""
+        incoming = {n: 0 for n in self.nodes}
+        for node_id in self.nodes:
+            for target in self.targets[node_id]:
+                incoming[target] += 1
+        starts: List[str] = []
+        for node_id in self.nodes:
+            if not self.is_router(node_id) and len(self.targets[node_id]) > 1:
+                starts.extend(t for t in self.targets[node_id] if t not in self.joins and incoming[t] == 1)
+        # Members of a parallel group are branches even when the group itself waits on a join
+        for group in self.expand.values():
+            starts.extend(group)
+        if len(self.entry_nodes) > 1:
+            starts.extend(self.entry_nodes)
+
+        branches: Dict[str, str] = {}
+        for start in dict.fromkeys(starts):
+            current = start
+            while current not in branches:
+                if self.node_types[current] == "form":
+                    raise ValueError(f"Form {current!r} cannot run inside parallel branch {start!r}: "
+                                     f"a pause does not stop the other branches")
+                branches[current] = start
+                if self.is_router(current) or len(self.targets[current]) != 1:
+                    break
+                current = self.targets[current][0]
+                if current in self.joins or incoming[current] > 1:
+                    break
+        return branches
+
+    def _branch_members(self, sources: Tuple[str, ...]) -> Dict[str, Tuple[str, ...]]:
+        members: Dict[str, Tuple[str, ...]] = {}
+        for source in sources:
+            branch_id = self.branches.get(source)
+            if branch_id is None:
+                members[source] = (source,)
+            else:
+                members[branch_id] = tuple(n for n in self.nodes if self.branches.get(n) == branch_id)
+        return members
+
+    def _topological_order(self, incoming: Dict[str, int]) -> Tuple[List[str], bool]:
+        """Kahn's algorithm, ties broken by `nodes` order; nodes on cycles follow in `nodes` order."""
+        remaining = dict(incoming)
+        edge_counts: Dict[Tuple[str, str], int] = {}
+        for source, edges in self.out_edges.items():
+            for e in edges:
+                edge_counts[(source, e["target"])] = edge_counts.get((source, e["target"]), 0) + 1
+        position = {n: i for i, n in enumerate(self.nodes)}
+        ready = [position[n] for n in self.nodes if remaining[n] == 0]
+        order: List[str] = []
+        while ready:
+            node_id = self.nodes[heapq.heappop(ready)]
+            order.append(node_id)
+            for target in self.successors[node_id]:
+                remaining[target] -= edge_counts[(node_id, target)]
+                if remaining[target] == 0:
+                    heapq.heappush(ready, position[target])
+        has_cycles = len(order) < len(self.nodes)
+        if has_cycles:
+            placed = set(order)
+            order.extend(n for n in self.nodes if n not in placed)
+        return order, has_cycles
+
+    def _reachable_from(self, node_id: str) -> FrozenSet[str]:
+        seen = set()
+        queue = deque(self.successors[node_id])
+        while queue:
+            current = queue.popleft()
+            if current not in seen:
+                seen.add(current)
+                queue.extend(self.successors[current])
+        return frozenset(seen)
+
+
+def _ms(delta) -> int:
+    return int(delta.total_seconds() * 1000)
+
+
+def add_routes(graph, routing: RoutingIndex):
+    """Add the edges, join (waiting) edges, END edges and entry point of `routing` to a StateGraph."""
+    for node_id in routing.nodes:
+        if routing.is_router(node_id) or routing.node_types[node_id] == "form":
+            graph.add_conditional_edges(node_id, _route_after(routing, node_id))
+        elif routing.targets[node_id]:
+            for target in routing.targets[node_id]:
+                if node_id not in routing.joins.get(target, ()):
+                    graph.add_edge(node_id, target)
+        else:
+            graph.add_edge(node_id, END)
+    for join_id, sources in routing.joins.items():
+        graph.add_edge(list(sources), join_id)
+    if routing.entry is None:
+        graph.set_entry_point(END)
+    else:
+        graph.set_conditional_entry_point(_route_entry(routing))
+
+
+def _route_after(routing: RoutingIndex, node_id: str):
+    def route(state: Dict[str, Any]):
+        if "_paused_at_form" in state:
+            return END
+        return routing.next_nodes(node_id, state) or END
+
+    return route
+
+
+def _route_entry(routing: RoutingIndex):
+    def route(state: Dict[str, Any], config: Dict[str, Any]):
+        return config_resume_at(config) or list(routing.entry_nodes)
+
+    return route
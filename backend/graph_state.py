@@ -0,0 +1,52 @@
+"""
+Workflow state channel shared by parallel branches.
+
+Workflow state is one dict. With a plain `StateGraph(dict)` two nodes that
+run in the same step (a fan-out) both write the whole dict and the run fails,
+so the graph uses a reducer instead:
+
+    g = StateGraph(WorkflowState)
+
+Each node still receives and returns a full state dict; `checkpoint_after`
+turns the returned dict into an update with `state_delta`, and `merge_state`
+applies updates key by key. Branches that write different top-level keys
+(service nodes write their own id) therefore merge cleanly; when two branches
+write the same key, the one that finishes last in the step wins.
+"""
+
+from typing import Annotated, Any, Dict
+
+
+class _Deleted:
+    __slots__ = ()
+
+    def __repr__(self):
+        return "DELETED"
+
+
+# Update value that removes a key (a node popped it from its state)
+DELETED = _Deleted()
+
+
+def merge_state(current: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """Reducer: shallow-merge `update` into `current` without mutating either."""
+    merged = dict(current or {})
+    for key, value in (update or {}).items():
+        if value is DELETED:
+            merged.pop(key, None)
+        else:
+            merged[key] = value
+    return merged
+
+
+WorkflowState = Annotated[dict, merge_state]
+
+
+def state_delta(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+    """Top-level keys a node added, replaced or removed, as an update for `merge_state`."""
+    delta = {key: value for key, value in after.items()
+             if key not in before or (before[key] is not value and before[key] != value)}
+    for key in before:
+        if key not in after:
+            delta[key] = DELETED
+    return delta
@@ -0,0 +1,108 @@
+"""
+Content-addressed storage for workflow graphs.
+
+Graphs are written once to the `graphs` table, keyed by the SHA-256 of their
+canonical JSON, and executions reference them through
+`workflow_executions.graph_hash`. Saving execution state no longer re-serializes
+and rewrites the whole graph, so storage grows with the number of distinct
+graphs instead of the number of executions.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from db_pool import ConnectionPool
+
+DEFAULT_CACHE_SIZE = 256
+
+
+def canonical_json(graph: Dict[str, Any]) -> str:
+    """Serialize a graph so that equal graphs always produce the same text."""
+    return json.dumps(graph, sort_keys=True, separators=(",", ":"))
+
+
+def graph_hash(graph: Dict[str, Any]) -> str:
+    return hashlib.sha256(canonical_json(graph).encode("utf-8")).hexdigest()
+
+
+class GraphStore:
+    """Deduplicating graph table with small in-process caches in front of it."""
+
+    def __init__(self, pool: ConnectionPool, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.pool = pool
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        # id(graph) -> (graph, hash): the same request dict is saved several times per run
+        self._hash_by_identity: "OrderedDict[int, Tuple[Dict[str, Any], str]]" = OrderedDict()
+        # hash -> (graph_json text, parsed graph)
+        self._by_hash: "OrderedDict[str, Tuple[str, Dict[str, Any]]]" = OrderedDict()
+
+    @staticmethod
+    def create_table(conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS graphs (
+                hash TEXT PRIMARY KEY,
+                graph_json TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+    def put(self, graph: Dict[str, Any]) -> str:
+        """Store `graph` if it is new and return its content hash."""
+        with self._lock:
+            hit = self._hash_by_identity.get(id(graph))
+            if hit is not None and hit[0] is graph:
+                self._hash_by_identity.move_to_end(id(graph))
+                return hit[1]
+
+        text = canonical_json(graph)
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+        with self._lock:
+            known = digest in self._by_hash
+        if not known:
+            with self.pool.transaction() as conn:
+                conn.execute("INSERT OR IGNORE INTO graphs (hash, graph_json) VALUES (?, ?)", (digest, text))
+
+        with self._lock:
+            self._remember(digest, text, graph)
+            self._hash_by_identity[id(graph)] = (graph, digest)
+            self._hash_by_identity.move_to_end(id(graph))
+            while len(self._hash_by_identity) > self.cache_size:
+                self._hash_by_identity.popitem(last=False)
+        return digest
+
+    def get_json(self, digest: str) -> Optional[str]:
+        """Return the stored JSON text for a graph hash."""
+        entry = self._lookup(digest)
+        return entry[0] if entry else None
+
+    def get(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Return the parsed graph for a hash. Treat the result as read-only."""
+        entry = self._lookup(digest)
+        return entry[1] if entry else None
+
+    def _lookup(self, digest: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            entry = self._by_hash.get(digest)
+            if entry is not None:
+                self._by_hash.move_to_end(digest)
+                return entry
+        row = self.pool.connection().execute("SELECT graph_json FROM graphs WHERE hash = ?", (digest,)).fetchone()
+        if row is None:
+            return None
+        text = row[0]
+        graph = json.loads(text)
+        with self._lock:
+            self._remember(digest, text, graph)
+        return text, graph
+
+    def _remember(self, digest: str, text: str, graph: Dict[str, Any]):
+        self._by_hash[digest] = (text, graph)
+        self._by_hash.move_to_end(digest)
+        while len(self._by_hash) > self.cache_size:
+            self._by_hash.popitem(last=False)
@@ -0,0 +1,275 @@
+"""
+Durable queue of asynchronous executions, worked by a local pool of workers.
+
+`POST /execute/async` stores the request and returns immediately. The
+execution row is written with status "queued" and the inputs go to
+`execution_jobs` in the same transaction, so queued work survives a restart.
+Workers claim the oldest claimable job with a lease,
+
+    job = queue.claim(lease_s)      # sets lease_owner / lease_expires_at atomically
+
+and renew it every `lease_s / 3` while the run is in progress. A job whose
+lease runs out (its worker or process died) is claimed again by the next
+free worker, so every job runs at least once, and may run more than once.
+A job claimed more than `max_attempts` times is given up instead of run
+again. Stopping the pool hands its unfinished jobs back to the queue. The
+job row is deleted when the run has persisted its result; the execution
+row then holds the outcome.
+
+Lease times are wall-clock (`time.time()`) so that processes sharing the
+database file agree on them.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from db_pool import ConnectionPool
+
+DEFAULT_WORKERS = 4
+DEFAULT_LEASE_S = 30.0
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_POLL_S = 1.0
+
+_COUNTERS = ("claimed", "completed", "lease_lost", "given_up", "released")
+
+
+class JobQueue:
+    def __init__(self, pool: ConnectionPool, owner: Optional[str] = None):
+        self.pool = pool
+        # Identifies this process's leases; unique per start so a restarted process never owns old leases
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    @staticmethod
+    def create_table(conn: sqlite3.Connection):
+        # lease_expires_at is NULL while a job is queued
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS execution_jobs (
+                execution_id TEXT PRIMARY KEY,
+                inputs TEXT NOT NULL,
+                lease_owner TEXT,
+                lease_expires_at REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                enqueued_at REAL NOT NULL
+            )
+        """)
+        # Claims look for expired leases (oldest first), then for queued jobs (NULL lease) in order
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_execution_jobs_lease
+            ON execution_jobs (lease_expires_at, enqueued_at)
+        """)
+
+    def enqueue(self, conn: sqlite3.Connection, execution_id: str, inputs: Dict[str, Any]):
+        """Queue a job inside the caller's transaction (the one writing its execution row)."""
+        conn.execute(
+            "INSERT INTO execution_jobs (execution_id, inputs, enqueued_at) VALUES (?, ?, ?)",
+            (execution_id, json.dumps(inputs), time.time()),
+        )
+
+    def claim(self, lease_s: float) -> Optional[Dict[str, Any]]:
+        """Lease the oldest expired or queued job; None when there is nothing to do."""
+        now = time.time()
+        # Cheap read first, so idle workers polling the queue never take the write lock
+        if self._next_claimable(self.pool.connection(), now) is None:
+            return None
+        with self.pool.transaction() as conn:
+            # Re-read under the write lock: another worker or process may have claimed it
+            row = self._next_claimable(conn, now)
+            if row is None:
+                return None
+            conn.execute("""
+                UPDATE execution_jobs
+                SET lease_owner = ?, lease_expires_at = ?, attempts = attempts + 1
+                WHERE execution_id = ?
+            """, (self.owner, now + lease_s, row["execution_id"]))
+        return {"execution_id": row["execution_id"], "inputs": json.loads(row["inputs"]),
+                "attempts": row["attempts"] + 1}
+
+    def heartbeat(self, execution_id: str, lease_s: float) -> bool:
+        """Extend this owner's lease on a job; False once the lease has been lost."""
+        with self.pool.transaction() as conn:
+            cur = conn.execute("""
+                UPDATE execution_jobs SET lease_expires_at = ?
+                WHERE execution_id = ? AND lease_owner = ?
+            """, (time.time() + lease_s, execution_id, self.owner))
+        return cur.rowcount == 1
+
+    def complete(self, execution_id: str) -> bool:
+        """Drop a finished job; False if this owner no longer held its lease."""
+        with self.pool.transaction() as conn:
+            cur = conn.execute(
+                "DELETE FROM execution_jobs WHERE execution_id = ? AND lease_owner = ?",
+                (execution_id, self.owner),
+            )
+        return cur.rowcount == 1
+
+    def release(self, execution_ids: List[str]) -> int:
+        """Hand leased jobs back to the queue without counting the attempt."""
+        with self.pool.transaction() as conn:
+            cur = conn.executemany("""
+                UPDATE execution_jobs
+                SET lease_owner = NULL, lease_expires_at = NULL, attempts = attempts - 1
+                WHERE execution_id = ? AND lease_owner = ?
+            """, [(execution_id, self.owner) for execution_id in execution_ids])
+        return cur.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        row = self.pool.connection().execute("""
+            SELECT
+                SUM(lease_expires_at IS NULL) AS queued,
+                SUM(lease_expires_at >= ?) AS leased,
+                SUM(lease_expires_at < ?) AS expired,
+                MIN(CASE WHEN lease_expires_at IS NULL THEN enqueued_at END) AS oldest_queued
+            FROM execution_jobs
+        """, (now, now)).fetchone()
+        return {
+            "queued": row["queued"] or 0,
+            "leased": row["leased"] or 0,
+            "expired": row["expired"] or 0,
+            "oldest_queued_s": round(now - row["oldest_queued"], 3) if row["oldest_queued"] else None,
+        }
+
+    @staticmethod
+    def _next_claimable(conn: sqlite3.Connection, now: float) -> Optional[sqlite3.Row]:
+        # Jobs of dead workers first (they were queued earlier), then the queue in order
+        row = conn.execute("""
+            SELECT execution_id, inputs, attempts FROM execution_jobs
+            WHERE lease_expires_at < ? ORDER BY lease_expires_at LIMIT 1
+        """, (now,)).fetchone()
+        if row is None:
+            row = conn.execute("""
+                SELECT execution_id, inputs, attempts FROM execution_jobs
+                WHERE lease_expires_at IS NULL ORDER BY enqueued_at LIMIT 1
+            """).fetchone()
+        return row
+
+
+class JobWorkerPool:
+    """
+    `workers` asyncio tasks claiming jobs from a JobQueue. `run(job)` executes
+    and persists a job; `give_up(job)` records one that ran out of attempts
+    (it is blocking and runs in a worker thread). Both must handle their own errors.
+    """
+
+    def __init__(self, queue: JobQueue, run: Callable[[Dict[str, Any]], Awaitable[None]],
+                 give_up: Callable[[Dict[str, Any]], None], workers: int = DEFAULT_WORKERS,
+                 lease_s: float = DEFAULT_LEASE_S, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 poll_s: float = DEFAULT_POLL_S):
+        self.queue = queue
+        self.run = run
+        self.give_up = give_up
+        self.workers = workers
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+        self.poll_s = poll_s
+        self._wake: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, asyncio.Event] = {}
+        self.counters = dict.fromkeys(_COUNTERS, 0)
+
+    def start(self):
+        """Start the workers on the running event loop."""
+        if self._tasks:
+            return
+        self._wake = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Cancel the workers and requeue the jobs they were running."""
+        tasks, self._tasks = self._tasks, []
+        unfinished = list(self._running)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if unfinished:
+            self.counters["released"] += await asyncio.to_thread(self.queue.release, unfinished)
+
+    def notify(self):
+        """Wake idle workers after a job was queued by this process."""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def wait_finished(self, execution_id: str, timeout: float):
+        """Return when this process finishes `execution_id`, or after `timeout` seconds."""
+        event = self._waiters.setdefault(execution_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            # Keeps the dict bounded when the job finishes elsewhere; other waiters re-check on their timeout
+            if self._waiters.get(execution_id) is event:
+                del self._waiters[execution_id]
+
+    async def _worker(self):
+        while True:
+            # Cleared before looking, so a job queued meanwhile still wakes this worker
+            self._wake.clear()
+            try:
+                # Queue calls run in a thread: BEGIN IMMEDIATE may wait out another process's write
+                job = await asyncio.to_thread(self.queue.claim, self.lease_s)
+            except sqlite3.Error as e:
+                print(f"[JobWorkerPool] Claim error: {e}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_s)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self.counters["claimed"] += 1
+            await self._work(job)
+
+    async def _work(self, job: Dict[str, Any]):
+        execution_id = job["execution_id"]
+        if job["attempts"] > self.max_attempts:
+            await asyncio.to_thread(self.give_up, job)
+            self.counters["given_up"] += 1
+        else:
+            run = asyncio.ensure_future(self.run(job))
+            self._running[execution_id] = run
+            lease = asyncio.ensure_future(self._keep_lease(execution_id, run))
+            try:
+                await run
+            except asyncio.CancelledError:
+                if not lease.done():
+                    raise  # the pool is stopping; stop() requeues the job
+                self.counters["lease_lost"] += 1
+                return
+            except Exception as e:
+                print(f"[JobWorkerPool] Job {execution_id} failed: {e}")
+            finally:
+                lease.cancel()
+                self._running.pop(execution_id, None)
+        try:
+            if await asyncio.to_thread(self.queue.complete, execution_id):
+                self.counters["completed"] += 1
+        except sqlite3.Error as e:
+            # The lease expires and the job runs again
+            print(f"[JobWorkerPool] Error completing job {execution_id}: {e}")
+        event = self._waiters.pop(execution_id, None)
+        if event is not None:
+            event.set()
+
+    async def _keep_lease(self, execution_id: str, run: asyncio.Future):
+        while True:
+            await asyncio.sleep(self.lease_s / 3)
+            try:
+                held = await asyncio.to_thread(self.queue.heartbeat, execution_id, self.lease_s)
+            except sqlite3.Error as e:
+                print(f"[JobWorkerPool] Heartbeat error: {e}")
+                continue
+            if not held:
+                # Another worker owns the job now; stop this run rather than run it twice at once
+                run.cancel()
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.counters, workers=len(self._tasks), running=len(self._running),
+                    lease_s=self.lease_s, max_attempts=self.max_attempts)
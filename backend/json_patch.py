@@ -0,0 +1,91 @@
+"""
+Minimal RFC 6902 JSON Patch support (add / remove / replace) for state checkpoints.
+
+`make_patch(src, dst)` produces the operations that turn `src` into `dst`;
+`apply_patch(doc, patch)` applies them in place and returns the document.
+Only JSON-compatible values (dict, list, str, int, float, bool, None) are
+supported. Lists that grow at the end produce `add` ops on "/-"; any other
+change in length replaces the whole list.
+"""
+
+from typing import Any, Dict, List
+
+Patch = List[Dict[str, Any]]
+
+
+def _escape(token: str) -> str:
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def make_patch(src: Any, dst: Any) -> Patch:
+    patch: Patch = []
+    _diff(src, dst, "", patch)
+    return patch
+
+
+def _diff(src: Any, dst: Any, path: str, patch: Patch):
+    if src == dst and type(src) is type(dst):
+        return
+    if isinstance(src, dict) and isinstance(dst, dict):
+        for key in src:
+            if key not in dst:
+                patch.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in dst.items():
+            child = f"{path}/{_escape(key)}"
+            if key not in src:
+                patch.append({"op": "add", "path": child, "value": value})
+            else:
+                _diff(src[key], value, child, patch)
+        return
+    if isinstance(src, list) and isinstance(dst, list):
+        if len(dst) >= len(src) and src == dst[:len(src)]:
+            for value in dst[len(src):]:
+                patch.append({"op": "add", "path": f"{path}/-", "value": value})
+            return
+        if len(src) == len(dst):
+            for index, (old, new) in enumerate(zip(src, dst)):
+                _diff(old, new, f"{path}/{index}", patch)
+            return
+    patch.append({"op": "replace", "path": path, "value": dst})
+
+
+def apply_patch(doc: Any, patch: Patch) -> Any:
+    for op in patch:
+        path = op["path"]
+        if path == "":
+            if op["op"] == "remove":
+                doc = None
+            else:
+                doc = op["value"]
+            continue
+
+        tokens = [_unescape(t) for t in path.split("/")[1:]]
+        parent = doc
+        for token in tokens[:-1]:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+        last = tokens[-1]
+
+        if isinstance(parent, list):
+            if op["op"] == "add":
+                if last == "-":
+                    parent.append(op["value"])
+                else:
+                    parent.insert(int(last), op["value"])
+            elif op["op"] == "remove":
+                del parent[int(last)]
+            elif op["op"] == "replace":
+                parent[int(last)] = op["value"]
+            else:
+                raise ValueError(f"Unsupported patch op: {op['op']}")
+        else:
+            if op["op"] in ("add", "replace"):
+                parent[last] = op["value"]
+            elif op["op"] == "remove":
+                del parent[last]
+            else:
+                raise ValueError(f"Unsupported patch op: {op['op']}")
+    return doc
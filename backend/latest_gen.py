@@ -1,18 +1,47 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
+from starlette.requests import ClientDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Any, Dict, List, Optional
-from langgraph.graph import StateGraph, END
-from simpleeval import simple_eval
-import requests
-import uvicorn
-import re
+from typing import Any, AsyncIterator, Dict, List, Optional
+from langgraph.graph import StateGraph
+from langgraph.types import StreamWriter
+import asyncio
 import copy
+import uvicorn
 import sqlite3
 import json
 import uuid
+import base64
+import os
+import time
 from datetime import datetime
 
+from batch_scoring import BatchScorer
+from blob_codec import BlobCodec
+from db_pool import get_pool
+from execution_events import DEFAULT_MAX_PAYLOAD_BYTES, SSE_HEADERS, ExecutionEventStream, stream_run
+from decision_table import DecisionTable
+from graph_cache import (CompiledGraphCache, branch_config, config_branch_id, config_execution_id,
+                         config_node_timings, execution_config)
+from graph_routing import RoutingIndex, add_routes
+from graph_state import WorkflowState, state_delta
+from graph_store import GraphStore
+from http_client import AsyncHttpClient
+from job_queue import JobQueue, JobWorkerPool
+from leases import LeaseTable
+from migrations import apply_migrations
+from path_access import deep_get, deep_set
+from response_cache import STALE, ResponseCacheRegistry
+from retention import RetentionJob, RetentionPolicy
+from script_runner import ScriptEngine, ScriptError, ScriptLimitExceeded
+from service_metrics import ServiceMetricsAggregator
+from single_flight import IDEMPOTENT_METHODS, SingleFlight, request_key
+from state_checkpoints import StateCheckpointer
+from template_engine import compile_template
+from write_behind import get_journal
+
 # -------------------------------------------------------------------
 # FastAPI setup
 # -------------------------------------------------------------------
@@ -25,6 +54,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # -------------------------------------------------------------------
@@ -33,8 +63,64 @@ app.add_middleware(
 
 DB_PATH = "workflow.db"
 
+db_pool = get_pool(DB_PATH)
+# Node records, form responses and metric updates are written behind the graph
+journal = get_journal(db_pool)
+# Graph definitions are stored once per distinct graph and referenced by hash
+graph_store = GraphStore(db_pool)
+# Payloads above the codec threshold are stored compressed
+blob_codec = BlobCodec()
+# State is persisted as JSON Patch deltas with periodic full snapshots
+checkpointer = StateCheckpointer(db_pool, journal, blob_codec)
+# Decision scripts run in worker processes with a timeout, CPU and memory limits
+SCRIPT_WORKERS = 2
+SCRIPT_TIMEOUT_S = 2.0
+SCRIPT_MEMORY_MB = 256
+script_engine = ScriptEngine(SCRIPT_WORKERS, SCRIPT_TIMEOUT_S, memory_mb=SCRIPT_MEMORY_MB)
+# Service nodes share keep-alive connection pools, one per host; idle host pools are closed
+SERVICE_TIMEOUT_S = 15.0
+SERVICE_MAX_CONNECTIONS_PER_HOST = 1000
+SERVICE_MAX_KEEPALIVE_PER_HOST = 200
+SERVICE_MAX_HOSTS = 64
+SERVICE_HOST_IDLE_S = 300.0
+http_client = AsyncHttpClient(SERVICE_TIMEOUT_S, SERVICE_MAX_CONNECTIONS_PER_HOST, SERVICE_MAX_KEEPALIVE_PER_HOST,
+                              max_hosts=SERVICE_MAX_HOSTS, host_idle_s=SERVICE_HOST_IDLE_S)
+# /execute/async runs are queued in the database and run by a pool of workers holding renewable
+# leases; a job whose worker died is claimed again, up to JOB_MAX_ATTEMPTS claims
+JOB_WORKERS = 4
+JOB_LEASE_S = 30.0
+JOB_MAX_ATTEMPTS = 3
+JOB_POLL_S = 1.0
+job_queue = JobQueue(db_pool)
+# Several server processes may share workflow.db; work only one of them may do at a time
+# (resuming an execution, retention) is claimed through lease rows
+leases = LeaseTable(db_pool)
+RESUME_LEASE_S = 30.0
+# Longest a pause waits for its checkpoints to commit before the row says paused
+PAUSE_FLUSH_TIMEOUT_S = 5.0
+# Per-node response caches for service nodes with a `cache` block
+response_caches = ResponseCacheRegistry()
+# Identical in-flight service calls are shared (single flight)
+service_calls = SingleFlight()
+# Service call counters and latency histograms are aggregated in memory and flushed periodically
+metrics_aggregator = ServiceMetricsAggregator(db_pool)
+
+# Finished executions outside these policies are archived out of the hot tables.
+# Keys are workflow names; "*" applies to workflows without their own policy.
+ARCHIVE_DIR = "archive"
+RETENTION_INTERVAL_S = 3600
+RETENTION_POLICIES = {
+    "*": RetentionPolicy(max_age_days=30),
+}
+retention_job = RetentionJob(db_pool, journal, graph_store, checkpointer, blob_codec,
+                             RETENTION_POLICIES, archive_dir=ARCHIVE_DIR, leases=leases)
+
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
+    with db_pool.transaction() as conn:
+        _create_tables(conn)
+
+
+def _create_tables(conn: sqlite3.Connection):
     cur = conn.cursor()
 
     # workflow_executions now supports optional parent_execution_id
@@ -46,12 +132,20 @@ def init_db():
             current_node_id TEXT,
             state_data TEXT NOT NULL,
             graph_json TEXT NOT NULL,
+            graph_hash TEXT,
             parent_execution_id TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     """)
 
+    GraphStore.create_table(conn)
+    StateCheckpointer.create_table(conn)
+    RetentionJob.create_table(conn)
+    JobQueue.create_table(conn)
+    LeaseTable.create_table(conn)
+    ServiceMetricsAggregator.create_table(conn)
+
     cur.execute("""
         CREATE TABLE IF NOT EXISTS node_executions (
             id TEXT PRIMARY KEY,
@@ -62,10 +156,13 @@ def init_db():
             status TEXT NOT NULL,
             request_data TEXT,
             response_data TEXT,
+            request_codec TEXT,
+            response_codec TEXT,
             error_message TEXT,
             execution_time_ms INTEGER,
             started_at TIMESTAMP,
             completed_at TIMESTAMP,
+            branch_id TEXT,
             FOREIGN KEY (workflow_execution_id) REFERENCES workflow_executions(id)
         )
     """)
@@ -89,149 +186,96 @@ def init_db():
             successes INTEGER DEFAULT 0,
             failures INTEGER DEFAULT 0,
             avg_time_ms REAL DEFAULT 0,
-            last_called TIMESTAMP
+            last_called TIMESTAMP,
+            p50_ms REAL,
+            p95_ms REAL,
+            p99_ms REAL,
+            max_ms INTEGER
         )
     """)
 
-    conn.commit()
-    conn.close()
+    # Columns and indexes added after the tables were first released
+    apply_migrations(conn)
 
 init_db()
 
 def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-# -------------------------------------------------------------------
-# Utility: Recursive lookup and template substitution
-# -------------------------------------------------------------------
-
-def deep_get(data: Dict[str, Any], path: str) -> Any:
-    """Get deeply nested dict/list value using dot + bracket notation."""
-    if not path:
-        return data
-    parts = re.split(r'\.(?![^\[]*\])', path)
-    for part in parts:
-        match = re.findall(r'([^\[\]]+)|\[(\d+)\]', part)
-        for key, index in match:
-            if key:
-                if isinstance(data, dict):
-                    data = data.get(key)
-                else:
-                    return None
-            elif index is not None:
-                if isinstance(data, list):
-                    try:
-                        data = data[int(index)]
-                    except (IndexError, ValueError):
-                        return None
-                else:
-                    return None
-            if data is None:
-                return None
-    return data
-
-
-def render_template(obj: Any, context: Dict[str, Any]):
-    """Replace placeholders like {input.company.name} recursively."""
-    if isinstance(obj, str):
-        matches = re.findall(r"\{([^{}]+)\}", obj)
-        for m in matches:
-            val = deep_get(context, m.strip())
-            if val is not None:
-                obj = obj.replace("{" + m + "}", str(val))
-        return obj
-    elif isinstance(obj, dict):
-        return {k: render_template(v, context) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [render_template(v, context) for v in obj]
-    return obj
+    """Return this thread's pooled connection (do not close it)."""
+    return db_pool.connection()
 
 # -------------------------------------------------------------------
 # Database Helper Functions (with metrics)
 # -------------------------------------------------------------------
 
-def save_workflow_execution(execution_id: str, workflow_name: str, status: str, current_node: Optional[str], state: Dict, graph: Dict, parent_execution_id: Optional[str] = None):
-    conn = get_db()
-    cur = conn.cursor()
+def save_workflow_execution(execution_id: str, workflow_name: str, status: str, current_node: Optional[str], state: Dict, graph: Dict, parent_execution_id: Optional[str] = None, new: bool = False):
+    # State lives in state_checkpoints; the row keeps an empty state_data (`new`: first save of a fresh execution).
+    # Blocking (BEGIN IMMEDIATE may wait out another process's write): async callers run it in a thread
+    checkpointer.checkpoint(execution_id, state, current_node, new=new)
+    graph_hash = graph_store.put(graph)
+    if status == "paused" and not journal.flush(PAUSE_FLUSH_TIMEOUT_S):
+        # Any process may resume it once the row says paused, so its checkpoints should be committed first
+        print(f"[Checkpoints] Checkpoints of {execution_id} not committed after {PAUSE_FLUSH_TIMEOUT_S:g}s; marking it paused anyway")
+    save_execution_rows([(execution_id, workflow_name, status, current_node, graph_hash, parent_execution_id)])
+    if status != "running":
+        checkpointer.discard(execution_id)
+
+
+def save_execution_rows(rows: List[tuple]):
+    """Upsert (id, workflow_name, status, current_node_id, graph_hash, parent_execution_id) rows in one transaction."""
     now = datetime.now().isoformat()
-    cur.execute("""
-        INSERT OR REPLACE INTO workflow_executions 
-        (id, workflow_name, status, current_node_id, state_data, graph_json, parent_execution_id, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    """, (execution_id, workflow_name, status, current_node, json.dumps(state), json.dumps(graph), parent_execution_id, now))
-    conn.commit()
-    conn.close()
+    with db_pool.transaction() as conn:
+        # Upsert (not INSERT OR REPLACE) so created_at keeps the time the execution started
+        conn.executemany("""
+            INSERT INTO workflow_executions 
+            (id, workflow_name, status, current_node_id, state_data, graph_json, graph_hash, parent_execution_id, updated_at)
+            VALUES (?, ?, ?, ?, '', '', ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                workflow_name = excluded.workflow_name,
+                state_data = excluded.state_data,
+                graph_json = excluded.graph_json,
+                status = excluded.status,
+                current_node_id = excluded.current_node_id,
+                graph_hash = excluded.graph_hash,
+                parent_execution_id = COALESCE(excluded.parent_execution_id, parent_execution_id),
+                updated_at = excluded.updated_at
+        """, [tuple(row) + (now,) for row in rows])
 
 
 def save_node_execution(workflow_exec_id: str, node_id: str, node_type: str, node_label: str, 
                         status: str, request_data: Any = None, response_data: Any = None, 
-                        error_msg: str = None, exec_time: int = None):
-    conn = get_db()
-    cur = conn.cursor()
+                        error_msg: str = None, exec_time: int = None,
+                        started_at: Optional[datetime] = None, branch_id: Optional[str] = None):
     node_exec_id = str(uuid.uuid4())
-    started_at = datetime.now().isoformat()
-    completed_at = started_at if status == 'completed' else None
-
-    cur.execute("""
+    now = datetime.now()
+    started_at = (started_at or now).isoformat()
+    completed_at = now.isoformat() if status == 'completed' else None
+    request_blob, request_codec = blob_codec.encode(json.dumps(request_data) if request_data is not None else None)
+    response_blob, response_codec = blob_codec.encode(json.dumps(response_data) if response_data is not None else None)
+    row = (node_exec_id, workflow_exec_id, node_id, node_type, node_label, status,
+           request_blob, response_blob, request_codec, response_codec,
+           error_msg, exec_time, started_at, completed_at, branch_id)
+
+    journal.submit("""
         INSERT INTO node_executions 
         (id, workflow_execution_id, node_id, node_type, node_label, status, 
-         request_data, response_data, error_message, execution_time_ms, started_at, completed_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (node_exec_id, workflow_exec_id, node_id, node_type, node_label, status,
-          json.dumps(request_data) if request_data is not None else None,
-          json.dumps(response_data) if response_data is not None else None,
-          error_msg, exec_time, started_at, completed_at))
-    conn.commit()
-    conn.close()
+         request_data, response_data, request_codec, response_codec,
+         error_message, execution_time_ms, started_at, completed_at, branch_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, row)
     return node_exec_id
 
 
 def save_form_response(workflow_exec_id: str, node_id: str, form_data: Dict):
-    conn = get_db()
-    cur = conn.cursor()
     form_id = str(uuid.uuid4())
-    cur.execute("""
+    journal.submit("""
         INSERT INTO form_responses (id, workflow_execution_id, node_id, form_data)
         VALUES (?, ?, ?, ?)
     """, (form_id, workflow_exec_id, node_id, json.dumps(form_data)))
-    conn.commit()
-    conn.close()
 
 
 def update_service_metrics(node_id: str, success: bool, exec_time_ms: Optional[int]):
-    conn = get_db()
-    cur = conn.cursor()
-    now = datetime.now().isoformat()
-
-    # Fetch existing
-    cur.execute("SELECT total_calls, successes, failures, avg_time_ms FROM service_metrics WHERE node_id = ?", (node_id,))
-    row = cur.fetchone()
-    if row:
-        total, succ, fail, avg = row
-        total = total + 1
-        succ = succ + (1 if success else 0)
-        fail = fail + (0 if success else 1)
-        if exec_time_ms is not None:
-            # incremental average
-            new_avg = ((avg * (total - 1)) + exec_time_ms) / total
-        else:
-            new_avg = avg
-        cur.execute("""
-            UPDATE service_metrics SET total_calls = ?, successes = ?, failures = ?, avg_time_ms = ?, last_called = ? WHERE node_id = ?
-        """, (total, succ, fail, new_avg, now, node_id))
-    else:
-        total = 1
-        succ = 1 if success else 0
-        fail = 0 if success else 1
-        new_avg = exec_time_ms if exec_time_ms is not None else 0
-        cur.execute("""
-            INSERT INTO service_metrics (node_id, total_calls, successes, failures, avg_time_ms, last_called)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (node_id, total, succ, fail, new_avg, now))
-    conn.commit()
-    conn.close()
+    # Recorded in memory; ServiceMetricsAggregator upserts the deltas into service_metrics
+    metrics_aggregator.record(node_id, success, exec_time_ms)
 
 
 def get_workflow_execution(execution_id: str):
@@ -239,27 +283,91 @@ def get_workflow_execution(execution_id: str):
     cur = conn.cursor()
     cur.execute("SELECT * FROM workflow_executions WHERE id = ?", (execution_id,))
     row = cur.fetchone()
-    conn.close()
     if row:
-        return dict(row)
+        workflow_exec = dict(row)
+        if workflow_exec.get("graph_hash"):
+            workflow_exec["graph_json"] = graph_store.get_json(workflow_exec["graph_hash"])
+        return workflow_exec
     return None
 
+
+def load_execution_graph(workflow_exec: Dict) -> Dict:
+    """Parsed graph of an execution row. Shared with the graph store cache, so do not mutate it."""
+    if workflow_exec.get("graph_hash"):
+        graph = graph_store.get(workflow_exec["graph_hash"])
+        if graph is not None:
+            return graph
+    return json.loads(workflow_exec["graph_json"] or "{}")
+
+
+def load_execution_state(workflow_exec: Dict) -> Dict:
+    """Reconstruct the latest state of an execution row from its checkpoints."""
+    if workflow_exec.get("state_data"):
+        # Rows written before incremental checkpoints carry the full state inline
+        return json.loads(workflow_exec["state_data"])
+    state = checkpointer.load(workflow_exec["id"])
+    return state if state is not None else {}
+
+
+def decode_node_execution(row) -> Dict:
+    """node_executions row as a dict, with compressed payloads decoded back to JSON text."""
+    node_exec = dict(row)
+    node_exec["request_data"] = blob_codec.decode(node_exec["request_data"], node_exec.pop("request_codec", None))
+    node_exec["response_data"] = blob_codec.decode(node_exec["response_data"], node_exec.pop("response_codec", None))
+    return node_exec
+
 # -------------------------------------------------------------------
 # Node: Service Node (stores metrics)
 # -------------------------------------------------------------------
 
-def make_service_node(node_data: Dict[str, Any], execution_id: str):
+def make_service_node(node_data: Dict[str, Any]):
     url = node_data["data"].get("url")
     method = node_data["data"].get("method", "POST").upper()
-    request_template = node_data["data"].get("request", {})
+    # Compiled once per node; compiled graphs are cached, so once per graph
+    request_template = compile_template(node_data["data"].get("request", {}))
     mappings = node_data["data"].get("mappings", [])
-
-    def run_fn(state: Dict[str, Any]):
+    # Opt-in response cache, shared across compiles of this node (ValueError on bad settings)
+    cache_config = node_data["data"].get("cache")
+    cache = response_caches.for_node(node_data["id"], cache_config) if cache_config else None
+    # Concurrent identical calls share one request; default on only for idempotent methods
+    coalesce = bool(node_data["data"].get("coalesce", method in IDEMPOTENT_METHODS))
+
+    async def send(payload: Dict[str, Any]):
+        started = datetime.now()
+        try:
+            resp = await http_client.request(method, url, json=payload)
+            ok = resp.status_code < 400
+            data = resp.json() if ok else {"error": resp.text}
+            error_msg = None if ok else resp.text
+            success = ok
+        except Exception as e:
+            data = {"error": str(e)}
+            error_msg = str(e)
+            success = False
+        return data, success, error_msg, int((datetime.now() - started).total_seconds() * 1000)
+
+    async def call(payload: Dict[str, Any]):
+        """`send`, or a copy of the identical call's result when one is in flight; adds `coalesced`."""
+        if not coalesce:
+            return (*await send(payload), False)
+        result, coalesced = await service_calls.do(request_key(method, url, payload), lambda: send(payload))
+        data, success, error_msg, exec_time = result
+        return (copy.deepcopy(data) if coalesced else data), success, error_msg, exec_time, coalesced
+
+    async def refresh(node_id: str, payload: Dict[str, Any]):
+        """Background call for stale-while-revalidate; the new response, or None on failure."""
+        data, success, _, exec_time, coalesced = await call(payload)
+        if not coalesced:
+            update_service_metrics(node_id, success, exec_time)
+        return data if success else None
+
+    async def run_fn(state: Dict[str, Any], config: Dict[str, Any]):
+        execution_id = config_execution_id(config)
         start_time = datetime.now()
         node_id = node_data["id"]
         node_label = node_data.get("data", {}).get("label", node_id)
 
-        payload = render_template(copy.deepcopy(request_template), state)
+        payload = request_template.render(state)
 
         # Apply explicit mappings (multiple supported)
         for m in mappings:
@@ -274,36 +382,39 @@ def make_service_node(node_data: Dict[str, Any], execution_id: str):
                     val = str(val).lower()
                 elif transform == "strip":
                     val = str(val).strip()
-                # Support nested target path
-                # if target like "serviceResult.key"
-                parts = target.split('.')
-                sub = payload
-                for p in parts[:-1]:
-                    if p not in sub or not isinstance(sub[p], dict):
-                        sub[p] = {}
-                    sub = sub[p]
-                sub[parts[-1]] = val
-
-        try:
-            resp = requests.request(method, url, json=payload, timeout=15)
-            data = resp.json() if resp.ok else {"error": resp.text}
-            error_msg = None if resp.ok else resp.text
-            success = resp.ok
-        except Exception as e:
-            data = {"error": str(e)}
-            error_msg = str(e)
-            success = False
+                # Nested targets like "serviceResult.key" or "items[0].name"
+                deep_set(payload, target, val)
+
+        cache_key, data, freshness = None, None, None
+        if cache is not None:
+            cache_key = cache.key(method, url, payload)
+            data, freshness = cache.lookup(cache_key)
+
+        if freshness is not None:
+            if freshness == STALE:
+                cache.revalidate(cache_key, lambda: refresh(node_id, payload))
+            success, error_msg, status = True, None, "cached"
+        else:
+            data, success, error_msg, _, coalesced = await call(payload)
+            if coalesced:
+                status = "coalesced"
+            else:
+                status = "completed" if success else "failed"
+                if success and cache is not None:
+                    cache.store(cache_key, data)
 
         exec_time = int((datetime.now() - start_time).total_seconds() * 1000)
 
         # Save node execution to DB
         save_node_execution(
             execution_id, node_id, "service", node_label,
-            "completed" if success else "failed", payload, data, error_msg, exec_time
+            status, payload, data, error_msg, exec_time,
+            started_at=start_time, branch_id=config_branch_id(config)
         )
 
-        # Update service metrics
-        update_service_metrics(node_id, success, exec_time)
+        # Update service metrics (cache hits and coalesced calls did not call the service)
+        if status not in ("cached", "coalesced"):
+            update_service_metrics(node_id, success, exec_time)
 
         # Store response in state
         state[node_data["id"]] = {
@@ -311,7 +422,9 @@ def make_service_node(node_data: Dict[str, Any], execution_id: str):
             "response": data,
             "_metrics": {
                 "last_exec_ms": exec_time,
-                "success": success
+                "success": success,
+                "cached": status == "cached",
+                "coalesced": status == "coalesced"
             }
         }
         return state
@@ -322,47 +435,46 @@ def make_service_node(node_data: Dict[str, Any], execution_id: str):
 # Node: Decision Node
 # -------------------------------------------------------------------
 
-def make_decision_node(node_data: Dict[str, Any], execution_id: str):
+def make_decision_node(node_data: Dict[str, Any]):
     data = node_data.get("data", {})
     rules = data.get("rules", [])
     script = data.get("script")
+    # Syntax errors fail the graph compile; the code itself is cached by hash
+    compiled_script = script_engine.compile(script) if script else None
+    # Rules are indexed once per graph compile; conditions are validated here (ConditionError)
+    table = DecisionTable(rules, data.get("hit_policy"))
 
-    def run_fn(state: Dict[str, Any]):
+    async def run_fn(state: Dict[str, Any], config: Dict[str, Any]):
+        execution_id = config_execution_id(config)
         start_time = datetime.now()
         node_id = node_data["id"]
         node_label = node_data.get("data", {}).get("label", node_id)
 
-        new_state = state.copy()
-        actions_taken = []
-
-        # Rule-based evaluation (multiple conditions)
-        if rules:
-            for rule in rules:
-                cond = rule.get("condition")
-                try:
-                    if simple_eval(cond, names={"state": new_state, "input": new_state.get("input", {})}):
-                        action = rule.get("action", {})
-                        if isinstance(action, dict):
-                            new_state.update(action)
-                            actions_taken.append({"condition": cond, "action": action})
-                except Exception as e:
-                    print(f"[DecisionNode-Rules] Condition error: {e}")
-
-        # Script mode (Python block)
-        if script:
+        # Rule-based evaluation: only rules the table's indexes select are evaluated
+        new_state, actions_taken = table.evaluate(state)
+
+        # Script mode (Python block), run in the script worker pool
+        script_error = None
+        if compiled_script is not None:
             try:
-                local_env = {"state": new_state}
-                exec(script, {}, local_env)
-                new_state = local_env.get("state", new_state)
-            except Exception as e:
+                # Blocks on the worker's pipe; keep it off the event loop
+                new_state = await asyncio.to_thread(script_engine.run, compiled_script, new_state)
+            except ScriptLimitExceeded as e:
+                script_error = str(e)
+                print(f"[DecisionNode-Script] {script_error}")
+            except ScriptError as e:
                 print(f"[DecisionNode-Script] Script error: {e}")
+                if e.state is not None:
+                    new_state = e.state
 
         exec_time = int((datetime.now() - start_time).total_seconds() * 1000)
 
         # Save node execution to DB
         save_node_execution(
             execution_id, node_id, "decision", node_label,
-            "completed", {"rules": rules, "script": script}, {"actions_taken": actions_taken}, None, exec_time
+            "failed" if script_error else "completed", {"rules": rules, "script": script},
+            {"actions_taken": actions_taken}, script_error, exec_time,
+            started_at=start_time, branch_id=config_branch_id(config)
         )
 
         return new_state
@@ -373,12 +485,13 @@ def make_decision_node(node_data: Dict[str, Any], execution_id: str):
 # Node: Form Node (Pauses workflow)
 # -------------------------------------------------------------------
 
-def make_form_node(node_data: Dict[str, Any], execution_id: str):
+def make_form_node(node_data: Dict[str, Any]):
     node_id = node_data["id"]
     node_label = node_data.get("data", {}).get("label", node_id)
     form_schema = node_data.get("data", {}).get("schema", {})
 
-    def run_fn(state: Dict[str, Any]):
+    async def run_fn(state: Dict[str, Any], config: Dict[str, Any]):
+        execution_id = config_execution_id(config)
         # Mark as paused and save to DB
         save_node_execution(
             execution_id, node_id, "form", node_label,
@@ -403,11 +516,13 @@ def make_form_node(node_data: Dict[str, Any], execution_id: str):
 # The sub-workflow runs as a nested execution (a new workflow_executions row with parent_execution_id)
 # -------------------------------------------------------------------
 
-def make_subworkflow_node(node_data: Dict[str, Any], execution_id: str):
+def make_subworkflow_node(node_data: Dict[str, Any]):
     node_id = node_data["id"]
     node_label = node_data.get("data", {}).get("label", node_id)
 
-    def run_fn(state: Dict[str, Any]):
+    async def run_fn(state: Dict[str, Any], config: Dict[str, Any]):
+        execution_id = config_execution_id(config)
+        start_time = datetime.now()
         # Determine subgraph
         subgraph = node_data.get("data", {}).get("graph")
         graph_ref = node_data.get("data", {}).get("graph_ref")
@@ -420,7 +535,7 @@ def make_subworkflow_node(node_data: Dict[str, Any], execution_id: str):
                 # cannot find referenced graph
                 save_node_execution(execution_id, node_id, "subworkflow", node_label, "failed", None, {"error": "Referenced workflow not found"}, "Referenced workflow not found", 0)
                 return parent_state
-            subgraph = json.loads(ref_exec["graph_json"])
+            subgraph = load_execution_graph(ref_exec)
 
         if not subgraph:
             save_node_execution(execution_id, node_id, "subworkflow", node_label, "failed", None, {"error": "No subgraph provided"}, "No subgraph provided", 0)
@@ -430,30 +545,44 @@ def make_subworkflow_node(node_data: Dict[str, Any], execution_id: str):
         sub_execution_id = str(uuid.uuid4())
         sub_state = {"input": parent_state.get("input", {}).copy()} if isinstance(parent_state.get("input"), dict) else {"input": parent_state.get("input")}
 
-        save_workflow_execution(sub_execution_id, node_label or "subworkflow", "running", subgraph.get("nodes", [])[0].get("id") if subgraph.get("nodes") else None, sub_state, subgraph, parent_execution_id=execution_id)
-
         # Build and run subgraph
         try:
-            sub_graph = build_graph_from_json(subgraph, sub_execution_id)
-            sub_result = sub_graph.invoke(sub_state)
+            sub_routing = routing_cache.get(subgraph)
+            await asyncio.to_thread(save_workflow_execution, sub_execution_id, node_label or "subworkflow", "running", sub_routing.entry, sub_state, subgraph, parent_execution_id=execution_id, new=True)
+            sub_graph = graph_cache.get(subgraph)
+            sub_result = await sub_graph.ainvoke(sub_state, config=execution_config(sub_execution_id))
 
             # Save subworkflow completed
-            save_workflow_execution(sub_execution_id, node_label or "subworkflow", "completed", subgraph.get("nodes", [])[-1].get("id") if subgraph.get("nodes") else None, sub_result, subgraph, parent_execution_id=execution_id)
+            await asyncio.to_thread(save_workflow_execution, sub_execution_id, node_label or "subworkflow", "completed", sub_routing.exit_node, sub_result, subgraph, parent_execution_id=execution_id)
 
             # Save node execution for the subworkflow node itself
-            save_node_execution(execution_id, node_id, "subworkflow", node_label, "completed", {"sub_execution_id": sub_execution_id}, sub_result, None, 0)
+            save_node_execution(execution_id, node_id, "subworkflow", node_label, "completed", {"sub_execution_id": sub_execution_id}, sub_result, None, 0,
+                                started_at=start_time, branch_id=config_branch_id(config))
 
             # Merge sub_result into parent state under node id
             parent_state[node_id] = {"sub_execution_id": sub_execution_id, "result": sub_result}
             return parent_state
         except Exception as e:
-            save_workflow_execution(sub_execution_id, node_label or "subworkflow", "failed", "unknown", {"error": str(e)}, subgraph, parent_execution_id=execution_id)
-            save_node_execution(execution_id, node_id, "subworkflow", node_label, "failed", None, {"error": str(e)}, str(e), 0)
+            await asyncio.to_thread(save_workflow_execution, sub_execution_id, node_label or "subworkflow", "failed", "unknown", {"error": str(e)}, subgraph, parent_execution_id=execution_id)
+            save_node_execution(execution_id, node_id, "subworkflow", node_label, "failed", None, {"error": str(e)}, str(e), 0,
+                                started_at=start_time, branch_id=config_branch_id(config))
             parent_state[node_id] = {"error": str(e)}
             return parent_state
 
     return run_fn
 
+# -------------------------------------------------------------------
+# Node: Join Node
+# Waits for every incoming branch (see graph_routing); checkpoint_after
+# records the join with the timing of each branch
+# -------------------------------------------------------------------
+
+def make_join_node(node_data: Dict[str, Any]):
+    async def run_fn(state: Dict[str, Any], config: Dict[str, Any]):
+        return state
+
+    return run_fn
+
 # -------------------------------------------------------------------
 # Node Factory
 # -------------------------------------------------------------------
@@ -462,6 +591,7 @@ NODE_FACTORY = {
     "service": make_service_node,
     "decision": make_decision_node,
     "form": make_form_node,
+    "join": make_join_node,
     "subworkflow": make_subworkflow_node,
 }
 
@@ -469,54 +599,78 @@ NODE_FACTORY = {
 # Graph Builder
 # -------------------------------------------------------------------
 
-def build_graph_from_json(graph_json: Dict[str, Any], execution_id: str):
-    g = StateGraph(dict)
+def save_join_execution(execution_id: str, join_id: str, routing: RoutingIndex, config: Dict[str, Any]):
+    """Record that the branches into `join_id` finished, with the start/end of each."""
+    summary = routing.branch_timings(join_id, config_node_timings(config))
+    save_node_execution(
+        execution_id, join_id, "join", join_id, "completed",
+        {"waited_for": list(routing.joins[join_id])}, summary, None, summary["wall_ms"],
+        branch_id=config_branch_id(config)
+    )
+
+
+def checkpoint_after(node_id: str, node_type: str, func, routing: RoutingIndex):
+    """
+    Wrap a node function: it gets a private copy of the state, its run is
+    timed for join summaries, and only the keys it changed are checkpointed
+    and returned (merged by WorkflowState, so parallel branches don't clash).
+    Progress events go to the custom stream, which only streamed runs read.
+    """
+    branch_id = routing.branches.get(node_id)
+    event = {"node_id": node_id, "node_type": node_type, "branch_id": branch_id}
+
+    async def run_fn(state: Dict[str, Any], config: Dict[str, Any], writer: StreamWriter):
+        execution_id = config_execution_id(config)
+        if node_id in routing.join_branches:
+            save_join_execution(execution_id, node_id, routing, config)
+        config = branch_config(config, branch_id)
+        started = datetime.now()
+        writer(dict(event, event="node-started", started_at=started.isoformat()))
+        try:
+            result = await func(dict(state), config)
+        except Exception as e:
+            writer(dict(event, event="node-failed", error=str(e)))
+            raise
+        finished = datetime.now()
+        config_node_timings(config)[node_id] = (started, finished)
+        update = state_delta(state, result)
+        checkpointer.checkpoint_update(execution_id, update, node_id)
+        writer(dict(event, event="node-completed", update=update,
+                    duration_ms=int((finished - started).total_seconds() * 1000)))
+        return update
+
+    return run_fn
+
+
+def build_graph_from_json(graph_json: Dict[str, Any]):
+    """Compile a graph. Execution context comes from the invoke config, so the result is reusable."""
+    g = StateGraph(WorkflowState)
+    routing = routing_cache.get(graph_json)
 
     # Register nodes
     for node in graph_json.get("nodes", []):
         ntype = node["type"]
         if ntype not in NODE_FACTORY:
             raise Exception(f"Unknown node type: {ntype}")
-        func = NODE_FACTORY[ntype](node, execution_id)
-        g.add_node(node["id"], func)
-
-    # Handle edges (with multiple conditional edges per node)
-    edges_by_source = {}
-    for e in graph_json.get("edges", []):
-        edges_by_source.setdefault(e["source"], []).append(e)
-
-    for source, edges in edges_by_source.items():
-        if any("condition" in e for e in edges):
-            def conditional_fn(state, edges=edges):
-                for edge in edges:
-                    cond = edge.get("condition")
-                    if not cond:
-                        continue
-                    try:
-                        if simple_eval(cond, names={"state": state, "input": state.get("input", {})}):
-                            return edge["target"]
-                    except Exception as ex:
-                        print("Condition eval error:", ex)
-                # fallback (no match)
-                for e in edges:
-                    if "condition" not in e:
-                        return e["target"]
-                return None
-            g.add_conditional_edges(source, conditional_fn)
-        else:
-            for e in edges:
-                g.add_edge(e["source"], e["target"])
-
-    # Entry and end
-    if graph_json.get("nodes"):
-        entry = graph_json["nodes"][0]["id"]
-        g.set_entry_point(entry)
-        g.add_edge(graph_json["nodes"][-1]["id"], END)
-    else:
-        # empty graph -> entry is END
-        g.set_entry_point(END)
+        func = NODE_FACTORY[ntype](node)
+        g.add_node(node["id"], checkpoint_after(node["id"], ntype, func, routing))
+
+    add_routes(g, routing)
     return g.compile()
 
+
+# Compiled graphs and routing indexes are shared by every execution of the same graph JSON
+routing_cache = CompiledGraphCache(RoutingIndex)
+graph_cache = CompiledGraphCache(build_graph_from_json)
+
+
+def routing_for(graph_json: Dict[str, Any]) -> RoutingIndex:
+    """The graph's routing index; 400 if its edges, roots, conditions or joins are invalid."""
+    try:
+        return routing_cache.get(graph_json)
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid graph: {e}")
+
 # -------------------------------------------------------------------
 # FastAPI Models
 # -------------------------------------------------------------------
@@ -537,153 +691,771 @@ class ResumeRequest(BaseModel):
     execution_id: str
     form_data: Dict[str, Any]
 
+class AnalyzeGraphRequest(BaseModel):
+    graph: Dict[str, Any]
+
 
 # -------------------------------------------------------------------
 # API Endpoints
 # -------------------------------------------------------------------
 
-@app.post("/execute", response_model=ExecuteResponse)
-def execute_workflow(req: ExecuteRequest):
-    execution_id = str(uuid.uuid4())
+def finish_execution(execution_id: str, workflow_name: str, result: Dict[str, Any], graph_json: Dict[str, Any],
+                     routing: RoutingIndex) -> ExecuteResponse:
+    """Persist a run that paused at a form or completed, and build its response."""
+    # Check if workflow is paused at form
+    if "_paused_at_form" in result:
+        form_info = result["_paused_at_form"]
+        save_workflow_execution(
+            execution_id, workflow_name, "paused",
+            form_info["node_id"], result, graph_json
+        )
+        return ExecuteResponse(
+            status="paused",
+            execution_id=execution_id,
+            result=result,
+            paused_at_form=form_info
+        )
+
+    # Workflow completed successfully
+    save_workflow_execution(
+        execution_id, workflow_name, "completed",
+        routing.exit_node, result, graph_json
+    )
+    return ExecuteResponse(
+        status="success",
+        execution_id=execution_id,
+        result=result
+    )
+
+
+def fail_execution(execution_id: str, workflow_name: str, graph_json: Dict[str, Any], error: Exception) -> ExecuteResponse:
+    save_workflow_execution(
+        execution_id, workflow_name, "failed",
+        "unknown", {"error": str(error)}, graph_json
+    )
+    return ExecuteResponse(
+        status="error",
+        execution_id=execution_id,
+        result={"error": str(error)}
+    )
+
+
+def paused_execution(execution_id: str) -> Dict[str, Any]:
+    """The workflow_executions row of a paused execution; 404/400 otherwise."""
+    workflow_exec = get_workflow_execution(execution_id)
+
+    if not workflow_exec:
+        raise HTTPException(status_code=404, detail="Workflow execution not found")
+
+    if workflow_exec["status"] != "paused":
+        raise HTTPException(status_code=400, detail="Workflow is not paused")
 
+    return workflow_exec
+
+
+def claim_resume(execution_id: str) -> Dict[str, Any]:
+    """
+    Take the resume lease of a paused execution and return its row; 409 while
+    another worker (in any process) is resuming it, 404/400 as paused_execution,
+    400 if its stored graph cannot be routed.
+    The caller runs the resume inside `leases.kept(resume_lease(execution_id), ...)`.
+    """
+    if not leases.acquire(resume_lease(execution_id), RESUME_LEASE_S):
+        raise HTTPException(status_code=409, detail="Workflow is already being resumed")
     try:
-        state = {"input": req.inputs}
+        # Read under the lease: a resume that finished just before may have moved it on
+        workflow_exec = paused_execution(execution_id)
+        # 400 while the lease is released here, rather than failing the paused execution later
+        routing_for(load_execution_graph(workflow_exec))
+        return workflow_exec
+    except Exception:
+        leases.release(resume_lease(execution_id))
+        raise
 
-        # Save workflow execution as started
-        save_workflow_execution(
-            execution_id, req.workflow_name, "running",
-            req.graph.get("nodes", [])[0]["id"] if req.graph.get("nodes") else None,
-            state, req.graph
-        )
 
-        # Build and execute graph
-        graph = build_graph_from_json(req.graph, execution_id)
-        result = graph.invoke(state)
-
-        # Check if workflow is paused at form
-        if "_paused_at_form" in result:
-            form_info = result["_paused_at_form"]
-            save_workflow_execution(
-                execution_id, req.workflow_name, "paused",
-                form_info["node_id"], result, req.graph
-            )
-            return ExecuteResponse(
-                status="paused",
-                execution_id=execution_id,
-                result=result,
-                paused_at_form=form_info
-            )
-
-        # Workflow completed successfully
-        save_workflow_execution(
-            execution_id, req.workflow_name, "completed",
-            req.graph.get("nodes", [])[-1]["id"] if req.graph.get("nodes") else None,
-            result, req.graph
+def resume_lease(execution_id: str) -> str:
+    return f"resume:{execution_id}"
+
+
+def begin_resume(req: ResumeRequest, workflow_exec: Dict[str, Any]):
+    """
+    Apply submitted form data to a paused execution and mark it running.
+    Returns (state, graph_json, routing, resume_at); resume_at == [] means nothing is left to run.
+    """
+    # Parse stored state and graph
+    state = load_execution_state(workflow_exec)
+    graph_json = load_execution_graph(workflow_exec)
+    routing = routing_cache.get(graph_json)
+    resume_at = None
+
+    # Remove pause marker and add form data to state
+    if "_paused_at_form" in state:
+        paused_info = state.pop("_paused_at_form")
+        node_id = paused_info["node_id"]
+
+        # Save form response
+        save_form_response(req.execution_id, node_id, req.form_data)
+
+        # Update node execution as completed
+        save_node_execution(
+            req.execution_id, node_id, "form", node_id,
+            "completed", None, req.form_data, None, 0
         )
 
-        return ExecuteResponse(
-            status="success",
-            execution_id=execution_id,
-            result=result
+        # Add form data to state
+        state[node_id] = {"form_data": req.form_data}
+        # merge into input
+        if "input" not in state:
+            state["input"] = {}
+        if isinstance(req.form_data, dict):
+            state["input"].update(req.form_data)
+
+        # Continue after the form; a form without outgoing edges completes the run
+        resume_at = routing.next_nodes(node_id, state)
+
+    # Update workflow status to running
+    save_workflow_execution(
+        req.execution_id, workflow_exec["workflow_name"], "running",
+        resume_at[0] if resume_at else workflow_exec.get("current_node_id"), state, graph_json
+    )
+    return state, graph_json, routing, resume_at
+
+
+async def run_execution(execution_id: str, workflow_name: str, graph_json: Dict[str, Any],
+                        inputs: Dict[str, Any], new: bool = False) -> ExecuteResponse:
+    """
+    Run a graph from its entry and persist the outcome (for /execute and queued jobs).
+    `new`: the execution was created by this call and has no checkpoint yet.
+    """
+    try:
+        state = {"input": inputs}
+        routing = routing_cache.get(graph_json)
+
+        # Save workflow execution as started
+        await asyncio.to_thread(
+            save_workflow_execution, execution_id, workflow_name, "running",
+            routing.entry, state, graph_json, new=new
         )
+
+        # Build and execute graph
+        graph = graph_cache.get(graph_json)
+        result = await graph.ainvoke(state, config=execution_config(execution_id))
+        return await asyncio.to_thread(finish_execution, execution_id, workflow_name, result, graph_json, routing)
     except Exception as e:
         # Save workflow as failed
-        save_workflow_execution(
-            execution_id, req.workflow_name, "failed",
-            "unknown", {"error": str(e)}, req.graph
-        )
-        return ExecuteResponse(
-            status="error",
-            execution_id=execution_id,
-            result={"error": str(e)}
-        )
+        return await asyncio.to_thread(fail_execution, execution_id, workflow_name, graph_json, e)
+
+
+@app.post("/execute", response_model=ExecuteResponse)
+async def execute_workflow(req: ExecuteRequest):
+    routing_for(req.graph)  # 400 before an execution is created for a graph that cannot be routed
+    return await run_execution(str(uuid.uuid4()), req.workflow_name, req.graph, req.inputs, new=True)
 
 
 @app.post("/resume", response_model=ExecuteResponse)
-def resume_workflow(req: ResumeRequest):
+async def resume_workflow(req: ResumeRequest):
+    # Get workflow execution from DB; only one worker at a time may resume it
+    workflow_exec = await asyncio.to_thread(claim_resume, req.execution_id)
+    async with leases.kept(resume_lease(req.execution_id), RESUME_LEASE_S):
+        try:
+            state, graph_json, routing, resume_at = await asyncio.to_thread(begin_resume, req, workflow_exec)
+
+            # Continue execution from paused state
+            if resume_at == []:
+                result = state
+            else:
+                graph = graph_cache.get(graph_json)
+                result = await graph.ainvoke(state, config=execution_config(req.execution_id, resume_at=resume_at))
+
+            # Paused again at another form, or completed
+            return await asyncio.to_thread(finish_execution, req.execution_id, workflow_exec["workflow_name"],
+                                           result, graph_json, routing)
+        except Exception as e:
+            return await asyncio.to_thread(fail_execution, req.execution_id, workflow_exec["workflow_name"], {}, e)
+
+
+# -------------------------------------------------------------------
+# Asynchronous execution (job queue)
+# -------------------------------------------------------------------
+
+# Longest a result request may wait for an execution to finish
+RESULT_MAX_WAIT_S = 60.0
+
+# workflow_executions status -> ExecuteResponse status
+RESULT_STATUSES = {"completed": "success", "failed": "error"}
+
+
+async def run_queued_execution(job: Dict[str, Any]):
+    workflow_exec = get_workflow_execution(job["execution_id"])
+    if workflow_exec is None:
+        print(f"[Jobs] Execution {job['execution_id']} not found; dropping job")
+        return
+    # A first attempt starts from the inputs; a retry continues from what the earlier attempt checkpointed
+    await run_execution(job["execution_id"], workflow_exec["workflow_name"],
+                        load_execution_graph(workflow_exec), job["inputs"], new=job["attempts"] == 1)
+
+
+def give_up_execution(job: Dict[str, Any]):
+    workflow_exec = get_workflow_execution(job["execution_id"]) or {"workflow_name": "unknown", "graph_json": "{}"}
+    error = Exception(f"Abandoned after {job['attempts'] - 1} attempts whose worker stopped renewing its lease")
+    fail_execution(job["execution_id"], workflow_exec["workflow_name"], load_execution_graph(workflow_exec), error)
+
+
+job_workers = JobWorkerPool(job_queue, run_queued_execution, give_up_execution, workers=JOB_WORKERS,
+                            lease_s=JOB_LEASE_S, max_attempts=JOB_MAX_ATTEMPTS, poll_s=JOB_POLL_S)
+
+
+@app.post("/execute/async", response_model=ExecuteResponse, status_code=202)
+async def submit_workflow(req: ExecuteRequest, response: Response):
+    """
+    Queue an execution and return its id at once. A worker runs it; poll
+    /executions/{id}/result (optionally with ?wait=seconds) for the outcome.
+    """
     try:
-        # Get workflow execution from DB
-        workflow_exec = get_workflow_execution(req.execution_id)
+        routing = routing_cache.get(req.graph)
+        graph_cache.get(req.graph)  # reject graphs that do not compile now, not in the worker
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid graph: {e}")
+
+    execution_id = str(uuid.uuid4())
 
+    def enqueue():
+        graph_hash = graph_store.put(req.graph)
+        # The row, its first checkpoint and its job are written together, so a worker in any process finds all three
+        with db_pool.transaction() as conn:
+            checkpointer.write_initial(conn, execution_id, {"input": req.inputs}, routing.entry)
+            save_execution_rows([(execution_id, req.workflow_name, "queued", routing.entry, graph_hash, None)])
+            job_queue.enqueue(conn, execution_id, req.inputs)
+
+    await asyncio.to_thread(enqueue)
+    job_workers.notify()
+
+    response.headers["Location"] = f"/executions/{execution_id}/result"
+    return ExecuteResponse(status="queued", execution_id=execution_id, result={})
+
+
+@app.get("/executions/{execution_id}/result", response_model=ExecuteResponse)
+async def get_execution_result(execution_id: str, wait: float = 0):
+    """
+    Outcome of an execution in /execute's response format; status is "queued"
+    or "running" while it has not finished. With `wait`, long-polls up to that
+    many seconds (at most RESULT_MAX_WAIT_S) for it to finish or pause.
+    """
+    deadline = time.monotonic() + min(max(wait, 0.0), RESULT_MAX_WAIT_S)
+    while True:
+        workflow_exec = get_workflow_execution(execution_id)
         if not workflow_exec:
-            raise HTTPException(status_code=404, detail="Workflow execution not found")
-
-        if workflow_exec["status"] != "paused":
-            raise HTTPException(status_code=400, detail="Workflow is not paused")
-
-        # Parse stored state and graph
-        state = json.loads(workflow_exec["state_data"])
-        graph_json = json.loads(workflow_exec["graph_json"])
-
-        # Remove pause marker and add form data to state
-        if "_paused_at_form" in state:
-            paused_info = state.pop("_paused_at_form")
-            node_id = paused_info["node_id"]
-
-            # Save form response
-            save_form_response(req.execution_id, node_id, req.form_data)
-
-            # Update node execution as completed
-            save_node_execution(
-                req.execution_id, node_id, "form", node_id,
-                "completed", None, req.form_data, None, 0
-            )
-
-            # Add form data to state
-            state[node_id] = {"form_data": req.form_data}
-            # merge into input
-            if "input" not in state:
-                state["input"] = {}
-            if isinstance(req.form_data, dict):
-                state["input"].update(req.form_data)
-
-        # Update workflow status to running
-        save_workflow_execution(
-            req.execution_id, workflow_exec["workflow_name"], "running",
-            workflow_exec.get("current_node_id"), state, graph_json
-        )
+            raise HTTPException(status_code=404, detail="Execution not found")
+        status = workflow_exec["status"]
+        remaining = deadline - time.monotonic()
+        if status not in ("queued", "running") or remaining <= 0:
+            break
+        # Woken as soon as a local worker finishes it; re-checked every poll for other writers
+        await job_workers.wait_finished(execution_id, min(remaining, JOB_POLL_S))
+
+    if status in ("queued", "running"):
+        return ExecuteResponse(status=status, execution_id=execution_id, result={})
+    result = load_execution_state(workflow_exec)
+    return ExecuteResponse(
+        status=RESULT_STATUSES.get(status, status),
+        execution_id=execution_id,
+        result=result,
+        paused_at_form=result.get("_paused_at_form") if status == "paused" else None
+    )
 
-        # Continue execution from paused state
-        graph = build_graph_from_json(graph_json, req.execution_id)
-        result = graph.invoke(state)
-
-        # Check if paused again at another form
-        if "_paused_at_form" in result:
-            form_info = result["_paused_at_form"]
-            save_workflow_execution(
-                req.execution_id, workflow_exec["workflow_name"], "paused",
-                form_info["node_id"], result, graph_json
-            )
-            return ExecuteResponse(
-                status="paused",
-                execution_id=req.execution_id,
-                result=result,
-                paused_at_form=form_info
-            )
-
-        # Workflow completed
-        save_workflow_execution(
-            req.execution_id, workflow_exec["workflow_name"], "completed",
-            graph_json.get("nodes", [])[-1]["id"] if graph_json.get("nodes") else None, result, graph_json
-        )
 
-        return ExecuteResponse(
-            status="success",
-            execution_id=req.execution_id,
-            result=result
+# -------------------------------------------------------------------
+# Streaming execution (Server-Sent Events)
+# -------------------------------------------------------------------
+
+STREAM_MAX_PAYLOAD_BYTES = DEFAULT_MAX_PAYLOAD_BYTES
+
+# SSE event that ends the stream, per ExecuteResponse status
+STREAM_FINAL_EVENTS = {"success": "completed", "paused": "paused", "error": "error"}
+
+# Streamed runs outlive a disconnected client; keep them referenced until they finish
+streamed_runs: set = set()
+
+
+class ExecuteStreamRequest(ExecuteRequest):
+    max_payload_bytes: Optional[int] = None
+
+class ResumeStreamRequest(ResumeRequest):
+    max_payload_bytes: Optional[int] = None
+
+
+def open_event_stream(max_payload_bytes: Optional[int]) -> ExecutionEventStream:
+    if max_payload_bytes is None:
+        max_payload_bytes = STREAM_MAX_PAYLOAD_BYTES
+    if max_payload_bytes < 0:
+        raise HTTPException(status_code=400, detail="max_payload_bytes must not be negative")
+    return ExecutionEventStream(max_payload_bytes)
+
+
+def event_stream_response(events: ExecutionEventStream, run) -> StreamingResponse:
+    """Start `run` as its own task and stream `events` to the client."""
+    task = asyncio.ensure_future(run)
+    streamed_runs.add(task)
+    task.add_done_callback(streamed_runs.discard)
+    return StreamingResponse(events.messages(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+def end_event_stream(events: ExecutionEventStream, response: ExecuteResponse):
+    events.emit(STREAM_FINAL_EVENTS[response.status], response.model_dump(exclude_none=True))
+    events.close()
+
+
+async def stream_execution(events: ExecutionEventStream, req: ExecuteStreamRequest, execution_id: str):
+    try:
+        state = {"input": req.inputs}
+        routing = routing_cache.get(req.graph)
+        await asyncio.to_thread(
+            save_workflow_execution, execution_id, req.workflow_name, "running",
+            routing.entry, state, req.graph, new=True
         )
-    except HTTPException:
-        raise
+        events.emit("started", {"execution_id": execution_id, "workflow_name": req.workflow_name})
+
+        graph = graph_cache.get(req.graph)
+        result = await stream_run(graph, state, execution_config(execution_id), events.emit)
+        response = await asyncio.to_thread(finish_execution, execution_id, req.workflow_name, result, req.graph, routing)
     except Exception as e:
-        save_workflow_execution(
-            req.execution_id, workflow_exec["workflow_name"] if workflow_exec else "unknown",
-            "failed", "unknown", {"error": str(e)}, {}
-        )
-        return ExecuteResponse(
-            status="error",
-            execution_id=req.execution_id,
-            result={"error": str(e)}
-        )
+        response = await asyncio.to_thread(fail_execution, execution_id, req.workflow_name, req.graph, e)
+    end_event_stream(events, response)
+
+
+async def stream_resume(events: ExecutionEventStream, req: ResumeStreamRequest, workflow_exec: Dict[str, Any]):
+    async with leases.kept(resume_lease(req.execution_id), RESUME_LEASE_S):
+        try:
+            state, graph_json, routing, resume_at = await asyncio.to_thread(begin_resume, req, workflow_exec)
+            events.emit("started", {"execution_id": req.execution_id, "workflow_name": workflow_exec["workflow_name"],
+                                    "resume_at": resume_at})
+
+            if resume_at == []:
+                result = state
+            else:
+                graph = graph_cache.get(graph_json)
+                config = execution_config(req.execution_id, resume_at=resume_at)
+                result = await stream_run(graph, state, config, events.emit)
+            response = await asyncio.to_thread(finish_execution, req.execution_id, workflow_exec["workflow_name"],
+                                               result, graph_json, routing)
+        except Exception as e:
+            response = await asyncio.to_thread(fail_execution, req.execution_id, workflow_exec["workflow_name"], {}, e)
+    end_event_stream(events, response)
+
+
+@app.post("/execute/stream")
+async def execute_workflow_stream(req: ExecuteStreamRequest):
+    """
+    /execute as Server-Sent Events: `started`, then `node-started` /
+    `node-completed` / `node-failed` per node, and finally `completed`,
+    `paused` or `error` carrying the /execute response.
+    """
+    routing_for(req.graph)
+    events = open_event_stream(req.max_payload_bytes)
+    return event_stream_response(events, stream_execution(events, req, str(uuid.uuid4())))
+
+
+@app.post("/resume/stream")
+async def resume_workflow_stream(req: ResumeStreamRequest):
+    """
+    /resume as Server-Sent Events, like /execute/stream. Unknown or not-paused
+    executions get 404/400, executions being resumed elsewhere 409.
+    """
+    events = open_event_stream(req.max_payload_bytes)
+    workflow_exec = await asyncio.to_thread(claim_resume, req.execution_id)
+    return event_stream_response(events, stream_resume(events, req, workflow_exec))
+
+
+SCORE_BATCH_LINES_PER_WRITE = 1000
+# A JSON body is parsed whole; larger batches must be sent as NDJSON, which is scored as it arrives
+SCORE_BATCH_MAX_JSON_BYTES = 64 * 1024 * 1024
+
+
+async def read_body_capped(request: Request, limit: int) -> bytes:
+    """The whole request body, or 413 once it is larger than `limit` bytes."""
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > limit:
+        raise HTTPException(status_code=413, detail=f"Body larger than {limit} bytes; send it as NDJSON")
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            raise HTTPException(status_code=413, detail=f"Body larger than {limit} bytes; send it as NDJSON")
+    return bytes(body)
+
+
+@app.post("/decisions/score-batch")
+async def score_decision_batch(request: Request):
+    """
+    Run a decision node's rules over a batch of inputs without executing a workflow.
+
+    JSON body (up to SCORE_BATCH_MAX_JSON_BYTES, else 413): {"node": {...}, "columns": {"amount": [...], ...}}
+    or {"node": {...}, "rows": [{...}, ...]}.
+    NDJSON body (application/x-ndjson): a {"node": {...}} line, then one input per line; rows are
+    scored in chunks as their lines arrive, and a malformed line gets a {"row": n, "error": ...} line.
+    Streams one NDJSON result per input, then a {"summary": ...} line. Nothing is persisted.
+    """
+    body_read = asyncio.Event()
+    try:
+        if "ndjson" in request.headers.get("content-type", ""):
+            lines = ndjson_lines(request_chunks(request, body_read))
+            header_line = await anext(lines, None)
+            header = json.loads(header_line) if header_line is not None else None
+            payload = dict(header, rows=lines) if isinstance(header, dict) else {}
+        else:
+            payload = json.loads(await read_body_capped(request, SCORE_BATCH_MAX_JSON_BYTES) or b"{}")
+            body_read.set()
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch body: {e}")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Batch body must be a JSON object")
+
+    node, columns, rows = payload.get("node"), payload.get("columns"), payload.get("rows")
+    data = node.get("data", node) if isinstance(node, dict) else None
+    if not isinstance(data, dict) or not isinstance(data.get("rules"), list):
+        raise HTTPException(status_code=400, detail="'node' must be a decision node with a list of rules")
+    if (columns is None) == (rows is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of 'columns' or 'rows'")
+    if columns is not None:
+        if not isinstance(columns, dict) or not all(isinstance(v, list) for v in columns.values()):
+            raise HTTPException(status_code=400, detail="'columns' must map field names to lists")
+        if len({len(v) for v in columns.values()}) > 1:
+            raise HTTPException(status_code=400, detail="All columns must have the same length")
+    elif not isinstance(rows, AsyncIterator) and (
+            not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows)):
+        raise HTTPException(status_code=400, detail="'rows' must be a list of input objects")
+    try:
+        scorer = BatchScorer(node)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def summary_line() -> str:
+        return json.dumps({"summary": dict(scorer.stats, hit_policy=scorer.table.hit_policy)})
+
+    def scored_in_memory():
+        results = scorer.score_columns(columns) if columns is not None else scorer.score_rows(rows)
+        buffer = []
+        for result in results:
+            buffer.append(json.dumps(result, default=str))
+            if len(buffer) >= SCORE_BATCH_LINES_PER_WRITE:
+                yield "\n".join(buffer) + "\n"
+                buffer = []
+        buffer.append(summary_line())
+        yield "\n".join(buffer) + "\n"
+
+    def score_chunk(chunk: List[Dict[str, Any]], offset: int) -> List[str]:
+        return [json.dumps(result, default=str) for result in scorer.score_rows(chunk, offset)]
+
+    async def scored_as_received():
+        chunk: List[Dict[str, Any]] = []
+        buffer: List[str] = []
+        offset = invalid = 0
+        async for raw in rows:
+            try:
+                row = json.loads(raw)
+            except (ValueError, UnicodeDecodeError) as e:
+                row = e
+            if isinstance(row, dict):
+                chunk.append(row)
+            else:
+                invalid += 1
+                detail = f"Invalid input line: {row}" if isinstance(row, Exception) else "Input must be a JSON object"
+            if chunk and (len(chunk) >= scorer.chunk_size or not isinstance(row, dict)):
+                # Vectorized scoring is CPU-bound; keep it off the event loop
+                buffer.extend(await asyncio.to_thread(score_chunk, chunk, offset))
+                offset += len(chunk)
+                chunk = []
+            if not isinstance(row, dict):
+                buffer.append(json.dumps({"row": offset, "error": detail}))
+                offset += 1
+            if len(buffer) >= SCORE_BATCH_LINES_PER_WRITE:
+                yield "\n".join(buffer) + "\n"
+                buffer = []
+        buffer.extend(await asyncio.to_thread(score_chunk, chunk, offset))
+        scorer.stats["invalid_rows"] = invalid
+        buffer.append(summary_line())
+        yield "\n".join(buffer) + "\n"
+
+    async def stream():
+        if not isinstance(rows, AsyncIterator):
+            async for text in iterate_in_threadpool(scored_in_memory()):
+                yield text
+            return
+        try:
+            async for text in scored_as_received():
+                yield text
+        except ClientDisconnect:
+            return  # the client stopped sending rows; nobody reads the rest
+
+    return BatchStreamingResponse(stream(), body_read, media_type="application/x-ndjson")
+
+
+# /execute/batch: inputs run concurrently per request; execution rows are upserted in groups
+EXECUTE_BATCH_CONCURRENCY = 32
+EXECUTE_BATCH_MAX_CONCURRENCY = 256
+EXECUTE_BATCH_FLUSH_ROWS = 500
+
+
+def resolve_batch_graph(header: Dict[str, Any]) -> Dict[str, Any]:
+    """The graph a batch runs: inline `graph`, a stored `graph_hash`, or the latest graph run as `workflow_name`."""
+    if isinstance(header.get("graph"), dict):
+        return header["graph"]
+    digest = header.get("graph_hash")
+    if digest is None and header.get("workflow_name"):
+        row = get_db().execute("""
+            SELECT graph_hash FROM workflow_executions
+            WHERE workflow_name = ? AND graph_hash IS NOT NULL AND graph_hash != ''
+            ORDER BY created_at DESC, id DESC LIMIT 1
+        """, (header["workflow_name"],)).fetchone()
+        if row is None:
+            raise HTTPException(status_code=404, detail=f"No stored graph for workflow {header['workflow_name']!r}")
+        digest = row[0]
+    if digest is None:
+        raise HTTPException(status_code=400, detail="Provide 'graph', 'graph_hash' or 'workflow_name'")
+    graph = graph_store.get(digest)
+    if graph is None:
+        raise HTTPException(status_code=404, detail="Graph not found")
+    return graph
+
+
+async def request_chunks(request: Request, body_read: asyncio.Event) -> AsyncIterator[bytes]:
+    """The request body as it arrives; sets `body_read` as soon as the last chunk has been received."""
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            raise ClientDisconnect()
+        more_body = message.get("more_body", False)
+        if not more_body:
+            body_read.set()
+        yield message.get("body", b"")
+        if not more_body:
+            return
+
+
+async def ndjson_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Non-empty lines of an NDJSON byte stream, split as the chunks arrive."""
+    pending = b""
+    async for chunk in chunks:
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield line
+    if pending.strip():
+        yield pending
+
+
+class BatchStreamingResponse(StreamingResponse):
+    """
+    A StreamingResponse that starts while the request body is still being read.
+    StreamingResponse listens for the client disconnecting from the start, which
+    would consume the body; here it only listens once `body_read` is set (the
+    last chunk was received). Before that, a disconnect surfaces as
+    ClientDisconnect when the next chunk is read, so at most the inputs of the
+    chunk in hand still run.
+    """
+
+    def __init__(self, content, body_read: asyncio.Event, **kwargs):
+        super().__init__(content, **kwargs)
+        self.body_read = body_read
+
+    async def __call__(self, scope, receive, send):
+        streaming = asyncio.ensure_future(self.stream_response(send))
+        listening = asyncio.ensure_future(self._listen_after_body(receive))
+        try:
+            await asyncio.wait({streaming, listening}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            listening.cancel()
+            streaming.cancel()
+            await asyncio.gather(streaming, listening, return_exceptions=True)
+        if streaming.done() and not streaming.cancelled() and streaming.exception() is not None:
+            raise streaming.exception()
+
+    async def _listen_after_body(self, receive):
+        await self.body_read.wait()
+        await self.listen_for_disconnect(receive)
+
+
+@app.post("/execute/batch")
+async def execute_batch(request: Request):
+    """
+    Run one workflow over many inputs.
+
+    JSON body: {"graph": {...} | "graph_hash": "..." | "workflow_name": "...", "inputs": [{...}, ...],
+    "concurrency": 32}. NDJSON body (application/x-ndjson): the same header without `inputs` on the
+    first line, then one input object per line; inputs start running as their lines arrive. The graph
+    is compiled once; inputs run with bounded concurrency. Streams one NDJSON line per input as it
+    finishes (in completion order, with its `index`), then a {"summary": ...} line.
+    """
+    body_read = asyncio.Event()
+    try:
+        if "ndjson" in request.headers.get("content-type", ""):
+            lines = ndjson_lines(request_chunks(request, body_read))
+            header_line = await anext(lines, None)
+            header = json.loads(header_line) if header_line is not None else {}
+            raw_inputs = lines
+        else:
+            header = json.loads(await request.body() or b"{}")
+            raw_inputs = None
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch body: {e}")
+    if not isinstance(header, dict):
+        raise HTTPException(status_code=400, detail="Batch header must be a JSON object")
+    if raw_inputs is None:
+        if not isinstance(header.get("inputs"), list):
+            raise HTTPException(status_code=400, detail="'inputs' must be a list of input objects")
+        body_read.set()
+    try:
+        concurrency = int(header.get("concurrency", EXECUTE_BATCH_CONCURRENCY))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="'concurrency' must be an integer")
+    concurrency = max(1, min(concurrency, EXECUTE_BATCH_MAX_CONCURRENCY))
+
+    graph_json = resolve_batch_graph(header)
+    workflow_name = header.get("workflow_name") or "unnamed_workflow"
+    try:
+        routing = routing_cache.get(graph_json)
+        graph = graph_cache.get(graph_json)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid graph: {e}")
+    graph_hash = await asyncio.to_thread(graph_store.put, graph_json)
+
+    async def numbered_inputs():
+        if raw_inputs is None:
+            for index, inputs in enumerate(header["inputs"]):
+                yield index, inputs
+            return
+        index = 0
+        async for raw in raw_inputs:
+            try:
+                inputs = json.loads(raw)
+            except (ValueError, UnicodeDecodeError) as e:
+                inputs = e
+            yield index, inputs
+            index += 1
+
+    rows: List[tuple] = []
+    counts = {"success": 0, "paused": 0, "error": 0}
+    # One flush at a time: a worker whose row another flush took waits here until it is committed
+    flushing = asyncio.Lock()
+
+    async def flush_rows():
+        async with flushing:
+            if rows:
+                pending = rows[:]
+                rows.clear()
+                await asyncio.to_thread(save_execution_rows, pending)
+
+    async def run_one(index: int, inputs: Any) -> Dict[str, Any]:
+        if not isinstance(inputs, dict):
+            counts["error"] += 1
+            detail = str(inputs) if isinstance(inputs, Exception) else "Input must be a JSON object"
+            return {"index": index, "status": "error", "result": {"error": detail}}
+        execution_id = str(uuid.uuid4())
+        state = {"input": inputs}
+        checkpointer.checkpoint(execution_id, state, routing.entry, new=True)
+        try:
+            result = await graph.ainvoke(state, config=execution_config(execution_id))
+        except Exception as e:
+            result = {"error": str(e)}
+            status, current_node, line_status = "failed", "unknown", "error"
+        else:
+            paused = result.get("_paused_at_form")
+            if paused:
+                status, current_node, line_status = "paused", paused["node_id"], "paused"
+            else:
+                status, current_node, line_status = "completed", routing.exit_node, "success"
+        checkpointer.checkpoint(execution_id, result, current_node)
+        checkpointer.discard(execution_id)
+        rows.append((execution_id, workflow_name, status, current_node, graph_hash, None))
+        if status == "paused":
+            # Its line lets the client resume it at once, from any process: commit its checkpoints and row first
+            if not await asyncio.to_thread(journal.flush, PAUSE_FLUSH_TIMEOUT_S):
+                print(f"[Checkpoints] Checkpoints of {execution_id} not committed after {PAUSE_FLUSH_TIMEOUT_S:g}s")
+            await flush_rows()
+        elif len(rows) >= EXECUTE_BATCH_FLUSH_ROWS:
+            await flush_rows()
+        counts[line_status] += 1
+        line = {"index": index, "execution_id": execution_id, "status": line_status, "result": result}
+        if line_status == "paused":
+            line["paused_at_form"] = result["_paused_at_form"]
+        return line
+
+    async def stream():
+        started = datetime.now()
+        source = numbered_inputs()
+        taking = asyncio.Lock()
+        # Bounded, so a client reading slowly holds the workers back instead of piling up results
+        done = asyncio.Queue(maxsize=concurrency)
+
+        async def worker():
+            while True:
+                # The source is shared: each input is taken by exactly one worker
+                async with taking:
+                    item = await anext(source, None)
+                if item is None:
+                    return
+                await done.put(json.dumps(await run_one(*item), default=str))
+
+        async def run_workers():
+            try:
+                await asyncio.gather(*(worker() for _ in range(concurrency)))
+            finally:
+                await done.put(None)
+
+        runner = asyncio.ensure_future(run_workers())
+        try:
+            finished = False
+            while not finished:
+                buffer = [await done.get()]
+                while not done.empty():
+                    buffer.append(done.get_nowait())
+                if buffer[-1] is None:
+                    buffer.pop()
+                    finished = True
+                if buffer:
+                    yield "\n".join(buffer) + "\n"
+            try:
+                await runner  # re-raise a worker failure
+            except ClientDisconnect:
+                return  # the client stopped sending inputs; nobody reads the summary
+            await flush_rows()
+            summary = dict(counts, inputs=sum(counts.values()), graph_hash=graph_hash,
+                           duration_ms=int((datetime.now() - started).total_seconds() * 1000))
+            yield json.dumps({"summary": summary}) + "\n"
+        finally:
+            runner.cancel()
+            # Makes room for the runner's end marker if it is blocked on a full queue
+            while not done.empty():
+                done.get_nowait()
+            if rows:
+                # Closed or cancelled mid-batch, where awaiting a thread is not reliable: write them here
+                save_execution_rows(rows)
+
+    return BatchStreamingResponse(stream(), body_read, media_type="application/x-ndjson")
+
+
+@app.on_event("startup")
+def start_background_workers():
+    script_engine.start()
+    retention_job.start(RETENTION_INTERVAL_S)
+
+
+@app.on_event("startup")
+async def start_job_workers():
+    # Workers run on the server's event loop, so they are started from an async hook
+    job_workers.start()
+
+
+@app.on_event("shutdown")
+async def close_db_connections():
+    await job_workers.stop()
+    await http_client.aclose()
+    retention_job.stop()
+    script_engine.close()
+    metrics_aggregator.close()
+    journal.close()
+    db_pool.close_all()
 
 
 @app.get("/")
@@ -698,8 +1470,11 @@ def get_execution_details(execution_id: str):
 
     if not workflow_exec:
         raise HTTPException(status_code=404, detail="Execution not found")
+    if not workflow_exec["state_data"]:
+        workflow_exec["state_data"] = json.dumps(load_execution_state(workflow_exec))
 
-    # Get node executions
+    # Get node executions (flush pending write-behind records first)
+    journal.flush()
     conn = get_db()
     cur = conn.cursor()
     cur.execute("""
@@ -708,9 +1483,8 @@ def get_execution_details(execution_id: str):
         ORDER BY started_at ASC
     """, (execution_id,))
     node_rows = cur.fetchall()
-    conn.close()
 
-    node_executions = [dict(row) for row in node_rows]
+    node_executions = [decode_node_execution(row) for row in node_rows]
 
     return {
         "execution": workflow_exec,
@@ -721,6 +1495,7 @@ def get_execution_details(execution_id: str):
 @app.get("/executions/{execution_id}/nodes")
 def get_node_executions(execution_id: str):
     """Get all node executions for a workflow"""
+    journal.flush()
     conn = get_db()
     cur = conn.cursor()
     cur.execute("""
@@ -729,24 +1504,65 @@ def get_node_executions(execution_id: str):
         ORDER BY started_at ASC
     """, (execution_id,))
     rows = cur.fetchall()
-    conn.close()
 
-    return [dict(row) for row in rows]
+    return [decode_node_execution(row) for row in rows]
+
+
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(created_at: str, execution_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([created_at, execution_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, execution_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return created_at, execution_id
 
 
 @app.get("/executions")
-def list_executions(limit: int = 50):
-    """List recent workflow executions"""
+def list_executions(response: Response, limit: int = 50, cursor: Optional[str] = None,
+                    workflow_name: Optional[str] = None, status: Optional[str] = None,
+                    parent_execution_id: Optional[str] = None):
+    """
+    List workflow executions, newest first.
+    Keyset paginated: when more rows exist the response carries an X-Next-Cursor
+    header; pass it back as `cursor` to get the next page.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    filters = []
+    params: List[Any] = []
+    if workflow_name:
+        filters.append("workflow_name = ?")
+        params.append(workflow_name)
+    if status:
+        filters.append("status = ?")
+        params.append(status)
+    if parent_execution_id:
+        filters.append("parent_execution_id = ?")
+        params.append(parent_execution_id)
+    if cursor:
+        filters.append("(created_at, id) < (?, ?)")
+        params.extend(decode_cursor(cursor))
+    where = f"WHERE {' AND '.join(filters)}" if filters else ""
+
     conn = get_db()
     cur = conn.cursor()
-    cur.execute("""
+    cur.execute(f"""
         SELECT id, workflow_name, status, current_node_id, parent_execution_id, created_at, updated_at
         FROM workflow_executions
-        ORDER BY created_at DESC
+        {where}
+        ORDER BY created_at DESC, id DESC
         LIMIT ?
-    """, (limit,))
+    """, (*params, limit + 1))
     rows = cur.fetchall()
-    conn.close()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
 
     return [dict(row) for row in rows]
 
@@ -754,18 +1570,93 @@ def list_executions(limit: int = 50):
 @app.get("/metrics/service/{node_id}")
 def get_service_metrics(node_id: str):
     """Get aggregated metrics for a service node"""
+    snapshot = metrics_aggregator.snapshot(node_id)
+    if snapshot is not None:
+        return snapshot
+
+    # Not called since this process started: fall back to the persisted row
     conn = get_db()
     cur = conn.cursor()
     cur.execute("SELECT * FROM service_metrics WHERE node_id = ?", (node_id,))
     row = cur.fetchone()
-    conn.close()
     if not row:
         raise HTTPException(status_code=404, detail="Metrics not found")
     return dict(row)
 
+@app.get("/archive/executions/{execution_id}")
+def get_archived_execution(execution_id: str):
+    """Get an execution that retention moved out of the hot tables"""
+    record = retention_job.fetch(execution_id)
+    if not record:
+        raise HTTPException(status_code=404, detail="Archived execution not found")
+    return record
+
+
+@app.post("/admin/retention/run")
+def run_retention():
+    """Apply the retention policies now instead of waiting for the next scheduled run"""
+    return retention_job.run()
+
+
+@app.get("/metrics/storage")
+def get_storage_metrics():
+    """Compression statistics for payloads written by this process"""
+    return blob_codec.stats()
+
+
+@app.get("/metrics/scripts")
+def get_script_metrics():
+    """Decision-script workers: runs, errors, timeouts and worker restarts"""
+    return script_engine.stats()
+
+
+@app.get("/metrics/response-cache")
+def get_response_cache_metrics(node_id: Optional[str] = None):
+    """Response cache hits, stale hits, misses, evictions and hit ratio per service node"""
+    stats = response_caches.stats(node_id)
+    if node_id is not None and not stats:
+        raise HTTPException(status_code=404, detail="No response cache for this node")
+    return stats
+
+
+@app.get("/metrics/jobs")
+def get_job_metrics():
+    """Queue depth and lease state of asynchronous executions, this process's worker counters, and held leases."""
+    return {"queue": job_queue.stats(), "workers": job_workers.stats(), "leases": leases.stats()}
+
+
+@app.get("/metrics/coalescing")
+def get_coalescing_metrics():
+    """Service calls made vs. calls that shared an identical in-flight request"""
+    return service_calls.stats()
+
+
+@app.get("/metrics/http-pool")
+def get_http_pool_metrics():
+    """Per-host connection pool stats for service calls: reuse ratio, TLS handshakes, waits"""
+    return http_client.stats()
+
+
+@app.get("/metrics/graph-cache")
+def get_graph_cache_metrics():
+    """Compiled graph cache size, hit rate and compile times"""
+    return graph_cache.stats()
+
+
+@app.post("/graphs/analyze")
+def analyze_graph(req: AnalyzeGraphRequest):
+    """Entry and terminal nodes, topological order, cycles and reachability of a graph"""
+    return routing_for(req.graph).describe()
+
 # -------------------------------------------------------------------
 # Run server
 # -------------------------------------------------------------------
 
+# Server processes sharing workflow.db (WAL); more than one needs the app as an import string
+SERVER_WORKERS = int(os.environ.get("WORKFLOW_SERVER_WORKERS", "1"))
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    if SERVER_WORKERS > 1:
+        uvicorn.run("latest_gen:app", host="0.0.0.0", port=8000, workers=SERVER_WORKERS)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,102 @@
+"""
+Named leases shared by every process using the database.
+
+Several server processes can serve the same `workflow.db`. Work that must
+run in only one of them at a time (resuming a paused execution, a
+retention pass) takes a lease first:
+
+    if not leases.acquire(f"resume:{execution_id}", ttl_s):   # blocking; async callers use a thread
+        ...                                 # another worker holds it
+    async with leases.kept(name, ttl_s):    # renewed while the block runs, released after
+        ...
+
+`acquire` is a single upsert that only takes over a row whose lease has
+expired, so exactly one caller wins however many processes race for it. A
+lease whose holder died expires after `ttl_s` and can be taken again.
+Lease times are wall-clock (`time.time()`), like the job queue's.
+"""
+
+import asyncio
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from db_pool import ConnectionPool
+
+
+class LeaseTable:
+    def __init__(self, pool: ConnectionPool, owner: Optional[str] = None):
+        self.pool = pool
+        # Unique per start, so a restarted process never owns the leases of its previous life
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    @staticmethod
+    def create_table(conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS leases (
+                name TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+
+    def acquire(self, name: str, ttl_s: float) -> bool:
+        """Take `name` for `ttl_s` seconds if it is free or expired; False while someone else holds it."""
+        now = time.time()
+        with self.pool.transaction() as conn:
+            cur = conn.execute("""
+                INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+                WHERE leases.expires_at < ?
+            """, (name, self.owner, now + ttl_s, now))
+        return cur.rowcount == 1
+
+    def renew(self, name: str, ttl_s: float) -> bool:
+        """Extend a lease this owner holds; False once it has been lost."""
+        with self.pool.transaction() as conn:
+            cur = conn.execute(
+                "UPDATE leases SET expires_at = ? WHERE name = ? AND owner = ?",
+                (time.time() + ttl_s, name, self.owner),
+            )
+        return cur.rowcount == 1
+
+    def release(self, name: str):
+        with self.pool.transaction() as conn:
+            conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, self.owner))
+
+    @asynccontextmanager
+    async def kept(self, name: str, ttl_s: float) -> AsyncIterator[None]:
+        """Hold an acquired lease for the block: renewed every `ttl_s / 3`, released on exit."""
+        renewal = asyncio.ensure_future(self._keep(name, ttl_s))
+        try:
+            yield
+        finally:
+            renewal.cancel()
+            try:
+                # Off the event loop: BEGIN IMMEDIATE may wait out another process's write
+                await asyncio.to_thread(self.release, name)
+            except sqlite3.Error as e:
+                # It expires on its own
+                print(f"[Leases] Error releasing {name}: {e}")
+
+    async def _keep(self, name: str, ttl_s: float):
+        while True:
+            await asyncio.sleep(ttl_s / 3)
+            try:
+                if not await asyncio.to_thread(self.renew, name, ttl_s):
+                    print(f"[Leases] Lost lease {name}")
+                    return
+            except sqlite3.Error as e:
+                print(f"[Leases] Error renewing {name}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        row = self.pool.connection().execute("""
+            SELECT SUM(expires_at >= ?) AS held, SUM(expires_at >= ? AND owner = ?) AS held_here
+            FROM leases
+        """, (now, now, self.owner)).fetchone()
+        return {"owner": self.owner, "held": row["held"] or 0, "held_here": row["held_here"] or 0}
@@ -0,0 +1,106 @@
+"""
+Versioned schema migrations for workflow.db.
+
+`CREATE TABLE IF NOT EXISTS` in each executor's init_db only covers fresh
+databases. Anything that changes an existing schema (new columns, indexes) is
+a numbered migration here. Applied versions are recorded in
+`schema_migrations`, so each step runs exactly once per database file no
+matter which executor opens it first.
+
+To add a migration, append a `(version, name, fn)` entry with the next
+version number; never edit or reorder released entries.
+"""
+
+import sqlite3
+from typing import Callable, List, Tuple
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _add_column_if_missing(conn: sqlite3.Connection, table: str, column: str, decl: str):
+    columns = _columns(conn, table)
+    # Tables owned by one executor may not exist yet; their CREATE TABLE already has the column
+    if columns and column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def _execution_columns(conn: sqlite3.Connection):
+    # Databases created by older executors lack these columns
+    _add_column_if_missing(conn, "workflow_executions", "graph_hash", "TEXT")
+    _add_column_if_missing(conn, "workflow_executions", "parent_execution_id", "TEXT")
+
+
+def _history_indexes(conn: sqlite3.Connection):
+    # /executions: newest first, optionally filtered; id breaks created_at ties for keyset paging
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_workflow_executions_created
+        ON workflow_executions (created_at, id)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_workflow_executions_name_created
+        ON workflow_executions (workflow_name, created_at, id)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_workflow_executions_status_created
+        ON workflow_executions (status, created_at, id)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_workflow_executions_parent_created
+        ON workflow_executions (parent_execution_id, created_at, id)
+    """)
+    # /executions/{id} and /executions/{id}/nodes
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_node_executions_execution_started
+        ON node_executions (workflow_execution_id, started_at)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_form_responses_execution
+        ON form_responses (workflow_execution_id)
+    """)
+
+
+def _service_metric_percentiles(conn: sqlite3.Connection):
+    for column, decl in (("p50_ms", "REAL"), ("p95_ms", "REAL"), ("p99_ms", "REAL"), ("max_ms", "INTEGER")):
+        _add_column_if_missing(conn, "service_metrics", column, decl)
+
+
+def _blob_codecs(conn: sqlite3.Connection):
+    _add_column_if_missing(conn, "node_executions", "request_codec", "TEXT")
+    _add_column_if_missing(conn, "node_executions", "response_codec", "TEXT")
+    _add_column_if_missing(conn, "state_checkpoints", "codec", "TEXT")
+
+
+def _node_branches(conn: sqlite3.Connection):
+    _add_column_if_missing(conn, "node_executions", "branch_id", "TEXT")
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "execution columns", _execution_columns),
+    (2, "execution history indexes", _history_indexes),
+    (3, "service metric percentiles", _service_metric_percentiles),
+    (4, "blob codec columns", _blob_codecs),
+    (5, "node execution branch ids", _node_branches),
+]
+
+
+def apply_migrations(conn: sqlite3.Connection):
+    """Apply every migration newer than the database's recorded version.
+
+    Must be called inside a write transaction so concurrent processes
+    starting at the same time do not run a step twice.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    current = conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations").fetchone()[0]
+    for version, name, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        migrate(conn)
+        conn.execute("INSERT INTO schema_migrations (version, name) VALUES (?, ?)", (version, name))
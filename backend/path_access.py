@@ -0,0 +1,111 @@
+"""
+Compiled accessors for dot + bracket paths into workflow state.
+
+`input.company.items[3].name` is parsed once into a tuple of steps
+(`("input", "company", "items", 3, "name")`: str for dict keys, int for list
+indexes) and the parse is kept in a bounded LRU, so repeated lookups of the
+same path cost one dict walk instead of two regex passes.
+
+    deep_get(state, "input.items[0].sku")       # None if any step is missing
+    deep_set(payload, "customer.address.city", "Oslo")
+
+Callers that resolve the same path on every call can hold on to
+`compile_path(path)` and use `get_path` / `set_path` directly.
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Tuple, Union
+
+PATH_CACHE_SIZE = 4096
+
+_PATH_SPLIT = re.compile(r"\.(?![^\[]*\])")
+_PATH_STEP = re.compile(r"([^\[\]]+)|\[(\d+)\]")
+
+Step = Union[str, int]
+
+
+@lru_cache(maxsize=PATH_CACHE_SIZE)
+def compile_path(path: str) -> Tuple[Step, ...]:
+    """`a.b[2].c` -> ("a", "b", 2, "c")."""
+    steps = []
+    for part in _PATH_SPLIT.split(path):
+        for key, index in _PATH_STEP.findall(part):
+            steps.append(key if key else int(index))
+    return tuple(steps)
+
+
+def get_path(data: Any, steps: Tuple[Step, ...]) -> Any:
+    for step in steps:
+        if type(step) is int:
+            if not isinstance(data, list):
+                return None
+            try:
+                data = data[step]
+            except IndexError:
+                return None
+        else:
+            if not isinstance(data, dict):
+                return None
+            data = data.get(step)
+        if data is None:
+            return None
+    return data
+
+
+def set_path(data: Any, steps: Tuple[Step, ...], value: Any):
+    """
+    Assign `value` at `steps`, creating intermediate containers as needed: a
+    dict before a key step, a list (padded with None) before an index step.
+    Intermediates of the wrong type are replaced.
+    """
+    if not steps:
+        raise ValueError("Empty path")
+    if not isinstance(data, list if type(steps[0]) is int else dict):
+        raise TypeError(f"Cannot set {steps[0]!r} on {type(data).__name__}")
+    target = data
+    for step, wanted in _intermediates(steps):
+        if type(step) is int:
+            child = target[step] if step < len(target) else None
+            if not isinstance(child, wanted):
+                child = wanted()
+                _assign_index(target, step, child)
+        else:
+            child = target.get(step)
+            if not isinstance(child, wanted):
+                child = target[step] = wanted()
+        target = child
+    step = steps[-1]
+    if type(step) is int:
+        _assign_index(target, step, value)
+    else:
+        target[step] = value
+
+
+def deep_get(data: Any, path: str) -> Any:
+    """Get deeply nested dict/list value using dot + bracket notation."""
+    if not path:
+        return data
+    return get_path(data, compile_path(path))
+
+
+def deep_set(data: Any, path: str, value: Any):
+    """Set a deeply nested value using dot + bracket notation (see set_path)."""
+    set_path(data, compile_path(path), value)
+
+
+def path_cache_info():
+    return compile_path.cache_info()._asdict()
+
+
+@lru_cache(maxsize=PATH_CACHE_SIZE)
+def _intermediates(steps: Tuple[Step, ...]) -> Tuple[Tuple[Step, type], ...]:
+    """(step, container type the step must hold) for every step but the last."""
+    return tuple((step, list if type(following) is int else dict)
+                 for step, following in zip(steps, steps[1:]))
+
+
+def _assign_index(container: list, index: int, value: Any):
+    if index >= len(container):
+        container.extend([None] * (index + 1 - len(container)))
+    container[index] = value
@@ -0,0 +1,185 @@
+"""
+Opt-in response cache for idempotent service node calls.
+
+A service node with a `cache` block reuses responses of identical calls
+instead of calling the service again:
+
+    "data": {"url": "...", "request": {...},
+             "cache": {"ttl": 300, "max_entries": 1000, "max_bytes": 8388608,
+                       "stale_while_revalidate": 60, "key_fields": ["sku", "currency"]}}
+
+The key is method + URL + a hash of the canonical JSON of the rendered
+payload, or of just the `key_fields` paths of the payload when given. Only
+successful responses are stored. Each node's cache is an LRU bounded by
+`max_entries` and by `max_bytes` of stored JSON. Entries are served fresh
+for `ttl` seconds. For another `stale_while_revalidate` seconds they are
+still served, and the first stale hit refreshes the entry in the background.
+Responses are kept as JSON text, so a hit never aliases workflow state.
+
+Caches live in a process-wide `ResponseCacheRegistry`, one per node id and
+cache config, so they survive recompiles of the same graph.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from path_access import deep_get
+from single_flight import request_key
+
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+
+FRESH = "fresh"
+STALE = "stale"
+
+_COUNTERS = ("hits", "stale_hits", "misses", "stores", "evictions", "expirations",
+             "revalidations", "revalidation_failures")
+
+
+class ResponseCache:
+    def __init__(self, ttl_s: float, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES,
+                 stale_s: float = 0.0, key_fields: Optional[List[str]] = None):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stale_s = stale_s
+        self.key_fields = key_fields
+        self._lock = threading.Lock()
+        # key -> (response JSON text, stored_at)
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._bytes = 0
+        self._refreshing: set = set()
+        self._tasks: set = set()
+        self.counters = dict.fromkeys(_COUNTERS, 0)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ResponseCache":
+        """Build from a node's `data.cache` block; raises ValueError on invalid settings."""
+        if not isinstance(config, dict):
+            raise ValueError("cache must be an object")
+        try:
+            ttl = float(config["ttl"])
+            max_entries = int(config.get("max_entries", DEFAULT_MAX_ENTRIES))
+            max_bytes = int(config.get("max_bytes", DEFAULT_MAX_BYTES))
+            stale = float(config.get("stale_while_revalidate", 0))
+        except KeyError:
+            raise ValueError("cache.ttl is required")
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid cache settings: {e}")
+        key_fields = config.get("key_fields")
+        if ttl <= 0 or max_entries <= 0 or max_bytes <= 0 or stale < 0:
+            raise ValueError("cache ttl, max_entries and max_bytes must be positive")
+        if key_fields is not None and not (isinstance(key_fields, list)
+                                           and all(isinstance(f, str) for f in key_fields)):
+            raise ValueError("cache.key_fields must be a list of payload paths")
+        return cls(ttl, max_entries, max_bytes, stale, key_fields)
+
+    def key(self, method: str, url: str, payload: Any) -> str:
+        if self.key_fields is not None:
+            payload = [deep_get(payload, field) for field in self.key_fields]
+        return request_key(method, url, payload)
+
+    def lookup(self, key: str) -> Tuple[Any, Optional[str]]:
+        """(response, FRESH or STALE) for a cached key, (None, None) on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                text, stored_at = entry
+                age = now - stored_at
+                if age < self.ttl_s + self.stale_s:
+                    self._entries.move_to_end(key)
+                    freshness = FRESH if age < self.ttl_s else STALE
+                    self.counters["hits" if freshness == FRESH else "stale_hits"] += 1
+                    return json.loads(text), freshness
+                self._remove(key)
+                self.counters["expirations"] += 1
+            self.counters["misses"] += 1
+            return None, None
+
+    def store(self, key: str, response: Any):
+        text = json.dumps(response)
+        if len(text) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (text, time.monotonic())
+            self._bytes += len(text)
+            self.counters["stores"] += 1
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.counters["evictions"] += 1
+
+    def revalidate(self, key: str, refresh: Callable[[], Awaitable[Optional[Any]]]) -> bool:
+        """
+        Refresh a stale entry in the background, once per key at a time.
+        `refresh` returns the new response, or None when the call failed.
+        """
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+        task = asyncio.get_running_loop().create_task(self._revalidate(key, refresh))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _revalidate(self, key: str, refresh: Callable[[], Awaitable[Optional[Any]]]):
+        try:
+            response = await refresh()
+            if response is None:
+                self.counters["revalidation_failures"] += 1
+            else:
+                self.store(key, response)
+                self.counters["revalidations"] += 1
+        except Exception as e:
+            self.counters["revalidation_failures"] += 1
+            print(f"[ResponseCache] Revalidation error: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _remove(self, key: str):
+        text, _ = self._entries.pop(key)
+        self._bytes -= len(text)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.counters, entries=len(self._entries), bytes=self._bytes)
+
+
+class ResponseCacheRegistry:
+    """One ResponseCache per (node id, cache config), shared by every compile of the node."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._caches: Dict[Tuple[str, str], ResponseCache] = {}
+
+    def for_node(self, node_id: str, config: Dict[str, Any]) -> ResponseCache:
+        key = (node_id, json.dumps(config, sort_keys=True))
+        with self._lock:
+            cache = self._caches.get(key)
+        if cache is None:
+            cache = ResponseCache.from_config(config)
+            with self._lock:
+                cache = self._caches.setdefault(key, cache)
+        return cache
+
+    def stats(self, node_id: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Counters per node id (summed over its cache configs), with the hit ratio."""
+        with self._lock:
+            caches = [(n, c) for (n, _), c in self._caches.items() if node_id is None or n == node_id]
+        nodes: Dict[str, Dict[str, Any]] = {}
+        for n, cache in caches:
+            totals = nodes.setdefault(n, dict.fromkeys(_COUNTERS + ("entries", "bytes"), 0))
+            for name, value in cache.stats().items():
+                totals[name] += value
+        for totals in nodes.values():
+            lookups = totals["hits"] + totals["stale_hits"] + totals["misses"]
+            totals["hit_ratio"] = round((totals["hits"] + totals["stale_hits"]) / lookups, 4) if lookups else None
+        return nodes
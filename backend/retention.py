@@ -0,0 +1,317 @@
+"""
+Retention, archival and compaction of execution history.
+
+Finished executions that fall outside their workflow's retention policy are
+moved out of the hot tables (`workflow_executions`, `node_executions`,
+`form_responses`, `state_checkpoints`) into gzip archive files, one per day
+of execution start (`archive/executions-YYYY-MM-DD.jsonl.gz`). Each run
+appends one gzip member per batch; `archived_executions` records the file and
+member offset of every archived execution so it can still be fetched by id
+without scanning the archive.
+
+Deletes happen in bounded batches so the write lock is never held for long.
+After a run, freed pages are returned with `PRAGMA incremental_vacuum` and
+the WAL is truncated.
+
+Policies are keyed by workflow_name; "*" applies to every workflow without
+its own entry:
+
+    RetentionJob(pool, ..., policies={
+        "*": RetentionPolicy(max_age_days=30),
+        "nightly_reprocess": RetentionPolicy(max_age_days=3, max_count=10000),
+    })
+
+When several processes share the database, pass them a common LeaseTable:
+a run then holds the "retention" lease, and runs started in other processes
+meanwhile are skipped instead of archiving the same executions twice.
+"""
+
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from blob_codec import BlobCodec
+from db_pool import ConnectionPool
+from graph_store import GraphStore
+from leases import LeaseTable
+from state_checkpoints import StateCheckpointer
+from write_behind import WriteBehindJournal
+
+DEFAULT_ARCHIVE_DIR = "archive"
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_INTERVAL_S = 3600
+DEFAULT_VACUUM_PAGES = 2000
+# Renewed after every batch, so it only has to outlast one batch and the compaction
+DEFAULT_LEASE_S = 600.0
+LEASE_NAME = "retention"
+
+
+@dataclass
+class RetentionPolicy:
+    """Which finished executions of a workflow to keep in the hot tables.
+
+    An execution is archived when it is older than `max_age_days` or is not
+    among the newest `max_count` executions of its workflow. Only executions
+    whose status is in `statuses` are ever touched.
+    """
+    max_age_days: Optional[float] = None
+    max_count: Optional[int] = None
+    statuses: Tuple[str, ...] = ("completed", "failed")
+
+
+class RetentionJob:
+    def __init__(self, pool: ConnectionPool, journal: WriteBehindJournal, graph_store: GraphStore,
+                 checkpointer: StateCheckpointer, codec: BlobCodec, policies: Dict[str, RetentionPolicy],
+                 archive_dir: str = DEFAULT_ARCHIVE_DIR, batch_size: int = DEFAULT_BATCH_SIZE,
+                 vacuum_pages: int = DEFAULT_VACUUM_PAGES, leases: Optional[LeaseTable] = None,
+                 lease_s: float = DEFAULT_LEASE_S):
+        self.pool = pool
+        self.journal = journal
+        self.graph_store = graph_store
+        self.checkpointer = checkpointer
+        self.codec = codec
+        self.policies = policies
+        self.archive_dir = archive_dir
+        self.batch_size = batch_size
+        self.vacuum_pages = vacuum_pages
+        self.leases = leases
+        self.lease_s = lease_s
+        self._run_lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def create_table(conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS archived_executions (
+                id TEXT PRIMARY KEY,
+                workflow_name TEXT NOT NULL,
+                status TEXT NOT NULL,
+                created_at TIMESTAMP,
+                archive_file TEXT NOT NULL,
+                member_offset INTEGER NOT NULL,
+                archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+    # ------------------------------------------------------------------
+    # Running
+    # ------------------------------------------------------------------
+
+    def run(self) -> Dict[str, Any]:
+        """Archive everything outside its policy, then compact. Returns a summary."""
+        with self._run_lock:
+            if self.leases is not None and not self.leases.acquire(LEASE_NAME, self.lease_s):
+                return {"archived": 0, "by_workflow": {}, "skipped": "running in another process"}
+            try:
+                return self._run()
+            finally:
+                if self.leases is not None:
+                    self.leases.release(LEASE_NAME)
+
+    def _run(self) -> Dict[str, Any]:
+        started = datetime.now()
+        self.journal.flush()
+        archived = 0
+        per_workflow: Dict[str, int] = {}
+        for workflow_name, policy in self._resolved_policies():
+            while True:
+                ids = self._candidates(workflow_name, policy)
+                if not ids:
+                    break
+                archived += self._archive_batch(ids)
+                per_workflow[workflow_name] = per_workflow.get(workflow_name, 0) + len(ids)
+                if self.leases is not None and not self.leases.renew(LEASE_NAME, self.lease_s):
+                    # Another process took over; leave the rest to it
+                    print("[Retention] Lost the retention lease, stopping this run")
+                    return {"archived": archived, "by_workflow": per_workflow, "skipped": "lease lost"}
+                if len(ids) < self.batch_size:
+                    break
+        self._compact()
+        return {
+            "archived": archived,
+            "by_workflow": per_workflow,
+            "duration_ms": int((datetime.now() - started).total_seconds() * 1000),
+        }
+
+    def start(self, interval_s: float = DEFAULT_INTERVAL_S):
+        """Run the job periodically in a background thread."""
+        if self._thread is not None:
+            return
+
+        def loop():
+            while not self._stop.wait(interval_s):
+                try:
+                    self.run()
+                except Exception as e:
+                    print(f"[Retention] Run failed: {e}")
+
+        self._thread = threading.Thread(target=loop, name="retention-job", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    # ------------------------------------------------------------------
+    # Fetching archived executions
+    # ------------------------------------------------------------------
+
+    def fetch(self, execution_id: str) -> Optional[Dict[str, Any]]:
+        """Return an archived execution (row, state, node executions, form responses)."""
+        row = self.pool.connection().execute(
+            "SELECT archive_file, member_offset FROM archived_executions WHERE id = ?", (execution_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        for record in self._read_member(row["archive_file"], row["member_offset"]):
+            if record["execution"]["id"] == execution_id:
+                return record
+        return None
+
+    def _read_member(self, archive_file: str, offset: int) -> List[Dict[str, Any]]:
+        path = os.path.join(self.archive_dir, archive_file)
+        decompressor = zlib.decompressobj(wbits=31)  # a single gzip member
+        chunks = []
+        with open(path, "rb") as f:
+            f.seek(offset)
+            while not decompressor.eof:
+                data = f.read(65536)
+                if not data:
+                    break
+                chunks.append(decompressor.decompress(data))
+        return [json.loads(line) for line in b"".join(chunks).decode("utf-8").splitlines() if line]
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _resolved_policies(self) -> List[Tuple[str, RetentionPolicy]]:
+        """One (workflow_name, policy) pair per workflow present in the hot table."""
+        default = self.policies.get("*")
+        names = [r[0] for r in self.pool.connection().execute(
+            "SELECT DISTINCT workflow_name FROM workflow_executions")]
+        resolved = []
+        for name in names:
+            policy = self.policies.get(name, default)
+            if policy is not None:
+                resolved.append((name, policy))
+        return resolved
+
+    def _candidates(self, workflow_name: str, policy: RetentionPolicy) -> List[str]:
+        conn = self.pool.connection()
+        conditions = []
+        params: List[Any] = []
+        if policy.max_age_days is not None:
+            # created_at is written by CURRENT_TIMESTAMP, i.e. UTC "YYYY-MM-DD HH:MM:SS"
+            cutoff = (datetime.utcnow() - timedelta(days=policy.max_age_days)).strftime("%Y-%m-%d %H:%M:%S")
+            conditions.append("created_at < ?")
+            params.append(cutoff)
+        if policy.max_count is not None and policy.max_count <= 0:
+            conditions.append("1 = 1")
+        elif policy.max_count is not None:
+            # Oldest execution that is still within the newest max_count of this workflow
+            boundary = conn.execute("""
+                SELECT created_at, id FROM workflow_executions
+                WHERE workflow_name = ?
+                ORDER BY created_at DESC, id DESC
+                LIMIT 1 OFFSET ?
+            """, (workflow_name, policy.max_count - 1)).fetchone()
+            if boundary is not None:
+                conditions.append("(created_at, id) < (?, ?)")
+                params.extend((boundary["created_at"], boundary["id"]))
+        if not conditions:
+            return []
+
+        rows = conn.execute(f"""
+            SELECT id FROM workflow_executions
+            WHERE workflow_name = ?
+              AND status IN ({','.join('?' * len(policy.statuses))})
+              AND ({' OR '.join(conditions)})
+            ORDER BY created_at ASC, id ASC
+            LIMIT ?
+        """, (workflow_name, *policy.statuses, *params, self.batch_size)).fetchall()
+        return [row["id"] for row in rows]
+
+    def _archive_batch(self, ids: List[str]) -> int:
+        conn = self.pool.connection()
+        placeholders = ",".join("?" * len(ids))
+        executions = [dict(r) for r in conn.execute(
+            f"SELECT * FROM workflow_executions WHERE id IN ({placeholders})", ids)]
+        nodes: Dict[str, List[Dict[str, Any]]] = {}
+        for r in conn.execute(f"""
+            SELECT * FROM node_executions WHERE workflow_execution_id IN ({placeholders})
+            ORDER BY started_at ASC
+        """, ids):
+            node = dict(r)
+            node["request_data"] = self.codec.decode(node["request_data"], node.pop("request_codec", None))
+            node["response_data"] = self.codec.decode(node["response_data"], node.pop("response_codec", None))
+            nodes.setdefault(node["workflow_execution_id"], []).append(node)
+        forms: Dict[str, List[Dict[str, Any]]] = {}
+        for r in conn.execute(
+                f"SELECT * FROM form_responses WHERE workflow_execution_id IN ({placeholders})", ids):
+            forms.setdefault(r["workflow_execution_id"], []).append(dict(r))
+
+        # Group by the day the execution started: one archive file per day
+        by_file: Dict[str, List[Dict[str, Any]]] = {}
+        for execution in executions:
+            if execution["state_data"]:
+                state = json.loads(execution["state_data"])
+            else:
+                state = self.checkpointer.load(execution["id"])
+                self.checkpointer.discard(execution["id"])
+            if execution.get("graph_hash"):
+                execution["graph_json"] = self.graph_store.get_json(execution["graph_hash"])
+            execution["state_data"] = json.dumps(state)
+            day = (execution["created_at"] or datetime.utcnow().isoformat())[:10]
+            by_file.setdefault(f"executions-{day}.jsonl.gz", []).append({
+                "execution": execution,
+                "node_executions": nodes.get(execution["id"], []),
+                "form_responses": forms.get(execution["id"], []),
+            })
+
+        index_rows = []
+        for archive_file, records in by_file.items():
+            offset = self._append(archive_file, records)
+            for record in records:
+                e = record["execution"]
+                index_rows.append((e["id"], e["workflow_name"], e["status"], e["created_at"], archive_file, offset))
+
+        # The archive is on disk before the hot rows go away
+        with self.pool.transaction() as conn:
+            conn.executemany("""
+                INSERT OR REPLACE INTO archived_executions
+                (id, workflow_name, status, created_at, archive_file, member_offset)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, index_rows)
+            conn.execute(f"DELETE FROM node_executions WHERE workflow_execution_id IN ({placeholders})", ids)
+            conn.execute(f"DELETE FROM form_responses WHERE workflow_execution_id IN ({placeholders})", ids)
+            conn.execute(f"DELETE FROM state_checkpoints WHERE execution_id IN ({placeholders})", ids)
+            conn.execute(f"DELETE FROM workflow_executions WHERE id IN ({placeholders})", ids)
+        return len(executions)
+
+    def _append(self, archive_file: str, records: List[Dict[str, Any]]) -> int:
+        """Append records as one new gzip member; returns the member's byte offset."""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        payload = "".join(json.dumps(r, default=str) + "\n" for r in records).encode("utf-8")
+        member = gzip.compress(payload)
+        with self._file_lock:
+            with open(os.path.join(self.archive_dir, archive_file), "ab") as f:
+                offset = f.tell()
+                f.write(member)
+                f.flush()
+                os.fsync(f.fileno())
+        return offset
+
+    def _compact(self):
+        conn = self.pool.connection()
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            # incremental_vacuum frees one page per step, so drain the cursor
+            conn.execute(f"PRAGMA incremental_vacuum({int(self.vacuum_pages)})").fetchall()
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
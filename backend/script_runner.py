@@ -0,0 +1,317 @@
+"""
+Process-isolated execution of decision-node scripts.
+
+Scripts used to run through `exec(script, {}, {"state": state})` inline in the
+request thread, recompiled on every run and with no limit on how long they
+could take. They now run in a small pool of pre-started worker processes:
+
+- each script is compiled once in the API process (syntax errors surface when
+  the graph is compiled) and identified by the SHA-256 of its source; workers
+  keep their own code-object cache by hash and are sent the source only the
+  first time they see it;
+- state goes over the worker's pipe as length-prefixed compact JSON, the same
+  representation checkpoints already require;
+- every call has a wall-clock timeout, a CPU-time limit (RLIMIT_CPU) and the
+  worker runs under an address-space cap (RLIMIT_AS). A worker that times out
+  or hits a limit is killed and replaced, and the call raises
+  `ScriptLimitExceeded`.
+
+This is NOT a security boundary. Scripts still run with full builtins, as
+they did inline: they can import modules, read and write files and open
+connections with the server's permissions. The worker processes only keep
+a runaway script from blocking or exhausting the API process; graphs must
+still come from trusted authors.
+
+Exceptions raised by the script itself come back as `ScriptError`, whose
+`state` holds the state as the script left it, so changes made before the
+error are kept as they were with inline `exec`.
+
+    engine = ScriptEngine(workers=2, timeout_s=2.0)
+    script = engine.compile(source)          # SyntaxError -> ScriptError
+    new_state = engine.run(script, state)
+"""
+
+import hashlib
+import json
+import os
+import queue
+import select
+import struct
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+try:
+    import resource
+except ImportError:  # not available on Windows; limits are skipped there
+    resource = None
+
+DEFAULT_WORKERS = 2
+DEFAULT_TIMEOUT_S = 2.0
+DEFAULT_CPU_S = 2
+DEFAULT_MEMORY_MB = 256
+CODE_CACHE_SIZE = 256
+
+_HEADER = struct.Struct(">I")
+
+
+class ScriptError(Exception):
+    """The script failed to compile or raised an exception.
+
+    `state` is the state as the script left it when it raised, or None if
+    that is unknown (compile errors, limits, state that cannot be sent back).
+    """
+
+    def __init__(self, message: str, state: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        self.state = state
+
+
+class ScriptLimitExceeded(ScriptError):
+    """The script ran past its time, CPU or memory limit and its worker was killed."""
+
+
+class CompiledScript:
+    __slots__ = ("digest", "source")
+
+    def __init__(self, digest: str, source: str):
+        self.digest = digest
+        self.source = source
+
+
+def _dumps(obj: Any) -> bytes:
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def _read_exact(stream, size: int) -> Optional[bytes]:
+    data = b""
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def _read_frame(stream) -> Optional[Dict[str, Any]]:
+    header = _read_exact(stream, _HEADER.size)
+    if header is None:
+        return None
+    body = _read_exact(stream, _HEADER.unpack(header)[0])
+    return None if body is None else json.loads(body)
+
+
+def _write_frame(stream, obj: Any):
+    body = _dumps(obj)
+    stream.write(_HEADER.pack(len(body)) + body)
+    stream.flush()
+
+
+# ----------------------------------------------------------------------
+# API process side
+# ----------------------------------------------------------------------
+
+class _Worker:
+    def __init__(self, memory_mb: int):
+        self.proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--worker", str(int(memory_mb))],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, close_fds=True,
+        )
+
+    def call(self, request: Dict[str, Any], timeout_s: float) -> Optional[Dict[str, Any]]:
+        """Send one request; None if the worker died. Raises TimeoutError."""
+        try:
+            _write_frame(self.proc.stdin, request)
+        except (BrokenPipeError, OSError):
+            return None
+        ready, _, _ = select.select([self.proc.stdout], [], [], timeout_s)
+        if not ready:
+            raise TimeoutError
+        return _read_frame(self.proc.stdout)
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def kill(self):
+        if self.alive():
+            self.proc.kill()
+        self.proc.wait()
+        for stream in (self.proc.stdin, self.proc.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+
+class ScriptEngine:
+    def __init__(self, workers: int = DEFAULT_WORKERS, timeout_s: float = DEFAULT_TIMEOUT_S,
+                 cpu_s: int = DEFAULT_CPU_S, memory_mb: int = DEFAULT_MEMORY_MB):
+        self.workers = workers
+        self.timeout_s = timeout_s
+        self.cpu_s = cpu_s
+        self.memory_mb = memory_mb
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = 0
+        self._scripts: "OrderedDict[str, CompiledScript]" = OrderedDict()
+        self._stats = {"runs": 0, "errors": 0, "timeouts": 0, "limit_kills": 0, "workers_restarted": 0}
+        self._closed = False
+
+    def compile(self, source: str) -> CompiledScript:
+        """Validate a script and return its cached handle."""
+        digest = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        with self._lock:
+            script = self._scripts.get(digest)
+            if script is not None:
+                self._scripts.move_to_end(digest)
+                return script
+        try:
+            compile(source, "<decision-script>", "exec")
+        except SyntaxError as e:
+            raise ScriptError(f"Script syntax error: {e.msg} (line {e.lineno})") from None
+        script = CompiledScript(digest, source)
+        with self._lock:
+            self._scripts[digest] = script
+            while len(self._scripts) > CODE_CACHE_SIZE:
+                self._scripts.popitem(last=False)
+        return script
+
+    def start(self):
+        """Pre-start the worker processes."""
+        with self._lock:
+            missing = self.workers - self._started
+            self._started = self.workers
+        for _ in range(missing):
+            self._idle.put(_Worker(self.memory_mb))
+
+    def run(self, script: CompiledScript, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Run `script` with `state` bound to `state`; returns the script's resulting state."""
+        if self._closed:
+            raise ScriptError("Script engine is shut down")
+        if self._started < self.workers:
+            self.start()
+        worker = self._idle.get()
+        request = {"hash": script.digest, "state": state, "cpu_s": self.cpu_s}
+        deadline = time.monotonic() + self.timeout_s
+        try:
+            reply = worker.call(request, self.timeout_s)
+            if reply is not None and reply.get("missing"):
+                # First time this worker sees the script
+                request["source"] = script.source
+                reply = worker.call(request, max(deadline - time.monotonic(), 0.0))
+        except TimeoutError:
+            self._replace(worker, "timeouts")
+            raise ScriptLimitExceeded(f"Script timed out after {self.timeout_s:g}s") from None
+        except (TypeError, ValueError) as e:
+            self._idle.put(worker)
+            raise ScriptError(f"State is not JSON serializable: {e}") from None
+        except BaseException:
+            self._replace(worker, "errors")
+            raise
+
+        if reply is None:
+            # Killed by RLIMIT_CPU (SIGXCPU) or otherwise died mid-call
+            self._replace(worker, "limit_kills")
+            raise ScriptLimitExceeded("Script exceeded its CPU or memory limit")
+
+        self._idle.put(worker)
+        with self._lock:
+            self._stats["runs"] += 1
+            if not reply["ok"]:
+                self._stats["errors"] += 1
+        if not reply["ok"]:
+            if reply.get("limit"):
+                raise ScriptLimitExceeded(reply["error"])
+            raise ScriptError(reply["error"], reply.get("state"))
+        return reply["state"]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats, workers=self.workers, idle=self._idle.qsize(),
+                        cached_scripts=len(self._scripts), timeout_s=self.timeout_s,
+                        cpu_s=self.cpu_s, memory_mb=self.memory_mb)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().kill()
+            except queue.Empty:
+                break
+
+    def _replace(self, worker: _Worker, reason: str):
+        worker.kill()
+        with self._lock:
+            self._stats[reason] += 1
+            self._stats["workers_restarted"] += 1
+        if not self._closed:
+            self._idle.put(_Worker(self.memory_mb))
+
+
+# ----------------------------------------------------------------------
+# Worker process side
+# ----------------------------------------------------------------------
+
+def _set_cpu_limit(seconds: int):
+    if resource is None or not seconds:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = int(usage.ru_utime + usage.ru_stime)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = used + int(seconds)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _worker_main(memory_mb: int):
+    if resource is not None and memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+    # Scripts that print must not corrupt the frame stream
+    sys.stdout = sys.stderr
+    code_cache: "OrderedDict[str, Any]" = OrderedDict()
+
+    while True:
+        request = _read_frame(stdin)
+        if request is None:
+            return
+        digest = request["hash"]
+        code = code_cache.get(digest)
+        if code is None:
+            source = request.get("source")
+            if source is None:
+                _write_frame(stdout, {"ok": False, "missing": True})
+                continue
+            code = compile(source, "<decision-script>", "exec")
+            code_cache[digest] = code
+            while len(code_cache) > CODE_CACHE_SIZE:
+                code_cache.popitem(last=False)
+        else:
+            code_cache.move_to_end(digest)
+
+        _set_cpu_limit(request.get("cpu_s"))
+        local_env = {"state": request["state"]}
+        try:
+            exec(code, {}, local_env)
+            reply = {"ok": True, "state": local_env.get("state", request["state"])}
+            body = _dumps(reply)
+        except MemoryError:
+            body = _dumps({"ok": False, "limit": True, "error": "Script exceeded its memory limit"})
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            # Like inline exec: keep what the script changed in place before it failed
+            try:
+                body = _dumps({"ok": False, "error": error, "state": request["state"]})
+            except (TypeError, ValueError):
+                body = _dumps({"ok": False, "error": error})
+        stdout.write(_HEADER.pack(len(body)) + body)
+        stdout.flush()
+
+
+if __name__ == "__main__" and len(sys.argv) >= 3 and sys.argv[1] == "--worker":
+    _worker_main(int(sys.argv[2]))
@@ -0,0 +1,321 @@
+"""
+In-process aggregation of service node metrics.
+
+Every service call used to read and rewrite its `service_metrics` row, which
+lost updates when two calls to the same node raced, and only kept a running
+mean. Calls are now recorded in memory:
+
+* each thread writes to its own shard, so recording never takes a lock;
+* latencies go into a log-linear (HDR-style) histogram with ~1% relative
+  error, which gives p50/p95/p99/max;
+* a background thread periodically merges the shards and adds the deltas
+  since the previous flush to `service_metrics` with one atomic UPSERT per node.
+  Histogram bucket counts are added to `service_metric_buckets` the same way,
+  and the stored p50/p95/p99 are computed from the merged buckets, so every
+  process serving the database contributes to them.
+
+`snapshot(node_id)` serves the counters and percentiles from memory, on top of
+what every process had persisted as of the last flush.
+"""
+
+import atexit
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from db_pool import ConnectionPool
+
+DEFAULT_FLUSH_INTERVAL_S = 1.0
+
+# Values below SUB_BUCKETS are counted exactly; above that each power of two is
+# split into SUB_BUCKETS / 2 buckets, i.e. 7 significant bits of precision.
+SUB_BUCKETS = 128
+_HALF = SUB_BUCKETS // 2
+
+
+def _bucket_index(value: int) -> int:
+    if value < SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - 7
+    return SUB_BUCKETS + (shift - 1) * _HALF + ((value >> shift) - _HALF)
+
+
+def _bucket_upper(index: int) -> int:
+    """Highest value that falls into bucket `index`."""
+    if index < SUB_BUCKETS:
+        return index
+    shift = (index - SUB_BUCKETS) // _HALF + 1
+    mantissa = (index - SUB_BUCKETS) % _HALF + _HALF
+    return ((mantissa + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """Sparse log-linear histogram of non-negative integer latencies (ms)."""
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.max = 0
+
+    def record(self, value: int):
+        value = max(0, int(value))
+        index = _bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "LatencyHistogram"):
+        for index, count in list(other.counts.items()):
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.max = max(self.max, other.max)
+
+    def copy(self) -> "LatencyHistogram":
+        histogram = LatencyHistogram()
+        histogram.merge(self)
+        return histogram
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def percentiles(self, quantiles: Iterable[float]) -> List[Optional[int]]:
+        total = self.total
+        if not total:
+            return [None for _ in quantiles]
+        ordered = sorted(self.counts.items())
+        results = []
+        for q in quantiles:
+            rank = max(1, int(q * total + 0.5))
+            seen = 0
+            for index, count in ordered:
+                seen += count
+                if seen >= rank:
+                    results.append(min(_bucket_upper(index), self.max))
+                    break
+        return results
+
+
+class _NodeStats:
+    __slots__ = ("calls", "successes", "failures", "timed_calls", "sum_ms", "histogram", "last_called")
+
+    def __init__(self):
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.timed_calls = 0
+        self.sum_ms = 0
+        self.histogram = LatencyHistogram()
+        self.last_called: Optional[str] = None
+
+    def merge(self, other: "_NodeStats"):
+        self.calls += other.calls
+        self.successes += other.successes
+        self.failures += other.failures
+        self.timed_calls += other.timed_calls
+        self.sum_ms += other.sum_ms
+        self.histogram.merge(other.histogram)
+        if other.last_called and (self.last_called is None or other.last_called > self.last_called):
+            self.last_called = other.last_called
+
+
+class ServiceMetricsAggregator:
+    def __init__(self, pool: ConnectionPool, flush_interval: float = DEFAULT_FLUSH_INTERVAL_S):
+        self.pool = pool
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._shards: List[Dict[str, _NodeStats]] = []
+        self._shards_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # Totals and bucket counts already written to the DB, and the DB row and
+        # merged histogram as of the last flush
+        self._flushed: Dict[str, Tuple[int, int, int, int, int]] = {}
+        self._flushed_buckets: Dict[str, Dict[int, int]] = {}
+        self._baseline: Dict[str, Dict] = {}
+        self._baseline_histogram: Dict[str, LatencyHistogram] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def create_table(conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS service_metric_buckets (
+                node_id TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (node_id, bucket)
+            ) WITHOUT ROWID
+        """)
+
+    # ------------------------------------------------------------------
+    # Hot path
+    # ------------------------------------------------------------------
+
+    def record(self, node_id: str, success: bool, exec_time_ms: Optional[int]):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+            self._ensure_started()
+
+        stats = shard.get(node_id)
+        if stats is None:
+            stats = shard[node_id] = _NodeStats()
+        stats.calls += 1
+        if success:
+            stats.successes += 1
+        else:
+            stats.failures += 1
+        if exec_time_ms is not None:
+            stats.timed_calls += 1
+            stats.sum_ms += exec_time_ms
+            stats.histogram.record(exec_time_ms)
+        stats.last_called = datetime.now().isoformat()
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def _merged(self) -> Dict[str, _NodeStats]:
+        with self._shards_lock:
+            shards = list(self._shards)
+        merged: Dict[str, _NodeStats] = {}
+        for shard in shards:
+            for node_id, stats in list(shard.items()):
+                merged.setdefault(node_id, _NodeStats()).merge(stats)
+        return merged
+
+    def snapshot(self, node_id: str) -> Optional[Dict]:
+        """Counters and latency percentiles for `node_id`, or None if it has no calls in this process."""
+        stats = self._merged().get(node_id)
+        if stats is None:
+            return None
+
+        # Calls made elsewhere or before this process started are only known from the last flush
+        with self._flush_lock:
+            baseline = self._baseline.get(node_id)
+            flushed = self._flushed.get(node_id, (0, 0, 0, 0, 0))
+            histogram = self._baseline_histogram.get(node_id)
+            flushed_buckets = self._flushed_buckets.get(node_id, {})
+            histogram = histogram.copy() if histogram else LatencyHistogram()
+        for index, count in stats.histogram.counts.items():
+            pending = count - flushed_buckets.get(index, 0)
+            if pending:
+                histogram.counts[index] = histogram.counts.get(index, 0) + pending
+        histogram.max = max(histogram.max, stats.histogram.max)
+        p50, p95, p99 = histogram.percentiles((0.50, 0.95, 0.99))
+        total, successes, failures = stats.calls, stats.successes, stats.failures
+        avg = stats.sum_ms / stats.timed_calls if stats.timed_calls else 0
+        if baseline:
+            total += baseline["total_calls"] - flushed[0]
+            successes += baseline["successes"] - flushed[1]
+            failures += baseline["failures"] - flushed[2]
+            avg = baseline["avg_time_ms"]
+            pending_timed = stats.timed_calls - flushed[3]
+            if pending_timed > 0:
+                prior = baseline["total_calls"]
+                avg = (avg * prior + (stats.sum_ms - flushed[4])) / (prior + pending_timed)
+
+        return {
+            "node_id": node_id,
+            "total_calls": total,
+            "successes": successes,
+            "failures": failures,
+            "avg_time_ms": avg,
+            "p50_ms": p50,
+            "p95_ms": p95,
+            "p99_ms": p99,
+            "max_ms": histogram.max,
+            "last_called": stats.last_called,
+        }
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def flush(self):
+        """Add everything recorded since the last flush to `service_metrics`."""
+        with self._flush_lock:
+            merged = self._merged()
+            pending = []
+            for node_id, stats in merged.items():
+                totals = (stats.calls, stats.successes, stats.failures, stats.timed_calls, stats.sum_ms)
+                flushed = self._flushed.get(node_id, (0, 0, 0, 0, 0))
+                delta = tuple(now - before for now, before in zip(totals, flushed))
+                if delta[0] == 0:
+                    continue
+                buckets = dict(stats.histogram.counts)
+                flushed_buckets = self._flushed_buckets.get(node_id, {})
+                bucket_delta = [(index, count - flushed_buckets.get(index, 0)) for index, count in buckets.items()
+                                if count != flushed_buckets.get(index, 0)]
+                pending.append((node_id, totals, delta, buckets, bucket_delta, stats.histogram.max,
+                                stats.last_called))
+            if not pending:
+                return
+
+            written = []
+            with self.pool.transaction() as conn:
+                for node_id, totals, delta, buckets, bucket_delta, local_max, last_called in pending:
+                    conn.executemany("""
+                        INSERT INTO service_metric_buckets (node_id, bucket, count) VALUES (?, ?, ?)
+                        ON CONFLICT(node_id, bucket) DO UPDATE SET count = count + excluded.count
+                    """, [(node_id, index, count) for index, count in bucket_delta])
+                    # Percentiles over every process's calls, not just this one's
+                    histogram = LatencyHistogram()
+                    for index, count in conn.execute(
+                            "SELECT bucket, count FROM service_metric_buckets WHERE node_id = ?", (node_id,)):
+                        histogram.counts[index] = count
+                    stored_max = conn.execute(
+                        "SELECT max_ms FROM service_metrics WHERE node_id = ?", (node_id,)).fetchone()
+                    histogram.max = max(local_max, (stored_max and stored_max[0]) or 0)
+                    p50, p95, p99 = histogram.percentiles((0.50, 0.95, 0.99))
+
+                    calls, successes, failures, timed, sum_ms = delta
+                    row = conn.execute("""
+                        INSERT INTO service_metrics
+                            (node_id, total_calls, successes, failures, avg_time_ms, last_called,
+                             p50_ms, p95_ms, p99_ms, max_ms)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(node_id) DO UPDATE SET
+                            total_calls = total_calls + excluded.total_calls,
+                            successes = successes + excluded.successes,
+                            failures = failures + excluded.failures,
+                            avg_time_ms = CASE WHEN ? = 0 THEN avg_time_ms
+                                               ELSE (avg_time_ms * total_calls + ?) / (total_calls + ?) END,
+                            last_called = MAX(COALESCE(last_called, ''), excluded.last_called),
+                            p50_ms = excluded.p50_ms,
+                            p95_ms = excluded.p95_ms,
+                            p99_ms = excluded.p99_ms,
+                            max_ms = MAX(COALESCE(max_ms, 0), excluded.max_ms)
+                        RETURNING total_calls, successes, failures, avg_time_ms
+                    """, (node_id, calls, successes, failures, sum_ms / timed if timed else 0, last_called,
+                          p50, p95, p99, histogram.max, timed, sum_ms, timed)).fetchone()
+                    written.append((node_id, totals, buckets, dict(row), histogram))
+
+            # Only once committed: a failed flush leaves its deltas for the next one
+            for node_id, totals, buckets, row, histogram in written:
+                self._flushed[node_id] = totals
+                self._flushed_buckets[node_id] = buckets
+                self._baseline[node_id] = row
+                self._baseline_histogram[node_id] = histogram
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[ServiceMetrics] Flush failed: {e}")
+
+    def _ensure_started(self):
+        with self._shards_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="service-metrics-flush", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def close(self):
+        """Stop the background flusher and write what is left."""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self.flush()
@@ -0,0 +1,81 @@
+"""
+Single-flight coalescing of identical in-flight service calls.
+
+When a burst of executions runs the same flow with the same inputs, every
+execution reaches the same service node at once and sends the same request.
+With coalescing, the first caller for a key (the leader) makes the call;
+callers that arrive while it is in flight await the leader's result instead
+of sending their own request:
+
+    result, coalesced = await service_calls.do(request_key(method, url, payload),
+                                               lambda: call(payload))
+
+The result object is shared, so followers must copy anything they mutate.
+The key is dropped as soon as the call finishes, so nothing is cached; see
+`response_cache` for that. Calls are only shared within one event loop.
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+# Methods whose calls are coalesced unless a node sets `coalesce: false`
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+def request_key(method: str, url: str, payload: Any) -> str:
+    text = json.dumps([method, url, payload], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, call: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """(result, coalesced): the result of `call`, or of the identical call already in flight."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            leader = self._in_flight.get(key)
+            if leader is not None and leader.get_loop() is loop:
+                self.coalesced += 1
+            else:
+                leader = None
+                future = self._in_flight[key] = loop.create_future()
+                self.calls += 1
+        if leader is not None:
+            # shield: a follower giving up must not cancel the leader's call for everyone else
+            return await asyncio.shield(leader), True
+
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved: without followers nobody else reads it
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                if self._in_flight.get(key) is future:
+                    del self._in_flight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight = len(self._in_flight)
+        total = self.calls + self.coalesced
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "coalesced_ratio": round(self.coalesced / total, 4) if total else None,
+            "in_flight": in_flight,
+        }
@@ -0,0 +1,238 @@
+"""
+Incremental checkpoints of workflow state.
+
+Instead of rewriting the whole accumulated state on every save, each
+checkpoint stores a JSON Patch against the previous one in
+`state_checkpoints`. A full snapshot is written for the first checkpoint and
+then again whenever the deltas written since the last snapshot outweigh it
+(or after `max_deltas` deltas, to bound replay length). Rows older than the
+newest snapshot are no longer needed for reconstruction and are deleted when
+the snapshot is written. Bytes written per execution therefore stay
+proportional to the bytes the workflow actually adds to its state.
+
+Nodes checkpoint with `checkpoint_update(execution_id, update)`: the update
+a node returned (see `graph_state`) is merged into the newest checkpoint, so
+parallel branches that each only saw the state before the fan-out do not
+overwrite each other's keys.
+
+`load(execution_id)` rebuilds the latest state from the newest snapshot plus
+the deltas after it. Large snapshots and deltas are compressed by the
+optional `BlobCodec`.
+
+The in-memory copy of an execution's last checkpoint is only valid while
+this process is the one running it: callers `discard` it when the execution
+pauses or finishes, because another process sharing the database may resume
+it. `load` of an execution that is not running here reads the database and
+keeps nothing.
+"""
+
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from blob_codec import BlobCodec
+from db_pool import ConnectionPool
+from graph_state import merge_state
+from json_patch import apply_patch, make_patch
+from write_behind import WriteBehindJournal
+
+DEFAULT_MAX_DELTAS = 50
+DEFAULT_MAX_TRACKED = 1024
+
+
+class _Tracked:
+    """In-memory copy of the last checkpoint of one execution."""
+    __slots__ = ("seq", "snapshot", "full_bytes", "delta_bytes", "deltas")
+
+    def __init__(self, seq: int, snapshot: Any, full_bytes: int):
+        self.seq = seq
+        self.snapshot = snapshot
+        self.full_bytes = full_bytes
+        self.delta_bytes = 0
+        self.deltas = 0
+
+
+class StateCheckpointer:
+    def __init__(self, pool: ConnectionPool, journal: WriteBehindJournal, codec: Optional[BlobCodec] = None,
+                 max_deltas: int = DEFAULT_MAX_DELTAS, max_tracked: int = DEFAULT_MAX_TRACKED):
+        self.pool = pool
+        self.journal = journal
+        self.codec = codec
+        self.max_deltas = max_deltas
+        self.max_tracked = max_tracked
+        self._lock = threading.Lock()
+        self._exec_locks: Dict[str, threading.Lock] = {}
+        self._tracked: "OrderedDict[str, _Tracked]" = OrderedDict()
+
+    @staticmethod
+    def create_table(conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS state_checkpoints (
+                execution_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                node_id TEXT,
+                data TEXT NOT NULL,
+                codec TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (execution_id, seq)
+            )
+        """)
+
+    def checkpoint(self, execution_id: str, state: Dict[str, Any], node_id: Optional[str] = None,
+                   new: bool = False):
+        """
+        Record `state` as the newest checkpoint of `execution_id`. Pass `new=True`
+        for an execution created by the caller: it has no rows yet, so the
+        database is not read (which would wait for the write-behind journal).
+        """
+        with self._execution_lock(execution_id):
+            tracked = None if new else self._get_tracked(execution_id)
+            self._checkpoint(execution_id, tracked, state, node_id)
+
+    def write_initial(self, conn: sqlite3.Connection, execution_id: str, state: Dict[str, Any],
+                      node_id: Optional[str] = None):
+        """
+        Write the first checkpoint of a new execution inside the caller's
+        transaction, e.g. together with a queued execution row. Nothing is
+        tracked here: whichever process runs it starts with `checkpoint(..., new=True)`.
+        """
+        data, codec = self._encode(json.dumps(state))
+        conn.execute("""
+            INSERT OR REPLACE INTO state_checkpoints (execution_id, seq, kind, node_id, data, codec)
+            VALUES (?, 0, 'full', ?, ?, ?)
+        """, (execution_id, node_id, data, codec))
+
+    def checkpoint_update(self, execution_id: str, update: Dict[str, Any], node_id: Optional[str] = None):
+        """Merge a node's state update into the newest checkpoint of `execution_id`."""
+        with self._execution_lock(execution_id):
+            tracked = self._get_tracked(execution_id)
+            state = merge_state(tracked.snapshot if tracked is not None else {}, update)
+            self._checkpoint(execution_id, tracked, state, node_id)
+
+    def load(self, execution_id: str) -> Optional[Dict[str, Any]]:
+        """Reconstruct the newest checkpointed state, or None if there is none."""
+        with self._lock:
+            lock = self._exec_locks.get(execution_id) if execution_id in self._tracked else None
+        if lock is not None:
+            with lock:
+                with self._lock:
+                    tracked = self._tracked.get(execution_id)
+                if tracked is not None:
+                    return json.loads(json.dumps(tracked.snapshot))
+        # Not running here (any more): another process may advance it, so read the database and keep nothing
+        tracked = self._read(execution_id)
+        return tracked.snapshot if tracked is not None else None
+
+    def discard(self, execution_id: str):
+        """Forget the in-memory copy of a paused or finished execution (rows stay in the DB)."""
+        with self._lock:
+            self._tracked.pop(execution_id, None)
+            self._exec_locks.pop(execution_id, None)
+
+    # ------------------------------------------------------------------
+
+    def _checkpoint(self, execution_id: str, tracked: Optional[_Tracked], state: Dict[str, Any],
+                    node_id: Optional[str]):
+        if tracked is None:
+            self._write_full(execution_id, 0, state, node_id)
+            return
+
+        patch = make_patch(tracked.snapshot, state)
+        if not patch:
+            return
+        patch_text = json.dumps(patch)
+
+        if (tracked.delta_bytes + len(patch_text) > tracked.full_bytes
+                or tracked.deltas >= self.max_deltas):
+            self._write_full(execution_id, tracked.seq + 1, state, node_id)
+            return
+
+        seq = tracked.seq + 1
+        data, codec = self._encode(patch_text)
+        self.journal.submit("""
+            INSERT INTO state_checkpoints (execution_id, seq, kind, node_id, data, codec)
+            VALUES (?, ?, 'delta', ?, ?, ?)
+        """, (execution_id, seq, node_id, data, codec))
+        # Apply a private copy of the patch so the snapshot never aliases live state
+        tracked.snapshot = apply_patch(tracked.snapshot, json.loads(patch_text))
+        tracked.seq = seq
+        tracked.delta_bytes += len(patch_text)
+        tracked.deltas += 1
+
+    def _write_full(self, execution_id: str, seq: int, state: Dict[str, Any], node_id: Optional[str]):
+        text = json.dumps(state)
+        data, codec = self._encode(text)
+        # REPLACE: a queued execution's first run rewrites the seq 0 written by write_initial
+        self.journal.submit("""
+            INSERT OR REPLACE INTO state_checkpoints (execution_id, seq, kind, node_id, data, codec)
+            VALUES (?, ?, 'full', ?, ?, ?)
+        """, (execution_id, seq, node_id, data, codec))
+        # Older rows are no longer needed; at seq 0 this clears what an interrupted queued run left behind
+        self.journal.submit(
+            "DELETE FROM state_checkpoints WHERE execution_id = ? AND seq != ?",
+            (execution_id, seq),
+        )
+        self._remember(execution_id, _Tracked(seq, json.loads(text), len(text)))
+
+    def _get_tracked(self, execution_id: str) -> Optional[_Tracked]:
+        with self._lock:
+            tracked = self._tracked.get(execution_id)
+            if tracked is not None:
+                self._tracked.move_to_end(execution_id)
+                return tracked
+        tracked = self._read(execution_id)
+        if tracked is not None:
+            self._remember(execution_id, tracked)
+        return tracked
+
+    def _read(self, execution_id: str) -> Optional[_Tracked]:
+        self.journal.flush()
+        conn = self.pool.connection()
+        full = conn.execute("""
+            SELECT seq, data, codec FROM state_checkpoints
+            WHERE execution_id = ? AND kind = 'full'
+            ORDER BY seq DESC LIMIT 1
+        """, (execution_id,)).fetchone()
+        if full is None:
+            return None
+        text = self._decode(full["data"], full["codec"])
+        tracked = _Tracked(full["seq"], json.loads(text), len(text))
+        for row in conn.execute("""
+            SELECT seq, data, codec FROM state_checkpoints
+            WHERE execution_id = ? AND kind = 'delta' AND seq > ?
+            ORDER BY seq ASC
+        """, (execution_id, full["seq"])):
+            text = self._decode(row["data"], row["codec"])
+            tracked.snapshot = apply_patch(tracked.snapshot, json.loads(text))
+            tracked.seq = row["seq"]
+            tracked.delta_bytes += len(text)
+            tracked.deltas += 1
+        return tracked
+
+    def _encode(self, text: str):
+        if self.codec is None:
+            return text, None
+        return self.codec.encode(text)
+
+    def _decode(self, data, codec: Optional[str]) -> str:
+        if self.codec is None:
+            return data
+        return self.codec.decode(data, codec)
+
+    def _remember(self, execution_id: str, tracked: _Tracked):
+        with self._lock:
+            self._tracked[execution_id] = tracked
+            self._tracked.move_to_end(execution_id)
+            while len(self._tracked) > self.max_tracked:
+                evicted, _ = self._tracked.popitem(last=False)
+                self._exec_locks.pop(evicted, None)
+
+    def _execution_lock(self, execution_id: str) -> threading.Lock:
+        with self._lock:
+            lock = self._exec_locks.get(execution_id)
+            if lock is None:
+                lock = self._exec_locks[execution_id] = threading.Lock()
+            return lock
@@ -0,0 +1,123 @@
+"""
+Precompiled request templates for service nodes.
+
+A template is any JSON value whose strings may contain `{path}` placeholders
+(`{input.company.name}`, `{s1.response.items[0].id}`). `compile_template`
+walks it once and turns it into a render plan: dicts and lists become
+builders, strings become literal segments interleaved with pre-parsed path
+accessors. `render(context)` then builds a fresh output directly, so the
+template itself is never copied or mutated.
+
+Substitution:
+
+- placeholders that resolve to None (or to nothing) are left as written;
+- placeholders inside a larger string are replaced with `str(value)`;
+- a string that is exactly one placeholder (`"{input.amount}"`) is replaced
+  by the value itself, keeping its type (numbers, booleans, objects).
+
+The first two match the original `render_template`. The last one does not:
+the original always substituted `str(value)`, so a non-string value used as
+a whole field used to be sent as a string (`"199.5"`, `"True"`). String
+values render exactly as before.
+"""
+
+import copy
+import re
+from typing import Any, Callable, Dict, List, Tuple
+
+from path_access import Step, compile_path, get_path
+
+_PLACEHOLDER = re.compile(r"\{([^{}]+)\}")
+Renderer = Callable[[Dict[str, Any]], Any]
+
+
+class CompiledTemplate:
+    __slots__ = ("template", "_render")
+
+    def __init__(self, template: Any):
+        self.template = template
+        self._render = _compile(template)
+
+    def render(self, context: Dict[str, Any]) -> Any:
+        return self._render(context)
+
+
+def compile_template(template: Any) -> CompiledTemplate:
+    return CompiledTemplate(template)
+
+
+def render_template(obj: Any, context: Dict[str, Any]) -> Any:
+    """One-off render; compile once with `compile_template` when a template is reused."""
+    return _compile(obj)(context)
+
+
+def template_paths(obj: Any) -> List[Tuple[Step, ...]]:
+    """Parsed path of every placeholder in a template, in order; `()` for `{ }` (the whole context)."""
+    if isinstance(obj, str):
+        return [compile_path(piece.strip()) for piece in _PLACEHOLDER.findall(obj)]
+    if isinstance(obj, dict):
+        return [steps for value in obj.values() for steps in template_paths(value)]
+    if isinstance(obj, list):
+        return [steps for value in obj for steps in template_paths(value)]
+    return []
+
+
+# ----------------------------------------------------------------------
+# Compilation
+# ----------------------------------------------------------------------
+
+def _constant(value: Any) -> Renderer:
+    return lambda context: value
+
+
+def _compile(obj: Any) -> Renderer:
+    if isinstance(obj, str):
+        return _compile_string(obj)
+    if isinstance(obj, dict):
+        items = [(key, _compile(value)) for key, value in obj.items()]
+        return lambda context: {key: render(context) for key, render in items}
+    if isinstance(obj, list):
+        renderers = [_compile(value) for value in obj]
+        return lambda context: [render(context) for render in renderers]
+    # Numbers, booleans and None are immutable and can be shared between renders
+    return _constant(obj)
+
+
+def _compile_string(text: str) -> Renderer:
+    pieces = _PLACEHOLDER.split(text)
+    if len(pieces) == 1:
+        return _constant(text)
+
+    if len(pieces) == 3 and not pieces[0] and not pieces[2]:
+        # The whole string is one placeholder: substitute the value itself
+        steps = compile_path(pieces[1].strip())
+
+        def render_value(context):
+            value = get_path(context, steps) if steps else context
+            if value is None:
+                return text
+            # Containers are copied so the payload never aliases workflow state
+            return copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+
+        return render_value
+
+    # Alternating literal / placeholder pieces: [lit, ph, lit, ph, ..., lit]
+    segments: List[Tuple[str, Any]] = []
+    for i, piece in enumerate(pieces):
+        if i % 2 == 0:
+            if piece:
+                segments.append((piece, None))
+        else:
+            segments.append(("{" + piece + "}", compile_path(piece.strip())))
+
+    def render_string(context):
+        out = []
+        for literal, steps in segments:
+            if steps is None:
+                out.append(literal)
+                continue
+            value = get_path(context, steps) if steps else context
+            out.append(literal if value is None else str(value))
+        return "".join(out)
+
+    return render_string
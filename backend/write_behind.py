@@ -0,0 +1,181 @@
+"""
+Write-behind journal for execution records.
+
+Node executions, form responses and metric updates do not need to be durable
+before the graph moves on to the next node, so instead of committing each one
+inline they are queued here and written by a background thread in batched
+transactions. A batch is written when it reaches `max_batch` statements or
+when `flush_interval` seconds have passed since its first statement.
+
+Readers that must see every record written so far (e.g. /executions/{id})
+call `flush()`, which blocks until everything queued before the call is
+committed. `close()` drains the queue on shutdown.
+"""
+
+import atexit
+import queue
+import threading
+import time
+from itertools import groupby
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from db_pool import ConnectionPool
+
+DEFAULT_MAX_BATCH = 500
+DEFAULT_FLUSH_INTERVAL_S = 0.05
+
+Statement = Tuple[str, Sequence[Any]]
+
+
+class _FlushRequest:
+    __slots__ = ("done",)
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+_STOP = object()
+
+
+class WriteBehindJournal:
+    """Queue of SQL writes applied in batches by a background writer thread."""
+
+    def __init__(self, pool: ConnectionPool, max_batch: int = DEFAULT_MAX_BATCH,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL_S):
+        self.pool = pool
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.stats = {"statements": 0, "batches": 0, "errors": 0}
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+
+    def submit(self, sql: str, params: Sequence[Any] = ()):
+        """Queue one statement; it is committed with the next batch."""
+        if self._closed:
+            # After shutdown there is no writer left, so write through.
+            with self.pool.transaction() as conn:
+                conn.execute(sql, params)
+            return
+        self._ensure_started()
+        self._queue.put((sql, params))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every statement submitted before this call is committed."""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        request = _FlushRequest()
+        self._queue.put(request)
+        return request.done.wait(timeout)
+
+    def close(self):
+        """Drain the queue and stop the writer thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="write-behind-journal", daemon=True)
+                self._thread.start()
+
+    # ------------------------------------------------------------------
+    # Writer side
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch: List[Statement] = []
+            waiters: List[_FlushRequest] = []
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+
+            # Collect until the batch is full, the interval elapses or someone asks for a flush
+            while True:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, _FlushRequest):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+
+                if stop or waiters or len(batch) >= self.max_batch:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if stop:
+                # Pick up anything that raced in behind the stop marker
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if isinstance(item, _FlushRequest):
+                        waiters.append(item)
+                    elif item is not _STOP:
+                        batch.append(item)
+
+            if batch:
+                self._write(batch)
+            for waiter in waiters:
+                waiter.done.set()
+            if stop:
+                self.pool.close()
+                return
+
+    def _write(self, batch: List[Statement]):
+        try:
+            with self.pool.transaction() as conn:
+                # Consecutive statements with the same SQL go through executemany
+                for sql, group in groupby(batch, key=lambda stmt: stmt[0]):
+                    conn.executemany(sql, [params for _, params in group])
+            self.stats["batches"] += 1
+            self.stats["statements"] += len(batch)
+        except Exception as e:
+            print(f"[WriteBehindJournal] Batch of {len(batch)} failed, retrying individually: {e}")
+            self._write_individually(batch)
+
+    def _write_individually(self, batch: List[Statement]):
+        for sql, params in batch:
+            try:
+                with self.pool.transaction() as conn:
+                    conn.execute(sql, params)
+                self.stats["statements"] += 1
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"[WriteBehindJournal] Dropped write: {e}")
+
+
+_journals: Dict[int, WriteBehindJournal] = {}
+_journals_lock = threading.Lock()
+
+
+def get_journal(pool: ConnectionPool, **options) -> WriteBehindJournal:
+    """Return the process-wide journal for `pool`, creating it on first use."""
+    with _journals_lock:
+        journal = _journals.get(id(pool))
+        if journal is None:
+            journal = WriteBehindJournal(pool, **options)
+            _journals[id(pool)] = journal
+            atexit.register(journal.close)
+        return journal